@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User
@@ -59,7 +60,6 @@ class AccountsViewTests(TestCase):
 
         self.assertRedirects(response, next_url)
 
-  
     def test_login_already_authenticated_redirect(self):
         """Test that already logged-in users are handled appropriately."""
         # Login the user first
@@ -71,3 +71,52 @@ class AccountsViewTests(TestCase):
         # Should still be accessible (allowing re-login)
         self.assertEqual(response.status_code, 200)
 
+
+class LogoutSuccessTests(TestCase):
+    """Test the logout page's featured recipe and cached site stats."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser", password="testpass123"
+        )
+        self.recipes = [
+            Recipe.objects.create(name=f"Recipe {i}", cooking_time=10) for i in range(3)
+        ]
+        Favorite.objects.create(user=self.user, recipe=self.recipes[0])
+
+    def test_shows_stats_and_featured_recipe(self):
+        """Test that the page shows the site totals and one of the recipes."""
+        response = self.client.get(reverse("accounts:logout_success"))
+        self.assertEqual(response.context["total_recipes"], 3)
+        self.assertEqual(response.context["total_users"], 1)
+        self.assertEqual(response.context["total_favorites"], 1)
+        self.assertIn(response.context["featured_recipe"], self.recipes)
+
+    def test_stats_follow_changes_without_counting(self):
+        """Test that signals keep the cached totals current."""
+        url = reverse("accounts:logout_success")
+        self.client.get(url)
+        other = User.objects.create_user(username="other", password="pass12345")
+        Favorite.objects.create(user=other, recipe=self.recipes[1])
+        self.recipes[2].delete()
+
+        # The recipe id range (the catalog changed) and the featured recipe;
+        # no COUNT(*) at all
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.context["total_recipes"], 2)
+        self.assertEqual(response.context["total_users"], 2)
+        self.assertEqual(response.context["total_favorites"], 2)
+
+        other.delete()  # cascades to the user's favorite
+        response = self.client.get(url)
+        self.assertEqual(response.context["total_users"], 1)
+        self.assertEqual(response.context["total_favorites"], 1)
+
+    def test_no_recipes(self):
+        """Test that the page still renders with an empty catalog."""
+        Recipe.objects.all().delete()
+        response = self.client.get(reverse("accounts:logout_success"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context["featured_recipe"])
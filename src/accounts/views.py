@@ -2,8 +2,8 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.contrib.auth.models import User
-from recipes.models import Recipe, Favorite
+from recipes.catalog import site_stats
+from recipes.featured import random_recipe
 
 
 def login_view(request):
@@ -39,18 +39,16 @@ def logout_view(request):
 
 def logout_success(request):
     """Display logout success page with featured content."""
-    # Get a random featured recipe
-    featured_recipe = Recipe.objects.order_by("?").first()
+    # Get a random featured recipe (a primary key lookup, not ORDER BY RANDOM())
+    featured_recipe = random_recipe()
 
-    # Get some stats for the page
-    total_recipes = Recipe.objects.count()
-    total_users = User.objects.count()
-    total_favorites = Favorite.objects.count()
+    # Get some stats for the page (cached counters, kept current by signals)
+    stats = site_stats()
 
     context = {
         "featured_recipe": featured_recipe,
-        "total_recipes": total_recipes,
-        "total_users": total_users,
-        "total_favorites": total_favorites,
+        "total_recipes": stats["recipes"],
+        "total_users": stats["users"],
+        "total_favorites": stats["favorites"],
     }
     return render(request, "accounts/success.html", context)
@@ -0,0 +1,18 @@
+import os
+
+# Picked up automatically by `gunicorn recipe_project.wsgi` (see Procfile),
+# since gunicorn reads ./gunicorn.conf.py from the working directory.
+
+# Workers are warmed up by post_fork below, so readiness can wait for it
+os.environ.setdefault("RECIPES_WARMUP_REQUIRED", "True")
+
+
+def post_fork(server, worker):
+    """Warm each new worker up before it accepts its first request."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "recipe_project.settings")
+    import django
+
+    django.setup()
+    from recipes.warmup import warm_up
+
+    warm_up(log=server.log.info)
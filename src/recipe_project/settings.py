@@ -51,6 +51,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    # Off (removes itself) unless RECIPES_SQL_INSTRUMENTATION is set
+    "recipes.instrumentation.SQLInstrumentationMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -137,6 +139,93 @@ STATICFILES_DIRS = [
 MEDIA_URL = "/media/"
 # base dir is src folder
 MEDIA_ROOT = BASE_DIR / "media"
+# Serve MEDIA_URL through recipes.media.serve_media. On by default only
+# with DEBUG, so production workers don't stream uploads unless asked to.
+# In production, have the front proxy serve MEDIA_ROOT at MEDIA_URL, or
+# turn this on together with RECIPES_MEDIA_ACCEL below. Django then only
+# checks the request and sets the headers, and the proxy sends the file.
+RECIPES_SERVE_MEDIA = os.environ.get("RECIPES_SERVE_MEDIA", str(DEBUG)).lower() in (
+    "true",
+    "1",
+    "yes",
+)
+# Leave media file bodies to the front proxy: "" (stream them from Django),
+# "x-accel-redirect" (nginx; needs an `internal` location at
+# RECIPES_MEDIA_ACCEL_PREFIX aliasing MEDIA_ROOT) or "x-sendfile"
+# (Apache mod_xsendfile, lighttpd)
+RECIPES_MEDIA_ACCEL = os.environ.get("RECIPES_MEDIA_ACCEL", "").lower()
+RECIPES_MEDIA_ACCEL_PREFIX = os.environ.get(
+    "RECIPES_MEDIA_ACCEL_PREFIX", "/protected-media/"
+)
+
+# Recipes per page on the list and search pages (override with ?page_size=)
+RECIPES_PAGE_SIZE = int(os.environ.get("RECIPES_PAGE_SIZE", 24))
+RECIPES_MAX_PAGE_SIZE = 100
+
+# Cache. The default is per-process local memory, so each worker keeps its
+# own copy and invalidations only reach the worker that made them. Deploys
+# with several workers should set CACHE_BACKEND/CACHE_LOCATION to a shared
+# backend, e.g. "django.core.cache.backends.redis.RedisCache" and
+# "redis://127.0.0.1:6379".
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "recipe-app"),
+    }
+}
+
+# Seconds a cached search result (ordered recipe ids) is kept. Catalog edits
+# invalidate immediately in the process that made them; this bounds
+# staleness in other processes when using the local-memory cache.
+RECIPES_SEARCH_CACHE_TIMEOUT = 300
+
+# Seconds the recipe list's per-category counts are cached (same
+# invalidation as above)
+RECIPES_CATEGORY_COUNTS_TIMEOUT = 60
+
+# Seconds the site-wide totals (recipes, users, favorites) are cached;
+# signals keep them current, this bounds drift from bulk edits
+RECIPES_SITE_STATS_TIMEOUT = 60 * 60
+
+# Rendered favorites charts are invalidated explicitly; this only bounds
+# how long entries for inactive users linger
+RECIPES_CHART_CACHE_TIMEOUT = 60 * 60 * 24
+
+# How favorites charts are drawn: "matplotlib" (PNG, cached and optionally
+# rendered by the chart worker) or "svg" (drawn from the aggregated numbers
+# on each request; matplotlib is never loaded)
+RECIPES_CHART_RENDERER = os.environ.get("RECIPES_CHART_RENDERER", "matplotlib")
+
+# Matplotlib renders allowed at once per process (threads beyond this wait
+# for a pooled figure)
+RECIPES_CHART_RENDER_CONCURRENCY = int(
+    os.environ.get("RECIPES_CHART_RENDER_CONCURRENCY", 2)
+)
+
+# Render favorites charts inside the request (True) or queue them for the
+# run_chart_worker command (False; the page polls for the result)
+RECIPES_CHART_JOBS_EAGER = os.environ.get(
+    "RECIPES_CHART_JOBS_EAGER", "True"
+).lower() in ("true", "1", "yes")
+
+# When True, /healthz/ready answers 503 until recipes.warmup.warm_up() has
+# run in the serving process. gunicorn.conf.py turns this on, since its
+# post_fork hook runs the warm-up; other servers (runserver, uwsgi, ...)
+# never would, so it is off by default.
+RECIPES_WARMUP_REQUIRED = os.environ.get(
+    "RECIPES_WARMUP_REQUIRED", "False"
+).lower() in ("true", "1", "yes")
+
+# Per-request query count, DB time and N+1 warnings (logged by
+# recipes.instrumentation), plus a Server-Timing header splitting DB,
+# template and chart time. Off by default: it times every query.
+RECIPES_SQL_INSTRUMENTATION = os.environ.get(
+    "RECIPES_SQL_INSTRUMENTATION", "False"
+).lower() in ("true", "1", "yes")
+# Identical statements (literals aside) allowed per request before warning
+RECIPES_N_PLUS_ONE_THRESHOLD = int(os.environ.get("RECIPES_N_PLUS_ONE_THRESHOLD", 5))
 
 # Authentication settings
 LOGIN_URL = "/accounts/login/"
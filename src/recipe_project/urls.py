@@ -16,10 +16,11 @@ Including another URLconf
 """
 
 from django.contrib import admin
-from django.urls import path, include
+import re
+from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from django.http import HttpResponse
+from recipes.media import serve_media
 
 
 def favicon_view(request):
@@ -38,6 +39,13 @@ urlpatterns = [
     # Root URL (homepage) is handled by the recipes app
     path("", include("recipes.urls")),
 ]
-# Serve media files during development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Media files (recipe images): conditional GET, byte ranges and optional
+# proxy offload; content-addressed images are marked immutable. The view
+# answers 404 unless DEBUG or RECIPES_SERVE_MEDIA is on.
+urlpatterns += [
+    re_path(
+        r"^%s(?P<path>.*)$" % re.escape(settings.MEDIA_URL.lstrip("/")),
+        serve_media,
+        name="media",
+    )
+]
@@ -0,0 +1,114 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.db.models import Count
+from .models import Favorite, Recipe
+
+# Cache key holding the catalog generation. Any change to recipes,
+# ingredients or their links bumps it, which orphans every cache entry
+# whose key embeds the previous generation.
+GENERATION_KEY = "recipes:catalog:generation"
+
+# Recipes per category (recipes_list sidebar). Deleted by signals when a
+# recipe is created, deleted or changes category; the timeout bounds how
+# stale other processes' caches (and bulk edits) can leave it.
+CATEGORY_COUNTS_KEY = "recipes:catalog:category-counts"
+CATEGORY_COUNTS_TIMEOUT = 60  # seconds
+
+# Site-wide totals (logout page). Signals add each create/delete to the
+# cached counters; a missing counter is recounted on the next read, and
+# the timeout bounds drift from bulk edits or other processes' caches.
+SITE_STATS = {"recipes": Recipe, "users": User, "favorites": Favorite}
+SITE_STATS_KEY = "recipes:site-stats:{}"
+SITE_STATS_TIMEOUT = 60 * 60  # seconds
+
+
+def _initial_generation():
+    # Seeded from the clock rather than 1 so a cleared or evicted cache can't
+    # hand out a generation that per-process state has already seen
+    return time.time_ns() // 1000
+
+
+def get_generation(key):
+    """Current value of a generation counter stored under key."""
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _initial_generation(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(key):
+    """Advance a generation counter, orphaning entries keyed on the old value."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key missing (cold or evicted cache): start a fresh generation
+        cache.add(key, _initial_generation(), timeout=None)
+        return cache.incr(key)
+
+
+def catalog_generation():
+    """Current catalog generation."""
+    return get_generation(GENERATION_KEY)
+
+
+def bump_catalog_generation():
+    """Invalidate everything derived from the catalog."""
+    return bump_generation(GENERATION_KEY)
+
+
+def increment_counter(key, delta=1):
+    """Increment a (possibly missing) cache counter."""
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        if cache.add(key, delta, timeout=None):
+            return delta
+        return cache.incr(key, delta)
+
+
+def recipe_category_counts():
+    """{category: number of recipes}, most common first, from one aggregate."""
+    counts = cache.get(CATEGORY_COUNTS_KEY)
+    if counts is None:
+        counts = dict(
+            Recipe.objects.order_by()
+            .values_list("category")
+            .annotate(count=Count("id"))
+            .order_by("-count", "category")
+        )
+        timeout = getattr(
+            settings, "RECIPES_CATEGORY_COUNTS_TIMEOUT", CATEGORY_COUNTS_TIMEOUT
+        )
+        cache.set(CATEGORY_COUNTS_KEY, counts, timeout)
+    return counts
+
+
+def invalidate_category_counts():
+    cache.delete(CATEGORY_COUNTS_KEY)
+
+
+def site_stats():
+    """{"recipes", "users", "favorites"}: totals, COUNTed only when not cached."""
+    keys = {name: SITE_STATS_KEY.format(name) for name in SITE_STATS}
+    cached = cache.get_many(keys.values())
+    stats = {}
+    for name, model in SITE_STATS.items():
+        stats[name] = cached.get(keys[name])
+        if stats[name] is None:
+            stats[name] = model.objects.count()
+            timeout = getattr(
+                settings, "RECIPES_SITE_STATS_TIMEOUT", SITE_STATS_TIMEOUT
+            )
+            cache.add(keys[name], stats[name], timeout)
+    return stats
+
+
+def adjust_site_stat(name, delta):
+    """Apply a create (1) or delete (-1) to a cached total, if it is cached."""
+    try:
+        cache.incr(SITE_STATS_KEY.format(name), delta)
+    except ValueError:
+        pass  # not cached: the next read counts afresh
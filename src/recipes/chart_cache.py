@@ -0,0 +1,106 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from .catalog import increment_counter
+from .instrumentation import timed
+from .models import Favorite, FavoritesVersion
+
+HITS_KEY = "recipes:chart-cache:hits"
+MISSES_KEY = "recipes:chart-cache:misses"
+RENDER_MS_KEY = "recipes:chart-cache:render-ms"
+SAVED_MS_KEY = "recipes:chart-cache:saved-ms"
+
+DEFAULT_TIMEOUT = 60 * 60 * 24  # seconds
+
+
+def favorites_version(user_id):
+    """Current version of a user's favorites (and of what the charts show)."""
+    # Created on first read: bumps only touch existing rows, and a new row
+    # starts from the clock, past any version handed out before
+    version, _ = FavoritesVersion.objects.get_or_create(user_id=user_id)
+    return version.version
+
+
+def bump_favorites_versions(user_ids):
+    """Invalidate these users' cached charts (in every process)."""
+    FavoritesVersion.objects.filter(user_id__in=user_ids).update(
+        version=F("version") + 1
+    )
+
+
+def bump_favorites_version(user_id):
+    """Invalidate a user's cached charts."""
+    bump_favorites_versions([user_id])
+
+
+def bump_favorites_versions_for_recipes(recipe_ids):
+    """Invalidate the cached charts of everyone who favorited these recipes."""
+    bump_favorites_versions(
+        Favorite.objects.filter(recipe_id__in=recipe_ids)
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+
+
+def chart_cache_key(user_id, version):
+    return f"recipes:charts:{user_id}:{version}"
+
+
+def cached_charts(user_id, version):
+    """Cached charts for a user's favorites version, or None.
+
+    Each chart image is served separately, so a hit is credited with an
+    equal share of the time it took to render all of them.
+    """
+    entry = cache.get(chart_cache_key(user_id, version))
+    if entry is None:
+        return None
+    increment_counter(HITS_KEY)
+    increment_counter(SAVED_MS_KEY, entry["render_ms"] // len(entry["charts"]))
+    return entry["charts"]
+
+
+def has_cached_charts(user_id, version):
+    return cache.has_key(chart_cache_key(user_id, version))
+
+
+def store_charts(user_id, version, charts, render_ms):
+    timeout = getattr(settings, "RECIPES_CHART_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+    cache.set(
+        chart_cache_key(user_id, version),
+        {"charts": charts, "render_ms": render_ms},
+        timeout,
+    )
+
+
+def render_charts(user):
+    """Render a user's charts (a cache miss); returns (charts, render_ms)."""
+    # Deferred: importing chart_utils loads matplotlib
+    from .chart_utils import generate_all_saved_recipe_charts
+
+    increment_counter(MISSES_KEY)
+    started = time.perf_counter()
+    with timed("chart"):
+        charts = generate_all_saved_recipe_charts(user)
+    render_ms = round((time.perf_counter() - started) * 1000)
+    increment_counter(RENDER_MS_KEY, render_ms)
+    return charts, render_ms
+
+
+def has_charts(charts):
+    return any(chart is not None for chart in charts.values())
+
+
+def chart_cache_stats():
+    """Hit/miss counters and render time spent vs. saved, in milliseconds."""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+        "render_ms": cache.get(RENDER_MS_KEY, 0),
+        "saved_ms": cache.get(SAVED_MS_KEY, 0),
+    }
@@ -0,0 +1,118 @@
+from django.db.models import Count, F, Q
+from .facets import TIME_BUCKETS
+from .models import Favorite, Recipe
+
+# The numbers behind the favorites charts, shared by the matplotlib
+# renderer (chart_utils), the SVG renderer (svg_charts) and the JSON API.
+# Each chart is a dict with "type" (bar/pie/line), "title", axis labels and
+# parallel "labels"/"values" lists, or None when there is nothing to show.
+
+TOP_INGREDIENTS = 10
+
+
+def ingredients_chart_data(user):
+    """The ingredients used by most of a user's saved recipes."""
+    rows = (
+        Recipe.ingredients.through.objects.filter(recipe__favorited_by__user=user)
+        .values("ingredient__name")
+        .annotate(count=Count("id"))
+        .order_by("-count", "ingredient__name")[:TOP_INGREDIENTS]
+    )
+    rows = list(rows)
+    if not rows:
+        return None
+    return {
+        "type": "bar",
+        "title": "Most Common Ingredients in Your Saved Recipes",
+        "x_label": "Ingredients",
+        "y_label": "Number of Saved Recipes",
+        "labels": [row["ingredient__name"] for row in rows],
+        "values": [row["count"] for row in rows],
+    }
+
+
+def categories_chart_data(user):
+    """How a user's saved recipes are spread over the categories."""
+    counts = dict(
+        Favorite.objects.filter(user=user)
+        .values_list("recipe__category")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    slices = [
+        (label, counts[value])
+        for value, label in Recipe.CATEGORY_CHOICES
+        if counts.get(value)
+    ]
+    if not slices:
+        return None
+    return {
+        "type": "pie",
+        "title": "Your Saved Recipe Categories",
+        "labels": [label for label, _ in slices],
+        "values": [count for _, count in slices],
+    }
+
+
+def cooking_time_chart_data(user):
+    """A user's saved recipes per total-time bucket, in one aggregate."""
+    favorites = Favorite.objects.filter(user=user).annotate(
+        total_time=F("recipe__prep_time") + F("recipe__cooking_time")
+    )
+    aggregates = {"favorites": Count("id")}
+    for i, (_, lowest, highest) in enumerate(TIME_BUCKETS):
+        condition = Q(total_time__gte=lowest)
+        if highest is not None:
+            condition &= Q(total_time__lte=highest)
+        aggregates[f"bucket_{i}"] = Count("id", filter=condition)
+    counts = favorites.aggregate(**aggregates)
+    if not counts["favorites"]:
+        return None
+    return {
+        "type": "line",
+        "title": "Your Saved Recipes by Cooking Time",
+        "x_label": "Total Cooking Time (minutes)",
+        "y_label": "Number of Saved Recipes",
+        "labels": [label for label, _, _ in TIME_BUCKETS],
+        "values": [counts[f"bucket_{i}"] for i in range(len(TIME_BUCKETS))],
+    }
+
+
+# Keyed like the rendered charts (generate_all_saved_recipe_charts)
+CHART_DATA = {
+    "ingredients_chart": ingredients_chart_data,
+    "categories_chart": categories_chart_data,
+    "cooking_time_chart": cooking_time_chart_data,
+}
+
+
+def saved_recipe_chart_data(user):
+    """Data for all three favorites charts."""
+    return {key: chart_data(user) for key, chart_data in CHART_DATA.items()}
+
+
+# Representative data for warming up and benchmarking the renderers
+SAMPLE_CHART_DATA = {
+    "ingredients_chart": {
+        "type": "bar",
+        "title": "Most Common Ingredients in Your Saved Recipes",
+        "x_label": "Ingredients",
+        "y_label": "Number of Saved Recipes",
+        "labels": [f"Ingredient {i}" for i in range(1, 11)],
+        "values": list(range(10, 0, -1)),
+    },
+    "categories_chart": {
+        "type": "pie",
+        "title": "Your Saved Recipe Categories",
+        "labels": ["Breakfast", "Lunch", "Dinner", "Dessert"],
+        "values": [4, 3, 2, 1],
+    },
+    "cooking_time_chart": {
+        "type": "line",
+        "title": "Your Saved Recipes by Cooking Time",
+        "x_label": "Total Cooking Time (minutes)",
+        "y_label": "Number of Saved Recipes",
+        "labels": ["0-15 min", "16-30 min", "31-60 min", "60+ min"],
+        "values": [3, 5, 2, 1],
+    },
+}
@@ -0,0 +1,194 @@
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+from .chart_cache import (
+    cached_charts,
+    favorites_version,
+    has_cached_charts,
+    has_charts,
+    render_charts,
+    store_charts,
+)
+from .models import ChartJob
+
+# Favorites charts are rendered off the request path: favorites_list queues
+# a ChartJob and the run_chart_worker command renders it. With
+# RECIPES_CHART_JOBS_EAGER the job runs in-process instead (tests, or a
+# deployment without a worker), when the first chart image is requested.
+# A failed job stays failed until the favorites version changes.
+
+# URL name (favorites/charts/<name>.png) -> key in the rendered charts
+CHARTS = {
+    "ingredients": "ingredients_chart",
+    "categories": "categories_chart",
+    "cooking_time": "cooking_time_chart",
+}
+
+
+class ChartRenderFailed(Exception):
+    """The job for this favorites version failed; see its error."""
+
+
+def is_eager():
+    return getattr(settings, "RECIPES_CHART_JOBS_EAGER", True)
+
+
+def chart_renderer():
+    """ "matplotlib" (PNG, possibly via jobs) or "svg" (drawn per request)."""
+    return getattr(settings, "RECIPES_CHART_RENDERER", "matplotlib")
+
+
+def enqueue_chart_job(user, version):
+    """The job rendering a user's charts for a favorites version, queued if new."""
+    job, created = ChartJob.objects.get_or_create(user=user, version=version)
+    if created:
+        # Jobs for earlier versions (and the charts stored on them) are obsolete
+        ChartJob.objects.filter(user=user).exclude(pk=job.pk).delete()
+    return job
+
+
+def chart_urls(version):
+    """{chart key: image url}; the version makes each favorites state a new URL."""
+    url_name = (
+        "recipes:favorite_chart_svg"
+        if chart_renderer() == "svg"
+        else "recipes:favorite_chart"
+    )
+    return {
+        key: f"{reverse(url_name, args=[name])}?v={version}"
+        for name, key in CHARTS.items()
+    }
+
+
+def find_charts(user_id, version):
+    """Rendered charts from the cache or a finished job, without rendering."""
+    charts = cached_charts(user_id, version)
+    if charts is None:
+        job = ChartJob.objects.filter(
+            user_id=user_id, version=version, status=ChartJob.DONE
+        ).first()
+        if job is not None:
+            store_charts(user_id, version, job.charts, job.render_ms)
+            charts = job.charts
+    return charts
+
+
+def queue_charts(user, version):
+    """The ChartJob the favorites page should wait for, or None.
+
+    None means the chart images can be requested straight away: they are
+    ready, drawn as SVG per request, or (in eager mode) rendered when first
+    requested.
+    """
+    if chart_renderer() == "svg" or is_eager():
+        return None
+    if has_cached_charts(user.pk, version):
+        return None
+    job = enqueue_chart_job(user, version)
+    return None if job.status == ChartJob.DONE else job
+
+
+def saved_recipe_charts(user, version):
+    """Charts for a favorites version, or None while a worker renders them.
+
+    In eager mode the job is run here. If another request (for one of the
+    other chart images) is already running it, this one renders the charts
+    itself rather than wait. Raises ChartRenderFailed for a failed job.
+    """
+    charts = find_charts(user.pk, version)
+    if charts is not None:
+        return charts
+
+    job = enqueue_chart_job(user, version)
+    if is_eager() and job.status == ChartJob.PENDING and claim_job(job.pk):
+        run_chart_job(job.pk)
+        job = ChartJob.objects.filter(pk=job.pk).first()
+    elif is_eager() and job.status in (ChartJob.PENDING, ChartJob.RUNNING):
+        charts, _ = render_charts(user)
+        if has_charts(charts):
+            return charts
+        raise ChartRenderFailed("No charts could be rendered")
+    if job is None:
+        # Superseded by a newer favorites version during the render
+        return None
+    if job.status == ChartJob.FAILED:
+        raise ChartRenderFailed(job.error)
+    if job.status == ChartJob.DONE:
+        store_charts(user.pk, version, job.charts, job.render_ms)
+        return job.charts
+    return None
+
+
+def claim_job(job_id):
+    """Atomically move a pending job to running; False if someone else did."""
+    return (
+        ChartJob.objects.filter(pk=job_id, status=ChartJob.PENDING).update(
+            status=ChartJob.RUNNING, started_at=timezone.now()
+        )
+        == 1
+    )
+
+
+def claim_pending_jobs(limit):
+    """Claim up to limit pending jobs, oldest first; returns their ids."""
+    pending = (
+        ChartJob.objects.filter(status=ChartJob.PENDING)
+        .order_by("created_at", "id")
+        .values_list("id", flat=True)[:limit]
+    )
+    return [job_id for job_id in pending if claim_job(job_id)]
+
+
+def requeue_stale_jobs(older_than):
+    """Return jobs stuck in running (e.g. after a killed worker) to the queue."""
+    return ChartJob.objects.filter(
+        status=ChartJob.RUNNING, started_at__lt=timezone.now() - older_than
+    ).update(status=ChartJob.PENDING, started_at=None)
+
+
+def run_chart_job(job_id):
+    """Render a claimed job and record the outcome on its row."""
+    job = ChartJob.objects.select_related("user").filter(pk=job_id).first()
+    if job is None:
+        # Superseded by a newer favorites version and deleted
+        return None
+
+    charts, render_ms = render_charts(job.user)
+    # update() rather than save() so a job deleted meanwhile stays deleted
+    jobs = ChartJob.objects.filter(pk=job_id)
+    if favorites_version(job.user_id) != job.version:
+        # The favorites changed while rendering, so the charts may show the
+        # newer state; the job for the new version will render them
+        jobs.delete()
+        return None
+    if has_charts(charts):
+        jobs.update(
+            status=ChartJob.DONE,
+            charts=charts,
+            render_ms=render_ms,
+            finished_at=timezone.now(),
+        )
+        return ChartJob.DONE
+    # generate_all_saved_recipe_charts() reports errors as empty charts
+    jobs.update(
+        status=ChartJob.FAILED,
+        error="No charts could be rendered",
+        finished_at=timezone.now(),
+    )
+    return ChartJob.FAILED
+
+
+def chart_job_status(job):
+    """JSON-ready status of a job, with chart URLs once it is done.
+
+    A chart with nothing to show (e.g. no ingredients yet) has a null URL.
+    """
+    status = {"id": job.pk, "status": job.status}
+    if job.status == ChartJob.DONE:
+        urls = chart_urls(job.version)
+        status["charts"] = {
+            key: url if job.charts.get(key) else None for key, url in urls.items()
+        }
+    elif job.status == ChartJob.FAILED:
+        status["error"] = job.error
+    return status
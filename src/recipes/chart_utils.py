@@ -1,13 +1,76 @@
-import matplotlib.pyplot as plt
-import matplotlib
 import io
 import base64
-from collections import Counter
-from django.db.models import Count
-import pandas as pd
-
-# Use non-interactive backend for server environments
-matplotlib.use("Agg")
+import logging
+import queue
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from matplotlib import rcParams
+from matplotlib.artist import setp
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from .chart_data import SAMPLE_CHART_DATA, saved_recipe_chart_data
+
+# matplotlib is only loaded by importing this module; import it lazily (see
+# chart_cache.render_charts) so processes that never draw a PNG chart skip
+# its import time and memory.
+
+logger = logging.getLogger(__name__)
+
+# Figure size (inches) per chart type
+FIGURE_SIZES = {"bar": (12, 6), "pie": (10, 8), "line": (10, 6)}
+
+
+class FigurePool:
+    """Reusable Agg figures per chart type, with a cap on concurrent renders.
+
+    pyplot's global figure manager isn't thread-safe, so charts are drawn
+    on Figure objects with their own FigureCanvasAgg, never registered with
+    pyplot. A figure is checked out for one render and cleared on return,
+    saving figure/canvas construction; the semaphore bounds how many
+    renders (each CPU-bound, mostly holding the GIL) run at once.
+    """
+
+    def __init__(self, max_concurrent):
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._idle = {kind: queue.SimpleQueue() for kind in FIGURE_SIZES}
+
+    def _new_figure(self, kind):
+        figure = Figure(figsize=FIGURE_SIZES[kind])
+        FigureCanvasAgg(figure)
+        return figure
+
+    def warm(self):
+        """Pre-create one figure per concurrent render for every chart type."""
+        for kind, idle in self._idle.items():
+            for _ in range(self.max_concurrent - idle.qsize()):
+                idle.put(self._new_figure(kind))
+
+    @contextmanager
+    def figure(self, kind):
+        """A blank figure of the given chart type, returned to the pool after use."""
+        with self._slots:
+            try:
+                figure = self._idle[kind].get_nowait()
+            except queue.Empty:
+                figure = self._new_figure(kind)
+            try:
+                yield figure
+            finally:
+                # Back to a blank figure with default margins (tight_layout
+                # changes them), so a reused figure renders like a new one
+                figure.clear()
+                figure.subplots_adjust(
+                    **{
+                        name: rcParams[f"figure.subplot.{name}"]
+                        for name in ("left", "right", "bottom", "top")
+                    }
+                )
+                self._idle[kind].put(figure)
+
+
+figure_pool = FigurePool(getattr(settings, "RECIPES_CHART_RENDER_CONCURRENCY", 2))
 
 
 def generate_chart_image(fig):
@@ -24,207 +87,187 @@ def generate_chart_image(fig):
     buffer.seek(0)
     image_base64 = base64.b64encode(buffer.getvalue()).decode("utf-8")
     buffer.close()
-    plt.close(fig)
     return image_base64
 
 
-def create_ingredients_bar_chart(user_favorites):
+def create_ingredients_bar_chart(data):
     """Create bar chart showing most common ingredients in user's saved recipes."""
-    if not user_favorites:
+    if not data:
         return None
 
-    # Collect all ingredients from saved recipes
-    ingredient_counts = Counter()
-    for favorite in user_favorites:
-        recipe_ingredients = favorite.recipe.ingredients.all()
-        for ingredient in recipe_ingredients:
-            ingredient_counts[ingredient.name] += 1
-
-    if not ingredient_counts:
-        return None
+    ingredients, counts = data["labels"], data["values"]
 
-    # Get top 10 most common ingredients
-    top_ingredients = ingredient_counts.most_common(10)
-    if not top_ingredients:
-        return None
+    # Draw on a pooled figure (thread-safe, unlike pyplot)
+    with figure_pool.figure("bar") as fig:
+        ax = fig.add_subplot()
 
-    ingredients, counts = zip(*top_ingredients)
+        # Create bar chart with styling
+        bars = ax.bar(ingredients, counts, color="#2c3e50", alpha=0.8)
 
-    # Create figure and axis
-    fig, ax = plt.subplots(figsize=(12, 6))
-
-    # Create bar chart with styling
-    bars = ax.bar(ingredients, counts, color="#2c3e50", alpha=0.8)
-
-    # Customize the chart
-    ax.set_title(
-        "Most Common Ingredients in Your Saved Recipes",
-        fontsize=16,
-        fontweight="bold",
-        color="#2c3e50",
-        pad=20,
-    )
-    ax.set_xlabel("Ingredients", fontsize=12, color="#495057")
-    ax.set_ylabel("Number of Saved Recipes", fontsize=12, color="#495057")
-
-    # Rotate x-axis labels for better readability
-    plt.xticks(rotation=45, ha="right")
-
-    # Add value labels on top of bars
-    for bar, count in zip(bars, counts):
-        ax.text(
-            bar.get_x() + bar.get_width() / 2,
-            bar.get_height() + 0.1,
-            str(count),
-            ha="center",
-            va="bottom",
+        # Customize the chart
+        ax.set_title(
+            data["title"],
+            fontsize=16,
             fontweight="bold",
+            color="#2c3e50",
+            pad=20,
         )
+        ax.set_xlabel(data["x_label"], fontsize=12, color="#495057")
+        ax.set_ylabel(data["y_label"], fontsize=12, color="#495057")
 
-    # Style the chart
-    ax.grid(axis="y", alpha=0.3, linestyle="--")
-    ax.set_axisbelow(True)
+        # Rotate x-axis labels for better readability
+        setp(ax.get_xticklabels(), rotation=45, ha="right")
 
-    # Adjust layout
-    plt.tight_layout()
+        # Add value labels on top of bars
+        for bar, count in zip(bars, counts):
+            ax.text(
+                bar.get_x() + bar.get_width() / 2,
+                bar.get_height() + 0.1,
+                str(count),
+                ha="center",
+                va="bottom",
+                fontweight="bold",
+            )
 
-    return generate_chart_image(fig)
+        # Style the chart
+        ax.grid(axis="y", alpha=0.3, linestyle="--")
+        ax.set_axisbelow(True)
 
+        # Adjust layout
+        fig.tight_layout()
 
-def create_categories_pie_chart(user_favorites):
-    """Create pie chart showing distribution of saved recipes by category."""
-    if not user_favorites:
-        return None
+        return generate_chart_image(fig)
 
-    # Count recipes by category
-    category_counts = Counter()
-    for favorite in user_favorites:
-        category_display = favorite.recipe.get_category_display()
-        category_counts[category_display] += 1
 
-    if not category_counts:
+def create_categories_pie_chart(data):
+    """Create pie chart showing distribution of saved recipes by category."""
+    if not data:
         return None
 
-    categories = list(category_counts.keys())
-    counts = list(category_counts.values())
-
-    # Create figure and axis
-    fig, ax = plt.subplots(figsize=(10, 8))
-
-    # Define colors that match the site's color scheme
-    colors = [
-        "#2c3e50",
-        "#34495e",
-        "#7f8c8d",
-        "#95a5a6",
-        "#bdc3c7",
-        "#ecf0f1",
-        "#e74c3c",
-        "#c0392b",
-        "#f39c12",
-        "#f1c40f",
-    ]
-
-    # Create pie chart
-    wedges, texts, autotexts = ax.pie(
-        counts,
-        labels=categories,
-        autopct="%1.1f%%",
-        colors=colors[: len(categories)],
-        startangle=90,
-        textprops={"fontsize": 11},
-    )
+    categories, counts = data["labels"], data["values"]
+
+    # Draw on a pooled figure (thread-safe, unlike pyplot)
+    with figure_pool.figure("pie") as fig:
+        ax = fig.add_subplot()
+
+        # Define colors that match the site's color scheme
+        colors = [
+            "#2c3e50",
+            "#34495e",
+            "#7f8c8d",
+            "#95a5a6",
+            "#bdc3c7",
+            "#ecf0f1",
+            "#e74c3c",
+            "#c0392b",
+            "#f39c12",
+            "#f1c40f",
+        ]
+
+        # Create pie chart
+        wedges, texts, autotexts = ax.pie(
+            counts,
+            labels=categories,
+            autopct="%1.1f%%",
+            colors=colors[: len(categories)],
+            startangle=90,
+            textprops={"fontsize": 11},
+        )
 
-    # Customize the chart
-    ax.set_title(
-        "Your Saved Recipe Categories",
-        fontsize=16,
-        fontweight="bold",
-        color="#2c3e50",
-        pad=20,
-    )
+        # Customize the chart
+        ax.set_title(
+            data["title"],
+            fontsize=16,
+            fontweight="bold",
+            color="#2c3e50",
+            pad=20,
+        )
 
-    # Make percentage text bold
-    for autotext in autotexts:
-        autotext.set_color("white")
-        autotext.set_fontweight("bold")
-        autotext.set_fontsize(10)
+        # Make percentage text bold
+        for autotext in autotexts:
+            autotext.set_color("white")
+            autotext.set_fontweight("bold")
+            autotext.set_fontsize(10)
 
-    # Equal aspect ratio ensures pie chart is circular
-    ax.axis("equal")
+        # Equal aspect ratio ensures pie chart is circular
+        ax.axis("equal")
 
-    return generate_chart_image(fig)
+        return generate_chart_image(fig)
 
 
-def create_cooking_time_line_chart(user_favorites):
+def create_cooking_time_line_chart(data):
     """Create line chart showing cooking time preferences."""
-    if not user_favorites:
+    if not data:
         return None
 
-    # Define time ranges
-    time_ranges = ["0-15 min", "16-30 min", "31-60 min", "60+ min"]
-    range_counts = [0, 0, 0, 0]
-
-    # Categorize recipes by total cooking time
-    for favorite in user_favorites:
-        total_time = favorite.recipe.total_time
-        if total_time <= 15:
-            range_counts[0] += 1
-        elif total_time <= 30:
-            range_counts[1] += 1
-        elif total_time <= 60:
-            range_counts[2] += 1
-        else:
-            range_counts[3] += 1
-
-    # Create figure and axis
-    fig, ax = plt.subplots(figsize=(10, 6))
-
-    # Create line chart with markers
-    line = ax.plot(
-        time_ranges,
-        range_counts,
-        marker="o",
-        linewidth=3,
-        markersize=8,
-        color="#2c3e50",
-        markerfacecolor="#e74c3c",
-    )
+    time_ranges, range_counts = data["labels"], data["values"]
+
+    # Draw on a pooled figure (thread-safe, unlike pyplot)
+    with figure_pool.figure("line") as fig:
+        ax = fig.add_subplot()
+
+        # Create line chart with markers
+        line = ax.plot(
+            time_ranges,
+            range_counts,
+            marker="o",
+            linewidth=3,
+            markersize=8,
+            color="#2c3e50",
+            markerfacecolor="#e74c3c",
+        )
 
-    # Customize the chart
-    ax.set_title(
-        "Your Saved Recipes by Cooking Time",
-        fontsize=16,
-        fontweight="bold",
-        color="#2c3e50",
-        pad=20,
-    )
-    ax.set_xlabel("Total Cooking Time (minutes)", fontsize=12, color="#495057")
-    ax.set_ylabel("Number of Saved Recipes", fontsize=12, color="#495057")
-
-    # Add value labels on data points
-    for i, count in enumerate(range_counts):
-        ax.text(
-            i,
-            count + max(range_counts) * 0.02,
-            str(count),
-            ha="center",
-            va="bottom",
+        # Customize the chart
+        ax.set_title(
+            data["title"],
+            fontsize=16,
             fontweight="bold",
-            fontsize=11,
+            color="#2c3e50",
+            pad=20,
         )
+        ax.set_xlabel(data["x_label"], fontsize=12, color="#495057")
+        ax.set_ylabel(data["y_label"], fontsize=12, color="#495057")
+
+        # Add value labels on data points
+        for i, count in enumerate(range_counts):
+            ax.text(
+                i,
+                count + max(range_counts) * 0.02,
+                str(count),
+                ha="center",
+                va="bottom",
+                fontweight="bold",
+                fontsize=11,
+            )
+
+        # Style the chart
+        ax.grid(True, alpha=0.3, linestyle="--")
+        ax.set_axisbelow(True)
+
+        # Set y-axis to start from 0 and add some padding
+        ax.set_ylim(0, max(range_counts) * 1.15 if max(range_counts) > 0 else 1)
 
-    # Style the chart
-    ax.grid(True, alpha=0.3, linestyle="--")
-    ax.set_axisbelow(True)
+        # Adjust layout
+        fig.tight_layout()
 
-    # Set y-axis to start from 0 and add some padding
-    ax.set_ylim(0, max(range_counts) * 1.15 if max(range_counts) > 0 else 1)
+        return generate_chart_image(fig)
 
-    # Adjust layout
-    plt.tight_layout()
 
-    return generate_chart_image(fig)
+def render_charts_from_data(data):
+    """Render every chart in a saved_recipe_chart_data()-shaped dict."""
+    return {
+        "ingredients_chart": create_ingredients_bar_chart(data["ingredients_chart"]),
+        "categories_chart": create_categories_pie_chart(data["categories_chart"]),
+        "cooking_time_chart": create_cooking_time_line_chart(
+            data["cooking_time_chart"]
+        ),
+    }
+
+
+def warm_chart_renderers():
+    """Fill the figure pool and render each chart type once (font loading etc.)."""
+    figure_pool.warm()
+    render_charts_from_data(SAMPLE_CHART_DATA)
 
 
 def generate_all_saved_recipe_charts(user):
@@ -237,31 +280,12 @@ def generate_all_saved_recipe_charts(user):
         }
 
     try:
-        # Get user's saved recipes
-        user_favorites = user.favorites.select_related("recipe").prefetch_related(
-            "recipe__ingredients"
-        )
-
-        # Only generate charts if user has saved recipes
-        if not user_favorites.exists():
-            return {
-                "ingredients_chart": None,
-                "categories_chart": None,
-                "cooking_time_chart": None,
-            }
-
-        # Generate all charts
-        charts = {
-            "ingredients_chart": create_ingredients_bar_chart(user_favorites),
-            "categories_chart": create_categories_pie_chart(user_favorites),
-            "cooking_time_chart": create_cooking_time_line_chart(user_favorites),
-        }
-
-        return charts
+        # Aggregate the numbers in SQL, then draw them
+        return render_charts_from_data(saved_recipe_chart_data(user))
 
-    except Exception as e:
-        # Log the error in production, return empty charts for now
-        print(f"Chart generation error: {e}")
+    except Exception:
+        # Logged with its traceback; the page shows no charts instead of failing
+        logger.exception("Chart generation failed for user %s", user.pk)
         return {
             "ingredients_chart": None,
             "categories_chart": None,
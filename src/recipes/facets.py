@@ -0,0 +1,143 @@
+import numpy as np
+from django.db.models import Count, Q
+from .models import Recipe
+
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+
+# (label, lowest, highest) in minutes of total time; the same buckets the
+# cooking time chart in chart_utils uses
+TIME_BUCKETS = (
+    ("0-15 min", 0, 15),
+    ("16-30 min", 16, 30),
+    ("31-60 min", 31, 60),
+    ("60+ min", 61, None),
+)
+
+# (label, lowest, highest) servings
+SERVINGS_BUCKETS = (
+    ("1-2", 1, 2),
+    ("3-4", 3, 4),
+    ("5-6", 5, 6),
+    ("7+", 7, None),
+)
+
+
+def _range_filter(field, lowest, highest):
+    condition = Q(**{f"{field}__gte": lowest})
+    if highest is not None:
+        condition &= Q(**{f"{field}__lte": highest})
+    return condition
+
+
+def _facet_aggregates():
+    """Conditional Count expressions for every facet value, keyed by alias."""
+    aggregates = {}
+    for value, _ in Recipe.CATEGORY_CHOICES:
+        aggregates[f"category_{value}"] = Count("pk", filter=Q(category=value))
+    for value in DIFFICULTIES:
+        aggregates[f"difficulty_{value}"] = Count("pk", filter=Q(difficulty=value))
+    for i, (_, lowest, highest) in enumerate(TIME_BUCKETS):
+        aggregates[f"time_{i}"] = Count(
+            "pk", filter=_range_filter("total_minutes", lowest, highest)
+        )
+    for i, (_, lowest, highest) in enumerate(SERVINGS_BUCKETS):
+        aggregates[f"servings_{i}"] = Count(
+            "pk", filter=_range_filter("servings", lowest, highest)
+        )
+    return aggregates
+
+
+def _build_facets(counts):
+    """Shape flat {alias: count} results into per-facet lists."""
+    return {
+        "category": [
+            {"value": value, "label": label, "count": counts[f"category_{value}"]}
+            for value, label in Recipe.CATEGORY_CHOICES
+        ],
+        "difficulty": [
+            {"value": value, "label": value, "count": counts[f"difficulty_{value}"]}
+            for value in DIFFICULTIES
+        ],
+        "total_time": [
+            {
+                "label": label,
+                "lowest": lowest,
+                "highest": highest,
+                "count": counts[f"time_{i}"],
+            }
+            for i, (label, lowest, highest) in enumerate(TIME_BUCKETS)
+        ],
+        "servings": [
+            {
+                "label": label,
+                "lowest": lowest,
+                "highest": highest,
+                "count": counts[f"servings_{i}"],
+            }
+            for i, (label, lowest, highest) in enumerate(SERVINGS_BUCKETS)
+        ],
+    }
+
+
+def compute_facets(queryset):
+    """Facet counts for a with_metrics() queryset in a single aggregate query."""
+    counts = queryset.order_by().aggregate(**_facet_aggregates())
+    return _build_facets(counts)
+
+
+def compute_array_facets(categories, difficulties, total_times, servings):
+    """Facet counts from columnar arrays (see PantryIndex), without a query.
+
+    categories holds indexes into Recipe.CATEGORY_CHOICES and difficulties
+    indexes into DIFFICULTIES.
+    """
+    counts = {}
+    category_counts = np.bincount(
+        categories[categories >= 0], minlength=len(Recipe.CATEGORY_CHOICES)
+    )
+    for code, (value, _) in enumerate(Recipe.CATEGORY_CHOICES):
+        counts[f"category_{value}"] = int(category_counts[code])
+    difficulty_counts = np.bincount(difficulties, minlength=len(DIFFICULTIES))
+    for code, value in enumerate(DIFFICULTIES):
+        counts[f"difficulty_{value}"] = int(difficulty_counts[code])
+    for prefix, buckets, values in (
+        ("time", TIME_BUCKETS, total_times),
+        ("servings", SERVINGS_BUCKETS, servings),
+    ):
+        for i, (_, lowest, highest) in enumerate(buckets):
+            in_bucket = values >= lowest
+            if highest is not None:
+                in_bucket &= values <= highest
+            counts[f"{prefix}_{i}"] = int(np.count_nonzero(in_bucket))
+    return _build_facets(counts)
+
+
+def facet_links(request, facets):
+    """Add a "url" to each facet value that narrows the search to it.
+
+    Time buckets map to min/max_cooking_time and servings buckets to
+    min/max_servings, so each link finds the recipes its count covers. "Show All" and the page cursor
+    are dropped so the link starts a fresh, filtered search.
+    """
+
+    def url(**params):
+        query = request.GET.copy()
+        for name in ("show_all", "cursor"):
+            query.pop(name, None)
+        for name, value in params.items():
+            query.pop(name, None)
+            if value is not None:
+                query[name] = value
+        return f"?{query.urlencode()}"
+
+    for entry in facets["category"]:
+        entry["url"] = url(category=entry["value"])
+    for entry in facets["difficulty"]:
+        entry["url"] = url(difficulty=entry["value"])
+    for entry in facets["total_time"]:
+        entry["url"] = url(
+            min_cooking_time=entry["lowest"] or None, max_cooking_time=entry["highest"]
+        )
+    for entry in facets["servings"]:
+        entry["url"] = url(min_servings=entry["lowest"], max_servings=entry["highest"])
+    return facets
@@ -0,0 +1,62 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import Favorite, Recipe
+
+# Recipe.favorites_count, the denormalized number of favorites behind the
+# "most popular" sort. Signals (recipes.signals) apply each favorite added
+# or removed as an F() delta; reconcile_favorites_counts() (the
+# reconcile_favorites_count command) repairs any drift.
+
+
+def add_recipe_favorites(recipe_id, delta):
+    """Apply a favorite added (delta=1) or removed (delta=-1) to favorites_count.
+
+    A single UPDATE with F(), so concurrent favorites never lose a count.
+    A count that has drifted below zero is left for reconcile_favorites_counts.
+    """
+    Recipe.objects.filter(pk=recipe_id, favorites_count__gte=-min(delta, 0)).update(
+        favorites_count=F("favorites_count") + delta
+    )
+
+
+def counted_favorites():
+    """Subquery counting a recipe's Favorite rows (for OuterRef("pk"))."""
+    counts = (
+        Favorite.objects.filter(recipe_id=OuterRef("pk"))
+        .order_by()
+        .values("recipe_id")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def reconcile_favorites_counts(batch_size=1000, log=None):
+    """Repair Recipe.favorites_count wherever it disagrees with Favorite.
+
+    Recipes are checked in id order, batch_size at a time; drifted rows are
+    recounted inside the UPDATE itself, so a favorite made meanwhile is
+    never overwritten. Returns (checked, repaired).
+    """
+    log = log or (lambda message: None)
+    recipes = (
+        Recipe.objects.order_by("id")
+        .annotate(actual=counted_favorites())
+        .values_list("id", "favorites_count", "actual")
+    )
+    checked = repaired = 0
+    last_id = 0
+    while True:
+        batch = list(recipes.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        drifted = [recipe_id for recipe_id, stored, actual in batch if stored != actual]
+        if drifted:
+            Recipe.objects.filter(pk__in=drifted).update(
+                favorites_count=counted_favorites()
+            )
+        checked += len(batch)
+        repaired += len(drifted)
+        log(f"Checked {checked} recipe(s), repaired {repaired}")
+    return checked, repaired
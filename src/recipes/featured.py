@@ -0,0 +1,53 @@
+import random
+from django.core.cache import cache
+from django.db.models import Max, Min
+from .catalog import catalog_generation
+from .models import Recipe
+
+# Uniformly random recipes without ORDER BY RANDOM(), which reads and sorts
+# the whole table. A random id between the smallest and largest is looked
+# up by primary key; ids lost to deletions are retried a few times, then
+# the next id above is taken, which is still one indexed lookup.
+
+PROBES = 3
+
+BOUNDS_KEY = "recipes:featured:bounds"
+BOUNDS_TIMEOUT = 60 * 60 * 24  # seconds
+
+_random = random.SystemRandom()
+
+
+def id_bounds():
+    """(lowest, highest) recipe id, cached per catalog generation."""
+    # One key holding (generation, bounds): a new generation overwrites it
+    # instead of leaving an entry per generation behind
+    generation = catalog_generation()
+    cached = cache.get(BOUNDS_KEY)
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+    bounds = Recipe.objects.aggregate(lowest=Min("id"), highest=Max("id"))
+    bounds = (bounds["lowest"], bounds["highest"])
+    cache.set(BOUNDS_KEY, (generation, bounds), BOUNDS_TIMEOUT)
+    return bounds
+
+
+def random_recipe(queryset=None):
+    """A random recipe (with_metrics() by default), or None when there are none.
+
+    Every existing id is equally likely as long as a probe hits, which it
+    does with probability (recipes / id range) each time; only when all
+    PROBES miss does the fallback favour ids that follow a gap.
+    """
+    queryset = Recipe.objects.with_metrics() if queryset is None else queryset
+    lowest, highest = id_bounds()
+    if lowest is None:
+        return None
+    for _ in range(PROBES):
+        recipe = queryset.filter(pk=_random.randint(lowest, highest)).first()
+        if recipe is not None:
+            return recipe
+    pick = _random.randint(lowest, highest)
+    return (
+        queryset.filter(pk__gte=pick).order_by("pk").first()
+        or queryset.filter(pk__lt=pick).order_by("-pk").first()
+    )
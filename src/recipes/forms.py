@@ -32,6 +32,15 @@ class RecipeSearchForm(forms.Form):
         help_text="Enter ingredient names (comma-separated for multiple)",
     )
 
+    # Pantry mode: rank by how much of the recipe the listed ingredients cover
+    pantry_mode = forms.BooleanField(
+        required=False,
+        widget=forms.CheckboxInput(attrs={"class": "form-checkbox"}),
+        label="What can I cook?",
+        help_text="Treat the ingredients above as your pantry and rank recipes by "
+        "how many of their ingredients you already have",
+    )
+
     # Category dropdown
     category = forms.ChoiceField(
         choices=[("", "All Categories")] + Recipe.CATEGORY_CHOICES,
@@ -53,6 +62,22 @@ class RecipeSearchForm(forms.Form):
         label="Difficulty Level",
     )
 
+    # Minimum cooking time (set by the search page's time facet links)
+    min_cooking_time = forms.IntegerField(
+        min_value=1,
+        max_value=480,
+        required=False,
+        widget=forms.NumberInput(
+            attrs={
+                "placeholder": "Min minutes",
+                "class": "form-control search-input",
+                "min": "1",
+                "max": "480",
+            }
+        ),
+        label="Minimum Cooking Time (minutes)",
+    )
+
     # Maximum cooking time
     max_cooking_time = forms.IntegerField(
         min_value=1,
@@ -101,9 +126,29 @@ class RecipeSearchForm(forms.Form):
         label="Maximum Servings",
     )
 
+    # Result order (ignored in pantry mode, which ranks by coverage)
+    sort = forms.ChoiceField(
+        choices=[("", "Best match"), ("popular", "Most popular")],
+        required=False,
+        widget=forms.Select(attrs={"class": "form-control search-select"}),
+        label="Sort By",
+    )
+
     def clean(self):
-        """Custom validation to ensure min_servings <= max_servings."""
+        """Custom validation to ensure each minimum <= its maximum."""
         cleaned_data = super().clean()
+        min_cooking_time = cleaned_data.get("min_cooking_time")
+        max_cooking_time = cleaned_data.get("max_cooking_time")
+
+        if (
+            min_cooking_time
+            and max_cooking_time
+            and min_cooking_time > max_cooking_time
+        ):
+            raise forms.ValidationError(
+                "Minimum cooking time cannot be greater than maximum cooking time."
+            )
+
         min_servings = cleaned_data.get("min_servings")
         max_servings = cleaned_data.get("max_servings")
 
@@ -125,6 +170,7 @@ class RecipeSearchForm(forms.Form):
                 self.cleaned_data.get("ingredients"),
                 self.cleaned_data.get("category"),
                 self.cleaned_data.get("difficulty"),
+                self.cleaned_data.get("min_cooking_time"),
                 self.cleaned_data.get("max_cooking_time"),
                 self.cleaned_data.get("min_servings"),
                 self.cleaned_data.get("max_servings"),
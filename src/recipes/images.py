@@ -0,0 +1,354 @@
+import base64
+import io
+import multiprocessing
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import Q
+from .models import Recipe
+from .storage import is_content_addressed
+
+# Resized copies of Recipe.image for responsive <img srcset>. Each width is
+# stored as JPEG and WebP in a derivatives/ directory beside the original,
+# and Recipe.image_derivatives records which widths exist for which source,
+# so templates can build srcset without touching storage.
+
+WIDTHS = (160, 480, 1200)
+FORMATS = {"jpeg": ".jpg", "webp": ".webp"}
+QUALITY = {"jpeg": 82, "webp": 80}
+DERIVATIVES_DIR = "derivatives"
+
+# Low-quality image placeholder: a tiny JPEG stored on the Recipe row as a
+# data: URI and painted behind the real image while it loads
+PLACEHOLDER_SIZE = 20
+PLACEHOLDER_QUALITY = 40
+
+
+def image_storage():
+    return Recipe._meta.get_field("image").storage
+
+
+def derivative_storage():
+    # Same MEDIA_ROOT, but files keep the names derivative_name() gives them
+    # (the image field's storage would rename them after their content)
+    return default_storage
+
+
+def derivative_name(source, width, fmt):
+    """Storage name of one derivative, e.g. recipe_images/derivatives/x_480w.webp."""
+    directory, filename = posixpath.split(source)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, DERIVATIVES_DIR, f"{stem}_{width}w{FORMATS[fmt]}")
+
+
+def derivative_widths(original_width):
+    """The WIDTHS narrower than the original, plus the original size if small.
+
+    Images are never upscaled: a 900px original gets 160, 480 and 900.
+    """
+    widths = [width for width in WIDTHS if width < original_width]
+    if original_width <= WIDTHS[-1]:
+        widths.append(original_width)
+    return widths
+
+
+def _encode(image, fmt, icc_profile):
+    buffer = io.BytesIO()
+    options = {"quality": QUALITY[fmt]}
+    if fmt == "jpeg":
+        options.update(optimize=True, progressive=True)
+    else:
+        options.update(method=4)
+    if icc_profile:
+        options["icc_profile"] = icc_profile
+    # No exif= argument: camera metadata (and GPS position) is dropped
+    image.save(buffer, format=fmt.upper(), **options)
+    return buffer.getvalue()
+
+
+def _open_image(name, storage, max_size):
+    """A stored image decoded to RGB (at least max_size), or None if unreadable.
+
+    Returns (image, icc_profile).
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with storage.open(name) as file, Image.open(file) as image:
+            # Let the JPEG decoder scale down while decoding (much cheaper
+            # than a full-size decode followed by a resize)
+            image.draft("RGB", (max_size, max_size))
+            icc_profile = image.info.get("icc_profile")
+            # Apply the EXIF orientation before the EXIF data is dropped
+            return ImageOps.exif_transpose(image).convert("RGB"), icc_profile
+    except (OSError, UnidentifiedImageError):
+        return None
+
+
+def make_placeholder(image):
+    """A ~20px JPEG of the image as a data: URI (a few hundred bytes)."""
+    from PIL import Image
+
+    tiny = image.copy()
+    tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.BILINEAR)
+    buffer = io.BytesIO()
+    tiny.save(buffer, format="JPEG", quality=PLACEHOLDER_QUALITY, optimize=True)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def process_image(source):
+    """Write every derivative of a stored image and build its placeholder.
+
+    Returns the Recipe fields to store (image_derivatives, image_placeholder),
+    or an empty dict when the source can't be read (missing or not an image).
+    """
+    from PIL import Image
+
+    opened = _open_image(source, image_storage(), WIDTHS[-1])
+    if opened is None:
+        return {}
+    image, icc_profile = opened
+
+    storage = derivative_storage()
+    widths = derivative_widths(image.width)
+    for width in widths:
+        if width < image.width:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+        else:
+            resized = image
+        for fmt in FORMATS:
+            name = derivative_name(source, width, fmt)
+            # Overwrite rather than let the storage pick a suffixed name
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(_encode(resized, fmt, icc_profile)))
+    return {
+        "image_derivatives": {"source": source, "widths": widths},
+        "image_placeholder": make_placeholder(image),
+    }
+
+
+def has_current_derivatives(name, derivatives):
+    return bool(name) and (derivatives or {}).get("source") == name
+
+
+def refresh_recipe_image(recipe):
+    """Derivatives and placeholder for a recipe whose image changed; True if written."""
+    name = recipe.image.name if recipe.image else ""
+    # The shared default image is left to backfill_derivatives: processing
+    # it here would rewrite every recipe still using it
+    if not name or name == Recipe._meta.get_field("image").default:
+        return False
+    if has_current_derivatives(name, recipe.image_derivatives):
+        return False
+    fields = process_image(name)
+    if not fields:
+        if recipe.image_placeholder:
+            # Don't keep showing the previous image's placeholder
+            Recipe.objects.filter(pk=recipe.pk).update(image_placeholder="")
+            recipe.image_placeholder = ""
+        return False
+    # update() so the post_save signal that called this doesn't fire again;
+    # other recipes sharing the file get the derivatives too if they lack them
+    stale = Q(image_derivatives__source__isnull=True) | ~Q(
+        image_derivatives__source=name
+    )
+    Recipe.objects.filter(Q(pk=recipe.pk) | stale, image=name).update(**fields)
+    for field, value in fields.items():
+        setattr(recipe, field, value)
+    return True
+
+
+def srcset(name, derivatives, fmt="jpeg"):
+    """The srcset attribute value for an image's derivatives ("" if none)."""
+    if not has_current_derivatives(name, derivatives):
+        return ""
+    storage = derivative_storage()
+    return ", ".join(
+        f"{storage.url(derivative_name(name, width, fmt))} {width}w"
+        for width in derivatives["widths"]
+    )
+
+
+def pending_sources():
+    """Stored image names whose recipes lack current derivatives."""
+    pending = set()
+    for name, derivatives in Recipe.objects.exclude(image="").values_list(
+        "image", "image_derivatives"
+    ):
+        if name and not has_current_derivatives(name, derivatives):
+            pending.add(name)
+    return sorted(pending)
+
+
+def backfill_derivatives(workers=1, log=None):
+    """Generate missing derivatives for every recipe image, across processes.
+
+    Each finished image is recorded on its recipes straight away, so an
+    interrupted run resumes where it stopped. Returns (done, failed).
+    """
+    log = log or (lambda message: None)
+    sources = pending_sources()
+    log(f"{len(sources)} image(s) need derivatives")
+    done = failed = 0
+
+    def record(source, fields):
+        nonlocal done, failed
+        if fields:
+            Recipe.objects.filter(image=source).update(**fields)
+            done += 1
+            widths = fields["image_derivatives"]["widths"]
+            log(f"{source}: {', '.join(map(str, widths))}px")
+        else:
+            failed += 1
+            log(f"{source}: unreadable, skipped")
+
+    if workers <= 1 or len(sources) <= 1:
+        for source in sources:
+            record(source, process_image(source))
+        return done, failed
+
+    # Workers only decode and write files; the database is updated here.
+    # Forked children must not reuse the parent's database connections.
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        for source, fields in zip(sources, executor.map(process_image, sources)):
+            record(source, fields)
+    return done, failed
+
+
+def _move_derivatives(old, new, derivatives):
+    """Copy an image's derivatives to the names they get under its new name."""
+    if not has_current_derivatives(old, derivatives):
+        return {}
+    storage = derivative_storage()
+    for width in derivatives["widths"]:
+        for fmt in FORMATS:
+            source = derivative_name(old, width, fmt)
+            target = derivative_name(new, width, fmt)
+            if not storage.exists(source):
+                return {}  # incomplete: let backfill_derivatives redo them
+            if not storage.exists(target):
+                with storage.open(source) as file:
+                    storage.save(target, file)
+    return {"source": new, "widths": derivatives["widths"]}
+
+
+def _delete_derivatives(name, derivatives):
+    if not has_current_derivatives(name, derivatives):
+        return
+    storage = derivative_storage()
+    for width in derivatives["widths"]:
+        for fmt in FORMATS:
+            storage.delete(derivative_name(name, width, fmt))
+
+
+def rehash_images(batch_size=200, delete_originals=False, log=None):
+    """Move legacy recipe images to content-addressed names, batch by batch.
+
+    Each batch stores its files under their hashes (identical files collapse
+    into one), then rewrites Recipe.image, and the derivatives' source, in a
+    single bulk update. Names that are already hashed are skipped, so an
+    interrupted run can be restarted. Returns (moved, missing).
+    """
+    log = log or (lambda message: None)
+    storage = image_storage()
+    legacy = sorted(
+        {
+            name
+            for name in Recipe.objects.exclude(image="")
+            .exclude(image__isnull=True)
+            .values_list("image", flat=True)
+            if not is_content_addressed(name)
+        }
+    )
+    log(f"{len(legacy)} image name(s) to rehash")
+    moved = missing = 0
+    for start in range(0, len(legacy), batch_size):
+        renames = {}
+        for name in legacy[start : start + batch_size]:
+            try:
+                with storage.open(name) as file:
+                    renames[name] = storage.save(name, file)
+            except FileNotFoundError:
+                missing += 1
+                log(f"{name}: file missing, left as is")
+
+        recipes = list(
+            Recipe.objects.filter(image__in=list(renames)).only(
+                "id", "image", "image_derivatives"
+            )
+        )
+        previous = {}
+        for recipe in recipes:
+            old = recipe.image.name
+            previous[old] = recipe.image_derivatives
+            recipe.image_derivatives = _move_derivatives(
+                old, renames[old], recipe.image_derivatives
+            )
+            recipe.image = renames[old]
+        # bulk_update() sends no post_save, so nothing is regenerated
+        with transaction.atomic():
+            Recipe.objects.bulk_update(recipes, ["image", "image_derivatives"])
+        moved += len(renames)
+        log(f"Rehashed {moved} of {len(legacy)}")
+
+        if delete_originals:
+            for old, new in renames.items():
+                if old != new:
+                    storage.delete(old)
+                    _delete_derivatives(old, previous.get(old))
+    return moved, missing
+
+
+def placeholder_for(name, derivatives):
+    """Placeholder for a stored image, decoded from its smallest derivative
+    when there is one (a few KB instead of the multi-megabyte original)."""
+    if has_current_derivatives(name, derivatives):
+        smallest = derivative_name(name, derivatives["widths"][0], "jpeg")
+        opened = _open_image(smallest, derivative_storage(), PLACEHOLDER_SIZE)
+        if opened is not None:
+            return make_placeholder(opened[0])
+    opened = _open_image(name, image_storage(), PLACEHOLDER_SIZE)
+    return "" if opened is None else make_placeholder(opened[0])
+
+
+def backfill_placeholders(batch_size=500, log=None):
+    """Compute image_placeholder for recipes that lack one, batch by batch.
+
+    Each batch is saved with one bulk_update, so an interrupted run keeps
+    what it finished. Returns (done, failed).
+    """
+    log = log or (lambda message: None)
+    pending = (
+        Recipe.objects.exclude(image="")
+        .exclude(image__isnull=True)
+        .filter(image_placeholder="")
+        .order_by("id")
+        .values_list("id", "image", "image_derivatives")
+    )
+    done = failed = 0
+    last_id = 0
+    while True:
+        batch = list(pending.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        by_name = {}
+        recipes = []
+        for recipe_id, name, derivatives in batch:
+            if name not in by_name:
+                by_name[name] = placeholder_for(name, derivatives)
+            if by_name[name]:
+                recipes.append(Recipe(id=recipe_id, image_placeholder=by_name[name]))
+            else:
+                failed += 1
+        Recipe.objects.bulk_update(recipes, ["image_placeholder"])
+        done += len(recipes)
+        log(f"Placeholders: {done} done, {failed} unreadable")
+    return done, failed
@@ -0,0 +1,277 @@
+import datetime
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    IntegerField,
+    Q,
+    Value,
+    When,
+)
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .facets import TIME_BUCKETS
+from .models import (
+    CategoryFavoriteRollup,
+    CookingTimeFavoriteRollup,
+    Favorite,
+    IngredientFavoriteRollup,
+    Recipe,
+)
+
+# Site-wide favorites insights, read from rollup tables instead of
+# aggregating the Favorite table per request. Signals (recipes.signals)
+# apply each change as a counter delta; rebuild_rollups() recomputes
+# everything from scratch (rebuild_insights command) should they drift.
+
+TOP_INGREDIENTS = 10
+CATEGORY_MONTHS = 12
+
+
+def time_bucket(total_time):
+    """Index into TIME_BUCKETS for a total time in minutes."""
+    for i, (_, lowest, highest) in enumerate(TIME_BUCKETS):
+        if total_time >= lowest and (highest is None or total_time <= highest):
+            return i
+    return 0
+
+
+def month_of(moment):
+    """First day of the (UTC) month a favorite was made in."""
+    return timezone.localtime(moment, datetime.timezone.utc).date().replace(day=1)
+
+
+def _add(model, delta, field, values, **fixed):
+    """Add delta to the favorites counter of the rows where field is in values.
+
+    Missing rows are created first (ignore_conflicts makes that safe against
+    a concurrent insert), then one UPDATE applies the delta with F() so
+    concurrent changes never overwrite each other.
+    """
+    values = list(values)
+    if not values or not delta:
+        return
+    model.objects.bulk_create(
+        [model(**fixed, **{field: value}) for value in values],
+        ignore_conflicts=True,
+    )
+    model.objects.filter(**fixed, **{f"{field}__in": values}).update(
+        favorites=F("favorites") + delta
+    )
+
+
+def add_ingredient_favorites(ingredient_ids, delta):
+    _add(IngredientFavoriteRollup, delta, "ingredient_id", ingredient_ids)
+
+
+def add_category_favorites(month, category, delta):
+    _add(CategoryFavoriteRollup, delta, "category", [category], month=month)
+
+
+def add_cooking_time_favorites(bucket, delta):
+    _add(CookingTimeFavoriteRollup, delta, "bucket", [bucket])
+
+
+def favorite_contribution(favorite):
+    """What one favorite adds to the rollups, read before it is deleted."""
+    recipe = Recipe.objects.filter(pk=favorite.recipe_id).values(
+        "category", "prep_time", "cooking_time"
+    )[0]
+    return {
+        "month": month_of(favorite.created_at),
+        "category": recipe["category"],
+        "bucket": time_bucket(recipe["prep_time"] + recipe["cooking_time"]),
+        "ingredient_ids": list(
+            Recipe.ingredients.through.objects.filter(
+                recipe_id=favorite.recipe_id
+            ).values_list("ingredient_id", flat=True)
+        ),
+    }
+
+
+def apply_contribution(contribution, delta):
+    """Add (delta=1) or remove (delta=-1) one favorite from every rollup."""
+    with transaction.atomic():
+        add_ingredient_favorites(contribution["ingredient_ids"], delta)
+        add_category_favorites(contribution["month"], contribution["category"], delta)
+        add_cooking_time_favorites(contribution["bucket"], delta)
+
+
+def move_recipe_favorites(recipe_id, previous, current):
+    """Re-file a favorited recipe's favorites after its category/times changed."""
+    old_bucket = time_bucket(previous["prep_time"] + previous["cooking_time"])
+    new_bucket = time_bucket(current["prep_time"] + current["cooking_time"])
+    category_changed = previous["category"] != current["category"]
+    if old_bucket == new_bucket and not category_changed:
+        return
+
+    per_month = (
+        Favorite.objects.filter(recipe_id=recipe_id)
+        .annotate(month=TruncMonth("created_at", tzinfo=datetime.timezone.utc))
+        .values_list("month")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    per_month = [(moment.date(), count) for moment, count in per_month]
+    total = sum(count for _, count in per_month)
+    if not total:
+        return
+    with transaction.atomic():
+        if old_bucket != new_bucket:
+            add_cooking_time_favorites(old_bucket, -total)
+            add_cooking_time_favorites(new_bucket, total)
+        if category_changed:
+            for month, count in per_month:
+                add_category_favorites(month, previous["category"], -count)
+                add_category_favorites(month, current["category"], count)
+
+
+def add_recipe_ingredients(recipe_ids, ingredient_ids, delta):
+    """Account for ingredient links added (delta=1) or removed (delta=-1).
+
+    Each favorite of the recipes counts once more (or less) for each of the
+    ingredients.
+    """
+    favorites = Favorite.objects.filter(recipe_id__in=recipe_ids).count()
+    add_ingredient_favorites(ingredient_ids, favorites * delta)
+
+
+def rebuild_rollups():
+    """Recompute every rollup from the Favorite table; returns row counts."""
+    ingredient_rows = (
+        Recipe.ingredients.through.objects.filter(recipe__favorited_by__isnull=False)
+        .values_list("ingredient_id")
+        .annotate(favorites=Count("recipe__favorited_by"))
+        .order_by()
+    )
+    category_rows = (
+        Favorite.objects.annotate(
+            month=TruncMonth("created_at", tzinfo=datetime.timezone.utc)
+        )
+        .values_list("month", "recipe__category")
+        .annotate(favorites=Count("id"))
+        .order_by()
+    )
+    bucket_cases = [
+        When(
+            Q(total_time__gte=lowest)
+            & (Q() if highest is None else Q(total_time__lte=highest)),
+            then=Value(i),
+        )
+        for i, (_, lowest, highest) in enumerate(TIME_BUCKETS)
+    ]
+    bucket_rows = (
+        Favorite.objects.annotate(
+            total_time=F("recipe__prep_time") + F("recipe__cooking_time")
+        )
+        .annotate(
+            bucket=Case(*bucket_cases, default=Value(0), output_field=IntegerField())
+        )
+        .values_list("bucket")
+        .annotate(favorites=Count("id"))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        for model in (
+            IngredientFavoriteRollup,
+            CategoryFavoriteRollup,
+            CookingTimeFavoriteRollup,
+        ):
+            model.objects.all().delete()
+        ingredients = IngredientFavoriteRollup.objects.bulk_create(
+            IngredientFavoriteRollup(ingredient_id=ingredient_id, favorites=count)
+            for ingredient_id, count in ingredient_rows
+        )
+        categories = CategoryFavoriteRollup.objects.bulk_create(
+            CategoryFavoriteRollup(month=month.date(), category=category, favorites=n)
+            for month, category, n in category_rows
+        )
+        buckets = CookingTimeFavoriteRollup.objects.bulk_create(
+            CookingTimeFavoriteRollup(bucket=bucket, favorites=count)
+            for bucket, count in bucket_rows
+        )
+    return {
+        "ingredients": len(ingredients),
+        "categories": len(categories),
+        "cooking_times": len(buckets),
+    }
+
+
+# Readers: chart_data-style dicts (see recipes.chart_data), so the SVG
+# renderer can draw them
+
+
+def top_ingredients_data(limit=TOP_INGREDIENTS):
+    """The ingredients in the most favorited recipes, site-wide."""
+    rows = list(
+        IngredientFavoriteRollup.objects.filter(favorites__gt=0)
+        .order_by("-favorites", "ingredient__name")
+        .values_list("ingredient__name", "favorites")[:limit]
+    )
+    if not rows:
+        return None
+    return {
+        "type": "bar",
+        "title": "Most Favorited Ingredients",
+        "x_label": "Ingredients",
+        "y_label": "Favorites",
+        "labels": [name for name, _ in rows],
+        "values": [count for _, count in rows],
+    }
+
+
+def cooking_time_data():
+    """Favorites per total-time bucket, site-wide."""
+    counts = dict(CookingTimeFavoriteRollup.objects.values_list("bucket", "favorites"))
+    if not any(counts.values()):
+        return None
+    return {
+        "type": "line",
+        "title": "Favorites by Cooking Time",
+        "x_label": "Total Cooking Time (minutes)",
+        "y_label": "Favorites",
+        "labels": [label for label, _, _ in TIME_BUCKETS],
+        "values": [counts.get(i, 0) for i in range(len(TIME_BUCKETS))],
+    }
+
+
+def category_share_by_month(months=CATEGORY_MONTHS):
+    """Each category's share of the favorites made in the latest months.
+
+    Returns (category labels, [(month, [percent per category])]), oldest
+    month first; categories nobody favorited in the period are left out.
+    """
+    latest = list(
+        CategoryFavoriteRollup.objects.filter(favorites__gt=0)
+        .order_by("-month")
+        .values_list("month", flat=True)
+        .distinct()[:months]
+    )
+    if not latest:
+        return [], []
+    counts = {}
+    for month, category, favorites in CategoryFavoriteRollup.objects.filter(
+        month__in=latest, favorites__gt=0
+    ).values_list("month", "category", "favorites"):
+        counts[month, category] = favorites
+
+    categories = [
+        (value, label)
+        for value, label in Recipe.CATEGORY_CHOICES
+        if any((month, value) in counts for month in latest)
+    ]
+    rows = []
+    for month in sorted(latest):
+        total = sum(counts.get((month, value), 0) for value, _ in categories)
+        rows.append(
+            (
+                month,
+                [
+                    round(counts.get((month, value), 0) * 100 / total)
+                    for value, _ in categories
+                ],
+            )
+        )
+    return [label for _, label in categories], rows
@@ -0,0 +1,173 @@
+import contextvars
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+# Opt-in per-request profiling (RECIPES_SQL_INSTRUMENTATION): counts and
+# times every query, flags statements repeated often enough to look like an
+# N+1 pattern, and reports DB, template and chart time in a Server-Timing
+# header (visible in the browser devtools' network panel).
+
+logger = logging.getLogger(__name__)
+
+# Same statement (literals aside) this many times in one request is logged
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+
+_profile = contextvars.ContextVar("recipes_request_profile", default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """SQL with its literals and placeholders replaced, so repeats compare equal.
+
+    "... WHERE id = 3" and "... WHERE id = 7" share a fingerprint, and so do
+    IN lists of any length.
+    """
+    sql = _STRING.sub("?", sql).replace("%s", "?")
+    sql = _NUMBER.sub("?", sql)
+    sql = _VALUE_LIST.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+class RequestProfile:
+    """What one request spent on queries, templates and charts."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.fingerprints = Counter()
+        self.seconds = Counter()  # by timed() section
+        self._depth = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # Connection.execute_wrapper() hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def repeated(self, threshold):
+        """[(fingerprint, count)] run more than threshold times, most first."""
+        return [
+            (sql, count)
+            for sql, count in self.fingerprints.most_common()
+            if count > threshold
+        ]
+
+    def server_timing(self, total_seconds):
+        """Server-Timing header value (durations in milliseconds)."""
+        metrics = [
+            ("db", self.db_seconds, f"{self.queries} queries"),
+            ("template", self.seconds["template"], "Templates"),
+            ("chart", self.seconds["chart"], "Charts"),
+            ("total", total_seconds, "Total"),
+        ]
+        return ", ".join(
+            f'{name};dur={seconds * 1000:.1f};desc="{desc}"'
+            for name, seconds, desc in metrics
+        )
+
+
+def current_profile():
+    """The RequestProfile of the request being handled, if it is profiled."""
+    return _profile.get()
+
+
+@contextmanager
+def timed(section):
+    """Add the block's duration to the current request's section timer.
+
+    Free when the request isn't profiled; nested blocks of the same section
+    are counted once.
+    """
+    profile = _profile.get()
+    if profile is None:
+        yield
+        return
+    profile._depth[section] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile._depth[section] -= 1
+        if not profile._depth[section]:
+            profile.seconds[section] += time.perf_counter() - started
+
+
+_templates_instrumented = False
+
+
+def instrument_templates():
+    """Time every top-level Django template render (includes are inside it)."""
+    global _templates_instrumented
+    if _templates_instrumented:
+        return
+    from django.template.backends.django import Template
+
+    render = Template.render
+
+    def timed_render(self, context=None, request=None):
+        with timed("template"):
+            return render(self, context, request)
+
+    Template.render = timed_render
+    _templates_instrumented = True
+
+
+class SQLInstrumentationMiddleware:
+    """Profile each request (see above); off unless RECIPES_SQL_INSTRUMENTATION."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "RECIPES_SQL_INSTRUMENTATION", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(
+            settings, "RECIPES_N_PLUS_ONE_THRESHOLD", DEFAULT_N_PLUS_ONE_THRESHOLD
+        )
+        instrument_templates()
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _profile.set(profile)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _profile.reset(token)
+        total_seconds = time.perf_counter() - started
+
+        for sql, count in profile.repeated(self.threshold):
+            logger.warning(
+                "Possible N+1 in %s %s: %d x %s",
+                request.method,
+                request.path,
+                count,
+                sql,
+            )
+        logger.debug(
+            "%s %s: %d queries, %.1f ms in the database",
+            request.method,
+            request.path,
+            profile.queries,
+            profile.db_seconds * 1000,
+        )
+        timing = profile.server_timing(total_seconds)
+        if response.has_header("Server-Timing"):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response["Server-Timing"] = timing
+        return response
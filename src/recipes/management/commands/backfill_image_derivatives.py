@@ -0,0 +1,31 @@
+import os
+import time
+from django.core.management.base import BaseCommand
+from recipes.images import backfill_derivatives
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the resized JPEG/WebP copies of existing recipe images. "
+        "Images that already have them are skipped, so an interrupted run "
+        "can simply be started again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes resizing images in parallel",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        done, failed = backfill_derivatives(
+            workers=options["workers"], log=self.stdout.write
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Generated derivatives for {done} image(s) in {elapsed:.1f}s"
+            + (f"; {failed} unreadable" if failed else "")
+        )
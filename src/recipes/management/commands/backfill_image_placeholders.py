@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from recipes.images import backfill_placeholders
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the inline low-quality placeholder of recipes that have an "
+        "image but no placeholder yet (from the smallest derivative when "
+        "there is one). Rerunning only picks up what is still missing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="Recipes per bulk update"
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        done, failed = backfill_placeholders(
+            batch_size=options["batch_size"], log=self.stdout.write
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Stored {done} placeholder(s) in {elapsed:.1f}s"
+            + (f"; {failed} unreadable" if failed else "")
+        )
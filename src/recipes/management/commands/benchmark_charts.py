@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from recipes.chart_utils import (
+    SAMPLE_CHART_DATA,
+    figure_pool,
+    render_charts_from_data,
+    warm_chart_renderers,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure matplotlib chart renders per second from 1..N threads using "
+        "sample data (no database access)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            type=int,
+            nargs="+",
+            default=[1, 2, 4, 8],
+            help="Concurrent rendering threads to try",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=8,
+            help="Chart sets (3 charts each) rendered per thread count",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        warm_chart_renderers()
+        self.stdout.write(
+            f"Warm-up: {(time.perf_counter() - started) * 1000:.0f} ms "
+            f"(pool allows {figure_pool.max_concurrent} concurrent renders)"
+        )
+        self.stdout.write(f"{'threads':>8} {'renders/s':>10} {'ms/render':>10}")
+        rounds = options["rounds"]
+        for threads in options["threads"]:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                started = time.perf_counter()
+                list(
+                    executor.map(render_charts_from_data, [SAMPLE_CHART_DATA] * rounds)
+                )
+                elapsed = time.perf_counter() - started
+            renders = rounds * len(SAMPLE_CHART_DATA)
+            self.stdout.write(
+                f"{threads:>8} {renders / elapsed:>10.2f} "
+                f"{elapsed / renders * 1000:>10.1f}"
+            )
@@ -0,0 +1,133 @@
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.models import Recipe
+from recipes.search import result_rows, search_queryset
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark catalog once timings are taken."""
+
+
+def dataframe_search(cleaned_data):
+    """The previous pandas-based result pipeline, kept for comparison."""
+    import pandas as pd
+
+    recipe_name = cleaned_data.get("recipe_name")
+    recipe_data = []
+    for recipe in search_queryset(cleaned_data).order_by():
+        recipe_data.append(
+            {
+                "id": recipe.id,
+                "name": recipe.name,
+                "category": recipe.get_category_display(),
+                "difficulty": recipe.difficulty,
+                "prep_time": recipe.prep_time,
+                "cooking_time": recipe.cooking_time,
+                "total_time": recipe.total_time,
+                "servings": recipe.servings,
+                "description": (
+                    recipe.description[:100] + "..."
+                    if len(recipe.description) > 100
+                    else recipe.description
+                ),
+                "image_url": recipe.image.url if recipe.image else None,
+            }
+        )
+    if not recipe_data:
+        return []
+
+    search_results_df = pd.DataFrame(recipe_data)
+    if recipe_name:
+        search_results_df["exact_match"] = (
+            search_results_df["name"].str.lower() == recipe_name.lower()
+        )
+        search_results_df = search_results_df.sort_values(
+            ["exact_match", "total_time"], ascending=[False, True]
+        )
+        search_results_df = search_results_df.drop("exact_match", axis=1)
+    else:
+        search_results_df = search_results_df.sort_values("total_time")
+    return search_results_df.to_dict("records")
+
+
+def orm_search(cleaned_data):
+    """The current SQL-ordered, streamed result pipeline."""
+    return list(result_rows(search_queryset(cleaned_data)))
+
+
+def measure(func, cleaned_data):
+    """Return (seconds, peak traced bytes, row count) for one run of func."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    rows = func(cleaned_data)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, len(rows)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare latency and peak memory of the pandas search pipeline against "
+        "the ORM pipeline. Recipes are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1000, 10000, 100000],
+            help="Catalog sizes to benchmark",
+        )
+        parser.add_argument(
+            "--recipe-name",
+            default="dish 1",
+            help="recipe_name search term (exercises relevance ordering)",
+        )
+
+    def handle(self, *args, **options):
+        cleaned_data = {"recipe_name": options["recipe_name"]}
+        self.stdout.write(
+            f"{'recipes':>8} {'pipeline':>10} {'rows':>8} {'ms':>10} {'peak KiB':>10}"
+        )
+        for size in options["sizes"]:
+            try:
+                with transaction.atomic():
+                    self.seed(size)
+                    # Warm up both paths (imports, connection, query cache)
+                    dataframe_search(cleaned_data)
+                    orm_search(cleaned_data)
+                    for label, func in (
+                        ("pandas", dataframe_search),
+                        ("orm", orm_search),
+                    ):
+                        elapsed, peak, count = measure(func, cleaned_data)
+                        self.stdout.write(
+                            f"{size:>8} {label:>10} {count:>8} "
+                            f"{elapsed * 1000:>10.1f} {peak / 1024:>10.0f}"
+                        )
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def seed(self, size):
+        """Bulk-create a synthetic catalog of the given size."""
+        categories = [value for value, _ in Recipe.CATEGORY_CHOICES]
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    name=f"Dish {i}",
+                    description="A benchmark recipe. " * (i % 8),
+                    category=categories[i % len(categories)],
+                    prep_time=i % 30,
+                    cooking_time=5 + i % 90,
+                    servings=1 + i % 8,
+                    image=None,
+                )
+                for i in range(size)
+            ),
+            batch_size=2000,
+        )
@@ -0,0 +1,54 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from recipes.suggest import PrefixIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure build time, lookup latency and memory of the autocomplete "
+        "prefix index over synthetic names (no database access)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1000, 10000, 100000],
+            help="Number of names to index",
+        )
+        parser.add_argument(
+            "--lookups", type=int, default=10000, help="Lookups timed per size"
+        )
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        words = (
+            "garlic tomato basil chicken lemon butter onion "
+            "pepper rice ginger honey mint pasta spinach"
+        ).split()
+        self.stdout.write(f"{'names':>8} {'build ms':>10} {'lookup us':>10} {'MiB':>8}")
+        for size in options["sizes"]:
+            names = [
+                f"{rng.choice(words).title()} {rng.choice(words)} {i}"
+                for i in range(size)
+            ]
+            started = time.perf_counter()
+            index = PrefixIndex((name, i) for i, name in enumerate(names))
+            build = time.perf_counter() - started
+
+            prefixes = [
+                rng.choice(names)[: rng.randint(1, 8)]
+                for _ in range(options["lookups"])
+            ]
+            started = time.perf_counter()
+            for prefix in prefixes:
+                index.lookup(prefix, 10)
+            per_lookup = (time.perf_counter() - started) / len(prefixes)
+
+            self.stdout.write(
+                f"{size:>8} {build * 1000:>10.1f} {per_lookup * 1e6:>10.2f} "
+                f"{index.memory_bytes() / 2**20:>8.1f}"
+            )
@@ -0,0 +1,220 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from recipes.models import Recipe
+from recipes.synthetic import USERNAME_PREFIX, generate_catalog, reset_catalog_caches
+
+
+class Rollback(Exception):
+    """Raised to discard the synthetic catalog once timings are taken."""
+
+
+# Dataset shape per recipe, as in the full-size catalog (100k recipes,
+# 20k ingredients, 50k users, 2M favorites)
+INGREDIENTS_PER_RECIPE = 0.2
+USERS_PER_RECIPE = 0.5
+FAVORITES_PER_RECIPE = 20
+
+
+def benchmark_urls():
+    """(name, url, logged in) for each benchmarked page of the current catalog."""
+    popular = Recipe.objects.order_by("-favorites_count", "-id").first()
+    ingredient = popular.ingredients.order_by("name").first() if popular else None
+    urls = [
+        ("home", reverse("recipes:home"), False),
+        ("recipes_list", reverse("recipes:recipes_list"), False),
+        (
+            "recipes_list_popular",
+            reverse("recipes:recipes_list") + "?sort=popular",
+            False,
+        ),
+        ("search_show_all", reverse("recipes:recipe_search") + "?show_all=1", False),
+        ("search_name", reverse("recipes:recipe_search") + "?recipe_name=soup", False),
+        (
+            "search_popular",
+            reverse("recipes:recipe_search") + "?category=dinner&sort=popular",
+            False,
+        ),
+        ("insights", reverse("recipes:insights"), False),
+        ("logout_success", reverse("accounts:logout_success"), False),
+        ("favorites_list", reverse("recipes:favorites_list"), True),
+    ]
+    if ingredient is not None:
+        urls.append(
+            (
+                "search_ingredient",
+                reverse("recipes:recipe_search") + f"?ingredients={ingredient.name}",
+                False,
+            )
+        )
+    if popular is not None:
+        urls.append(
+            (
+                "recipe_detail",
+                reverse("recipes:recipe_detail", args=[popular.id]),
+                False,
+            )
+        )
+    return urls
+
+
+def measure(client, url, repeat):
+    """Time one cold request, then repeat warm ones (caches filled)."""
+    timings = []
+    queries = []
+    status = None
+    for _ in range(1 + repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured))
+        status = response.status_code
+    warm = timings[1:] or timings
+    return {
+        "status": status,
+        "cold_ms": round(timings[0], 2),
+        "median_ms": round(statistics.median(warm), 2),
+        "min_ms": round(min(warm), 2),
+        "queries_cold": queries[0],
+        "queries": queries[-1],
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Time each main view and count its queries against synthetic catalogs "
+        "of several sizes, and write the results as JSON. Each catalog is "
+        "created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1000, 10000],
+            help="Recipe counts to benchmark (other tables scale with them)",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5, help="Warm requests per view"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output", default="benchmark_views.json", help="JSON results file"
+        )
+        parser.add_argument(
+            "--baseline", help="Earlier results file to compare against"
+        )
+
+    def handle(self, *args, **options):
+        results = []
+        self.stdout.write(
+            f"{'recipes':>8} {'view':<22} {'cold ms':>9} {'median ms':>10} "
+            f"{'queries':>8}"
+        )
+        for size in options["sizes"]:
+            try:
+                with transaction.atomic():
+                    dataset = generate_catalog(
+                        recipes=size,
+                        ingredients=max(1, int(size * INGREDIENTS_PER_RECIPE)),
+                        users=max(1, int(size * USERS_PER_RECIPE)),
+                        favorites=size * FAVORITES_PER_RECIPE,
+                        seed=options["seed"],
+                    )
+                    results.extend(self.run_views(size, dataset, options["repeat"]))
+                    raise Rollback
+            except Rollback:
+                pass
+            finally:
+                # The cache isn't rolled back: entries filled from the
+                # synthetic catalog would otherwise outlive it. Favorites
+                # versions live in the database and went with the rollback.
+                reset_catalog_caches()
+
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "seed": options["seed"],
+                "repeat": options["repeat"],
+            },
+            "results": results,
+        }
+        with open(options["output"], "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+        self.stdout.write(f"Wrote {len(results)} results to {options['output']}")
+
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                self.compare(json.load(file)["results"], results)
+
+    def run_views(self, size, dataset, repeat):
+        client = Client()
+        # The most active synthetic user has the longest favorites list
+        most_active = (
+            User.objects.filter(username__startswith=USERNAME_PREFIX)
+            .annotate(total=Count("favorites"))
+            .order_by("-total", "id")
+            .first()
+        )
+        results = []
+        # The test client's host must pass ALLOWED_HOSTS
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            for name, url, logged_in in benchmark_urls():
+                client.logout()
+                if logged_in:
+                    if most_active is None:
+                        continue
+                    client.force_login(most_active)
+                result = {"size": size, "view": name, "url": url, "dataset": dataset}
+                result.update(measure(client, url, repeat))
+                results.append(result)
+                self.stdout.write(
+                    f"{size:>8} {name:<22} {result['cold_ms']:>9.1f} "
+                    f"{result['median_ms']:>10.1f} {result['queries']:>8}"
+                )
+        return results
+
+    def compare(self, baseline, results):
+        """Print changes against a baseline run (same size and view)."""
+        previous = {(entry["size"], entry["view"]): entry for entry in baseline}
+        self.stdout.write(
+            f"{'recipes':>8} {'view':<22} {'median ms':>16} {'queries':>10}"
+        )
+        for result in results:
+            before = previous.get((result["size"], result["view"]))
+            if before is None:
+                continue
+            change = result["median_ms"] - before["median_ms"]
+            flag = " <- more queries" if result["queries"] > before["queries"] else ""
+            self.stdout.write(
+                f"{result['size']:>8} {result['view']:<22} "
+                f"{before['median_ms']:>7.1f} {change:>+8.1f} "
+                f"{before['queries']:>4} -> {result['queries']}{flag}"
+            )
@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.synthetic import generate_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-create a deterministic synthetic catalog (Zipf-like ingredient, "
+        "recipe and user popularity) for load tests. Intended for a scratch "
+        "database: the data is added to whatever is there."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=100_000)
+        parser.add_argument("--ingredients", type=int, default=20_000)
+        parser.add_argument("--users", type=int, default=50_000)
+        parser.add_argument("--favorites", type=int, default=2_000_000)
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Same seed, same catalog"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=5000, help="Rows per bulk insert"
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            counts = generate_catalog(
+                recipes=options["recipes"],
+                ingredients=options["ingredients"],
+                users=options["users"],
+                favorites=options["favorites"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+                log=self.stdout.write,
+            )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Created {counts['recipes']} recipes, {counts['ingredients']} "
+            f"ingredients, {counts['users']} users and {counts['favorites']} "
+            f"favorites in {elapsed:.1f}s. Run rebuild_similarities for "
+            "similar-recipe suggestions."
+        )
@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from recipes.insights import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the site-wide insights rollups from the Favorite table. "
+        "Signals keep them current; run this after migrating or bulk edits "
+        "that bypass signals."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = rebuild_rollups()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Rebuilt {counts['ingredients']} ingredient, "
+            f"{counts['categories']} category-month and "
+            f"{counts['cooking_times']} cooking-time rollup rows in {elapsed:.2f}s"
+        )
@@ -0,0 +1,40 @@
+import os
+import time
+from django.core.management.base import BaseCommand
+from recipes.similarity import rebuild_all
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute MinHash signatures and the precomputed similar-recipe "
+        "lists for the whole catalog."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Worker processes for signature and neighbour computation",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=2000, help="Recipes per worker task"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=5000, help="Rows per bulk insert"
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_all(
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            batch_size=options["batch_size"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt similarities for {count} recipes in "
+                f"{time.perf_counter() - started:.1f}s"
+            )
+        )
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from recipes.favorites import reconcile_favorites_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount Recipe.favorites_count from the Favorite table and repair "
+        "recipes where it drifted (e.g. after bulk edits that bypass signals)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Recipes checked per query"
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        checked, repaired = reconcile_favorites_counts(
+            batch_size=options["batch_size"],
+            log=self.stdout.write,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Checked {checked} recipe(s), repaired {repaired} in {elapsed:.2f}s"
+        )
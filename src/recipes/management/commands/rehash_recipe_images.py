@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from recipes.images import rehash_images
+
+
+class Command(BaseCommand):
+    help = (
+        "Move existing recipe images to content-addressed names "
+        "(recipe_images/ab/cd/<sha256>.ext) and rewrite Recipe.image in "
+        "batches. Already-moved images are skipped, so it can be rerun."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=200, help="Images per database update"
+        )
+        parser.add_argument(
+            "--delete-originals",
+            action="store_true",
+            help="Remove each old file once its recipes point at the new one",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        moved, missing = rehash_images(
+            batch_size=options["batch_size"],
+            delete_originals=options["delete_originals"],
+            log=self.stdout.write,
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Rehashed {moved} image(s) in {elapsed:.1f}s"
+            + (f"; {missing} missing" if missing else "")
+        )
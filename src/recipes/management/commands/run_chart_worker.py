@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+import django
+from django.core.management.base import BaseCommand
+from recipes.chart_jobs import claim_pending_jobs, requeue_stale_jobs, run_chart_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Render queued favorites chart jobs. The ChartJob table is the queue, "
+        "so no broker is needed; run one worker per host."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Rendering processes (1 renders in this process)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds between queue checks when idle",
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=600,
+            help="Requeue jobs left running for this many seconds",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty instead of polling",
+        )
+
+    def handle(self, *args, **options):
+        workers = max(options["workers"], 1)
+        poll_interval = options["poll_interval"]
+        requeued = requeue_stale_jobs(timedelta(seconds=options["stale_after"]))
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+        executor = None
+        if workers > 1:
+            # Spawned (not forked) children set Django up themselves and so
+            # never share this process's database connection
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+        in_flight = {}
+        try:
+            while True:
+                job_ids = claim_pending_jobs(workers - len(in_flight))
+                for job_id in job_ids:
+                    if executor is None:
+                        self.report(job_id, run_chart_job(job_id))
+                    else:
+                        in_flight[executor.submit(run_chart_job, job_id)] = job_id
+
+                if in_flight:
+                    done, _ = wait(
+                        in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED
+                    )
+                    for future in done:
+                        self.report(in_flight.pop(future), future.result())
+                elif not job_ids:
+                    if options["once"]:
+                        break
+                    time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def report(self, job_id, status):
+        self.stdout.write(f"Chart job {job_id}: {status or 'superseded'}")
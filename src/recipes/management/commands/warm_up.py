@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from recipes.warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Render a throwaway chart, compile the recipes/accounts templates and "
+        "prime the search caches, printing how long each step took."
+    )
+
+    def handle(self, *args, **options):
+        report = warm_up()
+        for name, result in report.items():
+            if result["ok"]:
+                self.stdout.write(f"{name}: {result['ms']} ms")
+            else:
+                self.stderr.write(f"{name}: failed ({result['error']})")
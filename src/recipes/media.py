@@ -0,0 +1,174 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from .storage import is_content_addressed, recipe_image_storage
+
+# Serving of user-uploaded media (MEDIA_URL) in development and production.
+# Responses carry validators (ETag, Last-Modified) and answer byte ranges.
+# With RECIPES_MEDIA_ACCEL set, the body is left to the front proxy
+# (nginx X-Accel-Redirect, Apache/lighttpd X-Sendfile); otherwise it is
+# streamed from disk in blocks and never read into memory as a whole.
+
+# Content-addressed files never change under the same name
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+SINGLE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def media_etag(path, stat):
+    """Strong ETag: the content hash when the name has one, else mtime+size."""
+    if is_content_addressed(path):
+        return f'"{os.path.splitext(os.path.basename(path))[0]}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single "bytes=" range, or None to send all.
+
+    Raises ValueError when the range can't be satisfied. Multiple ranges are
+    answered with the whole file, which RFC 9110 allows.
+    """
+    match = SINGLE_RANGE.match(header.replace(" ", ""))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError(header)
+    return start, end
+
+
+def range_applies(request, etag, last_modified):
+    """Whether If-Range (if sent) still matches the current file."""
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+
+def read_range(file, start, length):
+    """Yield length bytes from start, a block at a time, then close the file."""
+    try:
+        file.seek(start)
+        while length > 0:
+            block = file.read(min(STREAM_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+    finally:
+        file.close()
+
+
+def _accel_response(path, full_path, content_type):
+    # The proxy fills in the body and Content-Length and handles ranges
+    response = HttpResponse(content_type=content_type)
+    if settings.RECIPES_MEDIA_ACCEL == "x-accel-redirect":
+        prefix = settings.RECIPES_MEDIA_ACCEL_PREFIX.rstrip("/")
+        response["X-Accel-Redirect"] = f"{prefix}/{quote(path)}"
+    else:
+        response["X-Sendfile"] = full_path
+    return response
+
+
+def _file_response(request, full_path, size, content_type, etag, last_modified):
+    byte_range = None
+    range_header = request.headers.get("Range")
+    if range_header and range_applies(request, etag, last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type)
+        response["Content-Length"] = str(size)
+    elif byte_range is None:
+        # FileResponse streams in blocks (or via the server's file_wrapper)
+        response = FileResponse(open(full_path, "rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            read_range(open(full_path, "rb"), start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response["Content-Length"] = str(length)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+@require_safe
+def serve_media(request, path, document_root=None):
+    """Serve a file under MEDIA_ROOT with validators, ranges and offload."""
+    if not (settings.DEBUG or settings.RECIPES_SERVE_MEDIA):
+        # Left to the front proxy (see RECIPES_SERVE_MEDIA in settings)
+        raise Http404("Media is not served by Django")
+    document_root = document_root or settings.MEDIA_ROOT
+    try:
+        full_path = safe_join(document_root, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("No such media file")
+    if not os.path.isfile(full_path):
+        raise Http404("No such media file")
+
+    etag = media_etag(path, stat)
+    last_modified = stat.st_mtime
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified)
+    )
+    if response is None:
+        content_type, encoding = mimetypes.guess_type(full_path)
+        content_type = content_type or "application/octet-stream"
+        if settings.RECIPES_MEDIA_ACCEL:
+            response = _accel_response(path, full_path, content_type)
+        else:
+            response = _file_response(
+                request, full_path, stat.st_size, content_type, etag, last_modified
+            )
+        if encoding:
+            response["Content-Encoding"] = encoding
+
+    if response.status_code == 416:
+        return response
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    if recipe_image_storage.is_immutable(path):
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True
+        )
+    else:
+        # Cheap to revalidate thanks to the validators above
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.27 on 2026-10-17 06:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredients', '0002_ingredient_created_at'),
+        ('recipes', '0005_chartjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CookingTimeFavoriteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.PositiveSmallIntegerField(unique=True)),
+                ('favorites', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['bucket'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CategoryFavoriteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('category', models.CharField(choices=[('breakfast', 'Breakfast'), ('lunch', 'Lunch'), ('dinner', 'Dinner'), ('entree', 'Entree'), ('salad', 'Salad'), ('soup', 'Soup'), ('dessert', 'Dessert'), ('snack', 'Snack'), ('drink', 'Drink'), ('other', 'Other')], max_length=20)),
+                ('favorites', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['month', 'category'],
+                'unique_together': {('month', 'category')},
+            },
+        ),
+        migrations.CreateModel(
+            name='IngredientFavoriteRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('favorites', models.IntegerField(default=0)),
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='favorite_rollup', to='ingredients.ingredient')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-favorites'], name='recipes_ing_favorit_7d3684_idx')],
+            },
+        ),
+    ]
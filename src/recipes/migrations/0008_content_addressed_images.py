@@ -0,0 +1,19 @@
+# Generated by Django 4.2.27 on 2026-10-17 06:58
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, default='recipe_images/default-recipe.jpg', null=True, storage=recipes.storage.ContentAddressedStorage(), upload_to='recipe_images/'),
+        ),
+    ]
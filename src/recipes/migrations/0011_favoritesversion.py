@@ -0,0 +1,38 @@
+# Generated by Django 4.2.27 on 2026-10-17 07:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import recipes.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("recipes", "0010_recipe_favorites_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FavoritesVersion",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="favorites_version",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "version",
+                    models.BigIntegerField(
+                        default=recipes.models.initial_favorites_version
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -1,6 +1,55 @@
+import time
 from django.db import models
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from ingredients.models import Ingredient
+from .storage import recipe_image_storage
+
+
+class RecipeQuerySet(models.QuerySet):
+    def with_metrics(self):
+        """Annotate ingredient_count, total_minutes and difficulty in SQL.
+
+        The thresholds mirror Recipe.difficulty, so the annotated value can be
+        filtered on (a WHERE clause) and read by templates without a COUNT
+        query per recipe.
+        """
+        # Count through the m2m table in a subquery so ingredient filters on
+        # the outer query can't narrow (or duplicate) the count.
+        ingredient_count = (
+            Recipe.ingredients.through.objects.filter(recipe_id=OuterRef("pk"))
+            .order_by()
+            .values("recipe_id")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return self.annotate(
+            ingredient_count=Coalesce(
+                Subquery(ingredient_count, output_field=IntegerField()), 0
+            ),
+            # Not "total_time": that's the Recipe property, which follows
+            # later edits to prep_time/cooking_time
+            total_minutes=F("prep_time") + F("cooking_time"),
+        ).annotate(
+            difficulty=Case(
+                When(total_minutes__lt=15, ingredient_count__lte=5, then=Value("Easy")),
+                When(
+                    total_minutes__lt=30, ingredient_count__lte=8, then=Value("Medium")
+                ),
+                default=Value("Hard"),
+                output_field=models.CharField(),
+            )
+        )
 
 
 class Recipe(models.Model):
@@ -33,20 +82,52 @@ class Recipe(models.Model):
     # --- Relationships ---
     ingredients = models.ManyToManyField(Ingredient, related_name="recipes")
     # --- Image upload (requires Pillow) ---
-    # stored under MEDIA_ROOT/recipe_images/
+    # stored under MEDIA_ROOT/recipe_images/ab/cd/<sha256>.<ext> (see
+    # recipes.storage)
     image = models.ImageField(
         upload_to="recipe_images/",
+        storage=recipe_image_storage,
         blank=True,
         null=True,
         default="recipe_images/default-recipe.jpg",
     )
+    # Resized JPEG/WebP copies of the image ({"source", "widths"}, see
+    # recipes.images); filled in after each upload
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    # Tiny blurred stand-in shown while the image loads (a data: URI)
+    image_placeholder = models.TextField(blank=True, editable=False)
+    # --- Popularity ---
+    # Denormalized Favorite count, kept current by signals with F() updates
+    # (see recipes.favorites); reconcile_favorites_count repairs any drift
+    favorites_count = models.PositiveIntegerField(default=0, editable=False)
     # --- Timestamps (sorting + debugging) ---
     created_at = models.DateTimeField(auto_now_add=True)  # set once
     updated_at = models.DateTimeField(auto_now=True)  # updates on every save
 
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        # "Most popular" ordering (search.POPULAR_ORDERING) reads this index
+        indexes = [models.Index(fields=["-favorites_count", "-id"])]
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Never write back a favorites_count read before later favorites
+        # changed it; only the signals' F() updates set it. Fields deferred at
+        # load time are left out too, as in Django's own save.
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name != "favorites_count"
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
     # Calculated fields that update upon changes (not stored in DB)
     @property
     def total_time(self):
@@ -54,8 +135,14 @@ class Recipe(models.Model):
 
     @property
     def difficulty(self):
-        # (can tweak these thresholds anytime.)
-        ingredient_count = self.ingredients.count()
+        # Use the SQL annotation from with_metrics() when it was fetched
+        if "_difficulty" in self.__dict__:
+            return self._difficulty
+
+        # (can tweak these thresholds anytime; keep with_metrics() in sync.)
+        ingredient_count = self.__dict__.get("ingredient_count")
+        if ingredient_count is None:
+            ingredient_count = self.ingredients.count()
 
         if self.total_time < 15 and ingredient_count <= 5:
             return "Easy"
@@ -63,6 +150,10 @@ class Recipe(models.Model):
             return "Medium"
         return "Hard"
 
+    @difficulty.setter
+    def difficulty(self, value):
+        self._difficulty = value
+
 
 class Favorite(models.Model):
     """Model to track user's favorite recipes."""
@@ -79,3 +170,153 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.recipe.name}"
+
+
+def initial_favorites_version():
+    # Seeded from the clock rather than 0 so a restored database can't reuse
+    # a version whose charts are still cached
+    return time.time_ns() // 1000
+
+
+class FavoritesVersion(models.Model):
+    """Counter bumped whenever a user's favorites charts would change.
+
+    Stored in the database so every worker agrees on it; it keys the
+    chart cache, chart jobs and the chart URLs and ETags (see
+    recipes.chart_cache).
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="favorites_version",
+    )
+    version = models.BigIntegerField(default=initial_favorites_version)
+
+    def __str__(self):
+        return f"{self.user.username}: v{self.version}"
+
+
+class RecipeSimilarity(models.Model):
+    """Precomputed top-k most similar recipes (by ingredient-set Jaccard)."""
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="similarities"
+    )
+    similar = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="similar_to"
+    )
+    score = models.FloatField()  # Jaccard similarity, 0-1
+    rank = models.PositiveSmallIntegerField()  # 1 = most similar
+
+    class Meta:
+        unique_together = ("recipe", "similar")
+        ordering = ["recipe", "rank"]
+        indexes = [models.Index(fields=["recipe", "rank"])]
+
+    def __str__(self):
+        return f"{self.recipe.name} ~ {self.similar.name} ({self.score:.2f})"
+
+
+class RecipeSignatureBand(models.Model):
+    """One LSH band of a recipe's MinHash signature.
+
+    Recipes sharing a (band, bucket) pair are similarity candidates, so the
+    neighbours of a changed recipe can be found with one indexed lookup.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="signature_bands"
+    )
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        unique_together = ("recipe", "band")
+        indexes = [models.Index(fields=["band", "bucket"])]
+
+
+class ChartJob(models.Model):
+    """Queued rendering of a user's favorites charts (see recipes.chart_jobs).
+
+    The table is the queue: a local worker (run_chart_worker) claims pending
+    rows and stores the rendered charts on them, so no broker is needed and
+    web processes can pick up results without a shared cache.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="chart_jobs")
+    version = models.BigIntegerField()  # favorites version the charts are for
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    charts = models.JSONField(null=True, blank=True)  # {name: base64 PNG}
+    render_ms = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("user", "version")
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    def __str__(self):
+        return f"Charts for {self.user.username} (v{self.version}): {self.status}"
+
+
+# Site-wide favorites rollups (see recipes.insights). Kept up to date by
+# signals on every Favorite create/delete and on edits to favorited recipes,
+# so the insights page reads a handful of rows however many favorites exist.
+
+
+class IngredientFavoriteRollup(models.Model):
+    """Favorites of recipes that use an ingredient, across all users."""
+
+    ingredient = models.OneToOneField(
+        Ingredient, on_delete=models.CASCADE, related_name="favorite_rollup"
+    )
+    favorites = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["-favorites"])]
+
+    def __str__(self):
+        return f"{self.ingredient.name}: {self.favorites}"
+
+
+class CategoryFavoriteRollup(models.Model):
+    """Favorites made in a month, per category of the favorited recipe."""
+
+    month = models.DateField()  # first day of the month (UTC)
+    category = models.CharField(max_length=20, choices=Recipe.CATEGORY_CHOICES)
+    favorites = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("month", "category")
+        ordering = ["month", "category"]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.category}: {self.favorites}"
+
+
+class CookingTimeFavoriteRollup(models.Model):
+    """Favorites per total-time bucket (an index into facets.TIME_BUCKETS)."""
+
+    bucket = models.PositiveSmallIntegerField(unique=True)
+    favorites = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["bucket"]
+
+    def __str__(self):
+        return f"Bucket {self.bucket}: {self.favorites}"
@@ -0,0 +1,222 @@
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+CURSOR_SALT = "recipes.pagination.cursor"
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+def get_page_size(request):
+    """Page size from ?page_size=, falling back to settings.RECIPES_PAGE_SIZE."""
+    default = getattr(settings, "RECIPES_PAGE_SIZE", DEFAULT_PAGE_SIZE)
+    maximum = getattr(settings, "RECIPES_MAX_PAGE_SIZE", MAX_PAGE_SIZE)
+    try:
+        page_size = int(request.GET.get("page_size", default))
+    except (TypeError, ValueError):
+        page_size = default
+    return max(1, min(page_size, maximum))
+
+
+class KeysetPage:
+    """One page of results plus opaque cursors for its neighbours."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """Cursor pagination over a fixed, unique ordering (e.g. ("-created_at", "-id")).
+
+    Rather than OFFSET, each page filters on the position of the previous
+    page's boundary row, so page N costs the same index range scan as page 1.
+    The last ordering field must be unique (the primary key) to break ties.
+    """
+
+    def __init__(self, queryset, ordering, page_size=DEFAULT_PAGE_SIZE):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+
+    def page(self, cursor=None):
+        """Return the KeysetPage for a cursor token (None or invalid -> first page)."""
+        position, direction = self.decode_cursor(cursor)
+        ordering = self.ordering
+        if direction == "previous":
+            ordering = tuple(self._flip(field) for field in ordering)
+
+        queryset = self.queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        # Fetch one extra row to learn whether there is another page
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+
+        if direction == "previous":
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+
+        return KeysetPage(
+            rows,
+            next_cursor=(
+                self.encode_cursor(rows[-1], "next") if rows and has_next else None
+            ),
+            previous_cursor=(
+                self.encode_cursor(rows[0], "previous")
+                if rows and has_previous
+                else None
+            ),
+        )
+
+    def encode_cursor(self, row, direction):
+        """Sign the row's ordering values into an opaque, URL-safe token."""
+        values = [self._value(row, self._name(field)) for field in self.ordering]
+        values = [
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in values
+        ]
+        return signing.dumps({"k": values, "d": direction}, salt=CURSOR_SALT)
+
+    def decode_cursor(self, cursor):
+        """Return (position, direction); tampered or stale tokens restart at page 1."""
+        if not cursor:
+            return None, "next"
+        try:
+            payload = signing.loads(cursor, salt=CURSOR_SALT)
+            values = payload["k"]
+            direction = payload["d"]
+            if len(values) != len(self.ordering) or direction not in (
+                "next",
+                "previous",
+            ):
+                return None, "next"
+            position = [
+                self._to_python(self._name(field), value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (signing.BadSignature, KeyError, TypeError, ValidationError):
+            return None, "next"
+        return position, direction
+
+    def _after(self, ordering, position):
+        """WHERE clause selecting rows strictly after position in ordering."""
+        # (a, b, c) > (x, y, z) expands to
+        # a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = self._name(field)
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _to_python(self, name, value):
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations (e.g. total_minutes) are plain JSON numbers/strings
+            return value
+        return field.to_python(value)
+
+    @staticmethod
+    def _name(field):
+        return field.lstrip("-")
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def _value(row, name):
+        if isinstance(row, dict):
+            return row[name]
+        return getattr(row, name)
+
+
+class IdListPaginator:
+    """Cursor pagination over an already-ordered list of ids (e.g. cached results).
+
+    fetch(page_ids) loads the rows for one page; only that page touches the
+    database. Cursors carry the boundary id and its index, so locating the
+    page is O(1) while the list is unchanged.
+    """
+
+    def __init__(self, ids, fetch, page_size=DEFAULT_PAGE_SIZE):
+        self.ids = ids
+        self.fetch = fetch
+        self.page_size = page_size
+
+    def page(self, cursor=None):
+        """Return the KeysetPage for a cursor token (None or invalid -> first page)."""
+        start = self._start(cursor)
+        page_ids = self.ids[start : start + self.page_size]
+        end = start + len(page_ids)
+        return KeysetPage(
+            self.fetch(page_ids),
+            next_cursor=(
+                self.encode_cursor(end - 1, "next") if end < len(self.ids) else None
+            ),
+            previous_cursor=(
+                self.encode_cursor(start, "previous") if start > 0 else None
+            ),
+        )
+
+    def encode_cursor(self, index, direction):
+        """Sign a boundary position into an opaque, URL-safe token."""
+        return signing.dumps(
+            {"k": [self.ids[index]], "i": index, "d": direction}, salt=CURSOR_SALT
+        )
+
+    def _start(self, cursor):
+        """Index of the first id on the page a cursor points to."""
+        if not cursor:
+            return 0
+        try:
+            payload = signing.loads(cursor, salt=CURSOR_SALT)
+            (boundary,) = payload["k"]
+            index = payload["i"]
+            direction = payload["d"]
+            if not (0 <= index < len(self.ids) and self.ids[index] == boundary):
+                # The list changed since the cursor was issued
+                index = self.ids.index(boundary)
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            return 0
+        if direction == "previous":
+            return max(0, index - self.page_size)
+        return index + 1
+
+
+def page_url(request, cursor):
+    """Current URL's query string with the cursor parameter replaced."""
+    query = request.GET.copy()
+    query.pop("cursor", None)
+    if cursor:
+        query["cursor"] = cursor
+    return f"?{query.urlencode()}"
@@ -0,0 +1,181 @@
+from django.db.models import Case, IntegerField, Q, Value, When
+from .models import Recipe
+
+# Columns fetched for each search result row (see SearchResultRow)
+RESULT_FIELDS = (
+    "id",
+    "name",
+    "category",
+    "difficulty",
+    "prep_time",
+    "cooking_time",
+    "total_minutes",
+    "servings",
+    "description",
+    "image",
+    "image_derivatives",
+    "image_placeholder",
+    "favorites_count",
+)
+
+CATEGORY_LABELS = dict(Recipe.CATEGORY_CHOICES)
+
+
+class SearchResultRow:
+    """Lightweight, read-only row for the search results table."""
+
+    __slots__ = (
+        "id",
+        "name",
+        "category",
+        "difficulty",
+        "prep_time",
+        "cooking_time",
+        "total_time",
+        "servings",
+        "description",
+        "image",
+        "image_derivatives",
+        "image_placeholder",
+        "favorites_count",
+        "image_url",
+    )
+
+    def __init__(self, values):
+        self.id = values["id"]
+        self.name = values["name"]
+        self.category = CATEGORY_LABELS.get(values["category"], values["category"])
+        self.difficulty = values["difficulty"]
+        self.prep_time = values["prep_time"]
+        self.cooking_time = values["cooking_time"]
+        self.total_time = values["total_minutes"]
+        self.servings = values["servings"]
+        description = values["description"]
+        self.description = (
+            description[:100] + "..." if len(description) > 100 else description
+        )
+        self.image = values["image"]
+        self.image_derivatives = values["image_derivatives"]
+        self.image_placeholder = values["image_placeholder"]
+        self.favorites_count = values["favorites_count"]
+        self.image_url = image_url(values["image"])
+
+
+def image_url(name):
+    """Build the public URL for a stored Recipe.image name (or None)."""
+    if not name:
+        return None
+    return Recipe._meta.get_field("image").storage.url(name)
+
+
+def build_search_filters(cleaned_data):
+    """Translate RecipeSearchForm.cleaned_data into a single Q object."""
+    search_filters = Q()
+
+    # Recipe name search (partial matching with icontains)
+    recipe_name = cleaned_data.get("recipe_name")
+    if recipe_name:
+        search_filters &= Q(name__icontains=recipe_name)
+
+    # Ingredients search (any of the comma-separated names). Matching runs
+    # against the m2m table in a subquery so the outer query needs no
+    # distinct() to undo join duplicates.
+    ingredients = cleaned_data.get("ingredients")
+    if ingredients:
+        ingredient_filters = Q()
+        for ingredient in ingredients.split(","):
+            ingredient = ingredient.strip()
+            if ingredient:
+                ingredient_filters |= Q(ingredient__name__icontains=ingredient)
+        if ingredient_filters:
+            matching = Recipe.ingredients.through.objects.filter(ingredient_filters)
+            search_filters &= Q(pk__in=matching.values("recipe_id"))
+
+    # Category filter
+    category = cleaned_data.get("category")
+    if category:
+        search_filters &= Q(category=category)
+
+    # Difficulty filter (uses the annotated difficulty)
+    difficulty = cleaned_data.get("difficulty")
+    if difficulty:
+        search_filters &= Q(difficulty=difficulty)
+
+    # Total cooking time range filter (prep + cook)
+    min_cooking_time = cleaned_data.get("min_cooking_time")
+    if min_cooking_time:
+        search_filters &= Q(total_minutes__gte=min_cooking_time)
+
+    max_cooking_time = cleaned_data.get("max_cooking_time")
+    if max_cooking_time:
+        search_filters &= Q(total_minutes__lte=max_cooking_time)
+
+    # Servings range filter
+    min_servings = cleaned_data.get("min_servings")
+    if min_servings:
+        search_filters &= Q(servings__gte=min_servings)
+
+    max_servings = cleaned_data.get("max_servings")
+    if max_servings:
+        search_filters &= Q(servings__lte=max_servings)
+
+    return search_filters
+
+
+# Keyset orderings; each ends in "id" so ties break deterministically
+SEARCH_ORDERING = ("name_rank", "total_minutes", "id")
+SHOW_ALL_ORDERING = ("name", "id")
+# "Most popular": a scan of the (-favorites_count, -id) index on Recipe
+POPULAR_ORDERING = ("-favorites_count", "-id")
+
+# ?sort= values and their orderings; an empty value means the default order
+SORT_ORDERINGS = {"popular": POPULAR_ORDERING}
+
+
+def sort_ordering(request):
+    """The ordering ?sort= asks for, or None for the view's own default."""
+    return SORT_ORDERINGS.get(request.GET.get("sort", ""))
+
+
+def search_queryset(cleaned_data):
+    """Filtered recipes in relevance order: exact name match, then total time."""
+    queryset = Recipe.objects.with_metrics().filter(build_search_filters(cleaned_data))
+
+    # name_rank is 0 for case-insensitive exact name matches, 1 otherwise
+    recipe_name = cleaned_data.get("recipe_name")
+    if recipe_name:
+        name_rank = Case(
+            When(name__iexact=recipe_name, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    else:
+        name_rank = Value(1, output_field=IntegerField())
+    return queryset.annotate(name_rank=name_rank).order_by(*SEARCH_ORDERING)
+
+
+def show_all_queryset():
+    """Every recipe, alphabetically."""
+    return Recipe.objects.with_metrics().order_by(*SHOW_ALL_ORDERING)
+
+
+def result_values(queryset, *extra_fields):
+    """Restrict a queryset to the result table columns (plus any keyset fields)."""
+    # Accepts ordering fields as they are, "-" prefix included
+    extra_fields = [field.lstrip("-") for field in extra_fields]
+    extra_fields = [field for field in extra_fields if field not in RESULT_FIELDS]
+    return queryset.values(*RESULT_FIELDS, *extra_fields)
+
+
+def result_rows(queryset):
+    """Stream a queryset's rows into SearchResultRow objects."""
+    for values in result_values(queryset).iterator():
+        yield SearchResultRow(values)
+
+
+def rows_for_ids(ids):
+    """SearchResultRow objects for the given ids, in the given order."""
+    queryset = result_values(Recipe.objects.with_metrics().filter(pk__in=ids))
+    rows = {values["id"]: values for values in queryset}
+    # Ids deleted since they were cached simply drop out
+    return [SearchResultRow(rows[id]) for id in ids if id in rows]
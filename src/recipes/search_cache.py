@@ -0,0 +1,100 @@
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+from .catalog import catalog_generation, increment_counter
+from .facets import compute_facets
+from .search import search_queryset
+
+HITS_KEY = "recipes:search-cache:hits"
+MISSES_KEY = "recipes:search-cache:misses"
+
+DEFAULT_TIMEOUT = 300  # seconds
+
+
+def normalize_criteria(cleaned_data):
+    """Canonical form of RecipeSearchForm.cleaned_data.
+
+    Text matching is case-insensitive, so lowercasing is safe; ingredients
+    are trimmed, de-duplicated and sorted so "Garlic, tomato" and
+    "tomato,garlic" share a cache entry. Empty values are dropped.
+    """
+    criteria = {}
+    recipe_name = (cleaned_data.get("recipe_name") or "").strip().lower()
+    if recipe_name:
+        criteria["recipe_name"] = recipe_name
+
+    ingredients = {
+        ingredient.strip().lower()
+        for ingredient in (cleaned_data.get("ingredients") or "").split(",")
+    }
+    ingredients.discard("")
+    if ingredients:
+        criteria["ingredients"] = ", ".join(sorted(ingredients))
+
+    for field in (
+        "category",
+        "difficulty",
+        "min_cooking_time",
+        "max_cooking_time",
+        "min_servings",
+        "max_servings",
+    ):
+        value = cleaned_data.get(field)
+        if value:
+            criteria[field] = value
+    return criteria
+
+
+def cache_key(criteria, generation):
+    digest = hashlib.sha256(
+        json.dumps(criteria, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return f"recipes:search:{generation}:{digest}"
+
+
+def _cached_search(cleaned_data):
+    """(ids, facets, hit) for a search, filling the cache on a miss."""
+    criteria = normalize_criteria(cleaned_data)
+    key = cache_key(criteria, catalog_generation())
+
+    entry = cache.get(key)
+    if entry is not None:
+        return entry["ids"], entry["facets"], True
+
+    queryset = search_queryset(criteria)
+    ids = list(queryset.values_list("id", flat=True))
+    facets = compute_facets(queryset)
+    timeout = getattr(settings, "RECIPES_SEARCH_CACHE_TIMEOUT", DEFAULT_TIMEOUT)
+    cache.set(key, {"ids": ids, "facets": facets}, timeout)
+    return ids, facets, False
+
+
+def cached_search(cleaned_data):
+    """(ordered recipe ids, facet counts) for a search, cached when possible.
+
+    Entries are keyed by the catalog generation, so any Recipe/Ingredient
+    change makes earlier results unreachable (they then expire on their own).
+    A miss costs two queries: the ordered ids and one facet aggregate.
+    """
+    ids, facets, hit = _cached_search(cleaned_data)
+    increment_counter(HITS_KEY if hit else MISSES_KEY)
+    return ids, facets
+
+
+def prime_search(cleaned_data):
+    """Cache a search's results without counting a hit or miss (warm-up)."""
+    _cached_search(cleaned_data)
+
+
+def search_cache_stats():
+    """Hit/miss counters (cumulative since the cache was last cleared)."""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+        "generation": catalog_generation(),
+    }
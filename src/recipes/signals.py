@@ -0,0 +1,253 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.contrib.auth.models import User
+from django.dispatch import receiver
+from ingredients.models import Ingredient
+from .catalog import (
+    SITE_STATS,
+    adjust_site_stat,
+    bump_catalog_generation,
+    invalidate_category_counts,
+)
+from .chart_cache import bump_favorites_version, bump_favorites_versions_for_recipes
+from .favorites import add_recipe_favorites
+from .images import refresh_recipe_image
+from .insights import (
+    add_recipe_ingredients,
+    apply_contribution,
+    favorite_contribution,
+    move_recipe_favorites,
+)
+from .models import Favorite, Recipe
+from .similarity import refresh_recipe
+
+# Keep catalog-derived caches (search results, ...) in step with edits
+
+# Recipe fields the favorites charts are drawn from
+CHART_FIELDS = ("category", "prep_time", "cooking_time")
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def catalog_changed(sender, **kwargs):
+    bump_catalog_generation()
+
+
+def changed_recipe_ids(instance, action, reverse, pk_set):
+    """Ids of the recipes whose ingredient lists an m2m_changed event touched."""
+    # Forward (recipe.ingredients.add): instance is the recipe.
+    # Reverse (ingredient.recipes.add): pk_set holds the affected recipes.
+    if not reverse:
+        return [instance.pk]
+    if action == "post_clear":
+        return getattr(instance, "_cleared_recipe_ids", [])
+    return pk_set or []
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def remember_cleared_recipes(sender, instance, action, reverse, **kwargs):
+    # post_clear has no pk_set; note which recipes are about to lose the link
+    if action == "pre_clear" and reverse:
+        instance._cleared_recipe_ids = list(
+            instance.recipes.values_list("id", flat=True)
+        )
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed(sender, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_catalog_generation()
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def refresh_similar_recipes(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        for recipe_id in changed_recipe_ids(instance, action, reverse, pk_set):
+            refresh_recipe(recipe_id)
+
+
+# Favorites charts: invalidate a user's cached charts whenever their
+# favorites, or what the charts show about a favorited recipe, change
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def favorites_changed(sender, instance, **kwargs):
+    bump_favorites_version(instance.user_id)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_previous_fields(sender, instance, **kwargs):
+    # The stored chart fields and image, compared with the new values by the
+    # post_save receivers below
+    if instance.pk is None:
+        return
+    previous = (
+        Recipe.objects.filter(pk=instance.pk).values(*CHART_FIELDS, "image").first()
+    )
+    instance._previous_image = previous.pop("image") if previous else None
+    instance._previous_chart_fields = previous
+    instance._chart_fields_changed = previous is not None and any(
+        previous[field] != getattr(instance, field) for field in CHART_FIELDS
+    )
+
+
+# Site-wide totals (catalog.site_stats): count each row in or out
+SITE_STAT_NAMES = {model: name for name, model in SITE_STATS.items()}
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Favorite)
+def added_to_site_stats(sender, created, **kwargs):
+    if created:
+        adjust_site_stat(SITE_STAT_NAMES[sender], 1)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Favorite)
+def removed_from_site_stats(sender, **kwargs):
+    adjust_site_stat(SITE_STAT_NAMES[sender], -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_category_counts_changed(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous_chart_fields", None)
+    if created or (previous and previous["category"] != instance.category):
+        invalidate_category_counts()
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_removed_from_category_counts(sender, instance, **kwargs):
+    invalidate_category_counts()
+
+
+@receiver(post_save, sender=Recipe)
+def favorited_recipe_changed(sender, instance, created, **kwargs):
+    if not created and getattr(instance, "_chart_fields_changed", False):
+        bump_favorites_versions_for_recipes([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def favorited_recipe_ingredients_changed(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action in ("post_add", "post_remove", "post_clear"):
+        recipe_ids = changed_recipe_ids(instance, action, reverse, pk_set)
+        bump_favorites_versions_for_recipes(recipe_ids)
+
+
+@receiver(post_save, sender=Ingredient)
+def favorited_ingredient_renamed(sender, instance, created, **kwargs):
+    # The ingredients chart is labelled with ingredient names
+    if not created:
+        bump_favorites_versions_for_recipes(instance.recipes.values("id"))
+
+
+@receiver(pre_delete, sender=Ingredient)
+def remember_deleted_ingredient_recipes(sender, instance, **kwargs):
+    # The cascade removes recipe links without sending m2m_changed
+    instance._recipe_ids = list(instance.recipes.values_list("id", flat=True))
+
+
+@receiver(post_delete, sender=Ingredient)
+def favorited_ingredient_deleted(sender, instance, **kwargs):
+    bump_favorites_versions_for_recipes(getattr(instance, "_recipe_ids", []))
+
+
+# Site-wide insights: apply every favorites change to the rollup tables as
+# a counter delta (see recipes.insights)
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_added_to_rollups(sender, instance, created, **kwargs):
+    if created:
+        apply_contribution(favorite_contribution(instance), 1)
+
+
+@receiver(pre_delete, sender=Favorite)
+def remember_favorite_contribution(sender, instance, **kwargs):
+    # Read before a cascade (e.g. deleting the recipe) removes what it counted
+    instance._contribution = favorite_contribution(instance)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_removed_from_rollups(sender, instance, **kwargs):
+    contribution = getattr(instance, "_contribution", None)
+    if contribution is not None:
+        apply_contribution(contribution, -1)
+
+
+# Recipe.favorites_count: every Favorite created or deleted, whether by
+# add_favorite/remove_favorite, the admin or a cascade, passes through here
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_added_to_count(sender, instance, created, **kwargs):
+    if created:
+        add_recipe_favorites(instance.recipe_id, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_removed_from_count(sender, instance, **kwargs):
+    add_recipe_favorites(instance.recipe_id, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def favorited_recipe_moved_in_rollups(sender, instance, created, **kwargs):
+    if not created and getattr(instance, "_chart_fields_changed", False):
+        current = {field: getattr(instance, field) for field in CHART_FIELDS}
+        move_recipe_favorites(instance.pk, instance._previous_chart_fields, current)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def remember_unlinked_ids(sender, instance, action, reverse, pk_set, **kwargs):
+    # remove() reports every id it was given, linked or not, and clear()
+    # none at all: note the links that actually go away
+    if action not in ("pre_remove", "pre_clear"):
+        return
+    links = Recipe.ingredients.through.objects
+    if reverse:
+        links = links.filter(ingredient_id=instance.pk)
+        other = "recipe_id"
+    else:
+        links = links.filter(recipe_id=instance.pk)
+        other = "ingredient_id"
+    if action == "pre_remove":
+        links = links.filter(**{f"{other}__in": pk_set})
+    instance._unlinked_ids = list(links.values_list(other, flat=True))
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_changed_in_rollups(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if action == "post_add":
+        ids, delta = pk_set or [], 1
+    elif action in ("post_remove", "post_clear"):
+        ids, delta = getattr(instance, "_unlinked_ids", []), -1
+    else:
+        return
+    if reverse:
+        add_recipe_ingredients(ids, [instance.pk], delta)
+    else:
+        add_recipe_ingredients([instance.pk], ids, delta)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_uploaded(sender, instance, created, raw=False, **kwargs):
+    # Resized JPEG/WebP copies for srcset and the inline placeholder, only
+    # when the image was set or replaced
+    image_changed = created or instance.image.name != getattr(
+        instance, "_previous_image", None
+    )
+    if image_changed and not raw:
+        refresh_recipe_image(instance)
@@ -0,0 +1,70 @@
+import hashlib
+import posixpath
+import re
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Recipe images are stored under the SHA-256 of their content, sharded by
+# its first two bytes (recipe_images/ab/cd/abcd….jpg): directories stay
+# small, identical uploads share one file, names never collide and a URL's
+# content can never change, so it can be cached forever.
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+# <prefix>/ab/cd/<sha256>[_<width>w].<ext>, optionally with a derivatives/
+# directory (recipes.images) before the file name
+CONTENT_ADDRESSED_NAME = re.compile(
+    r"(?:^|/)(?P<a>[0-9a-f]{2})/(?P<b>[0-9a-f]{2})/(?:[^/]+/)?"
+    r"(?P=a)(?P=b)[0-9a-f]{60}(?:_\d+w)?\.[0-9a-z]+$"
+)
+
+
+def content_hash(file):
+    """Hex SHA-256 of a file's content, read in chunks; rewinds the file."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def content_addressed_name(name, digest):
+    """recipe_images/photo.JPG + digest -> recipe_images/ab/cd/<digest>.jpg."""
+    directory, filename = posixpath.split(name)
+    extension = posixpath.splitext(filename)[1].lower()
+    return posixpath.join(directory, digest[:2], digest[2:4], digest + extension)
+
+
+def is_content_addressed(name):
+    """Whether a stored name (or a derivative of one) is hash-addressed."""
+    return bool(name) and CONTENT_ADDRESSED_NAME.search(name) is not None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names each saved file after its content hash.
+
+    The upload's own file name only contributes its directory (upload_to)
+    and extension. Saving content that is already stored writes nothing
+    and returns the existing name.
+    """
+
+    def _save(self, name, content):
+        target = content_addressed_name(name, content_hash(content))
+        if self.exists(target):
+            return target
+        saved = super()._save(target, content)
+        if saved != target:
+            # Another process stored the same content between the check and
+            # the write, and FileSystemStorage picked a free name instead;
+            # the file under target has the same bytes, so drop the copy
+            self.delete(saved)
+        return target
+
+    def is_immutable(self, name):
+        """Whether a name's content never changes (see media.serve_media)."""
+        return is_content_addressed(name)
+
+
+recipe_image_storage = ContentAddressedStorage()
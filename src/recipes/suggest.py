@@ -0,0 +1,105 @@
+import sys
+import threading
+from bisect import bisect_left
+from ingredients.models import Ingredient
+from .catalog import catalog_generation
+from .models import Recipe
+
+
+class PrefixIndex:
+    """Case-insensitive prefix lookup over a sorted array of names.
+
+    Lookups are a binary search to the first candidate followed by a scan
+    of at most `limit` matches, so cost is O(log n + limit) with no
+    database access.
+    """
+
+    def __init__(self, entries):
+        # entries: iterable of (name, id); sorted by (lowercased name, id)
+        rows = sorted((self._key(name), name, id) for name, id in entries)
+        self.keys = [row[0] for row in rows]
+        self.names = [row[1] for row in rows]
+        self.ids = [row[2] for row in rows]
+
+    @staticmethod
+    def _key(name):
+        key = name.lower()
+        # Reuse the name's string object when it is already lowercase
+        return name if key == name else key
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, prefix, limit=10):
+        """Return up to limit (name, id) pairs whose name starts with prefix."""
+        prefix = prefix.lower()
+        matches = []
+        index = bisect_left(self.keys, prefix)
+        while (
+            index < len(self.keys)
+            and len(matches) < limit
+            and self.keys[index].startswith(prefix)
+        ):
+            matches.append((self.names[index], self.ids[index]))
+            index += 1
+        return matches
+
+    def memory_bytes(self):
+        """Approximate footprint of the arrays and the strings they hold."""
+        total = sum(sys.getsizeof(array) for array in (self.keys, self.names, self.ids))
+        total += sum(sys.getsizeof(key) for key in self.keys)
+        # Names that are already lowercase share the key's string object
+        total += sum(
+            sys.getsizeof(name)
+            for key, name in zip(self.keys, self.names)
+            if name is not key
+        )
+        total += sum(sys.getsizeof(id) for id in self.ids)
+        return total
+
+
+class SuggestionIndex:
+    """Per-process ingredient and recipe-name indexes, rebuilt lazily.
+
+    The indexes are rebuilt on the first lookup after the catalog
+    generation changes (Recipe/Ingredient save or delete), so lookups
+    between edits never touch the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self.ingredients = PrefixIndex([])
+        self.recipes = PrefixIndex([])
+
+    def refresh(self):
+        """Rebuild both indexes if the catalog changed since the last build."""
+        generation = catalog_generation()
+        if generation == self._generation:
+            return
+        with self._lock:
+            if generation == self._generation:
+                return
+            ingredients = PrefixIndex(Ingredient.objects.values_list("name", "id"))
+            recipes = PrefixIndex(Recipe.objects.values_list("name", "id"))
+            # Swap in complete indexes so concurrent readers never see a
+            # half-built one
+            self.ingredients, self.recipes = ingredients, recipes
+            self._generation = generation
+
+    def suggest(self, prefix, limit=10):
+        """Prefix matches for both ingredient and recipe names."""
+        self.refresh()
+        return {
+            "ingredients": [name for name, _ in self.ingredients.lookup(prefix, limit)],
+            "recipes": [
+                {"id": id, "name": name}
+                for name, id in self.recipes.lookup(prefix, limit)
+            ],
+        }
+
+    def memory_bytes(self):
+        return self.ingredients.memory_bytes() + self.recipes.memory_bytes()
+
+
+suggestion_index = SuggestionIndex()
@@ -0,0 +1,222 @@
+import math
+from django.utils.html import escape
+from .instrumentation import timed
+
+# Draws the favorites charts as SVG straight from chart_data dicts: plain
+# string building, no matplotlib. Colours and titles follow chart_utils so
+# switching RECIPES_CHART_RENDERER doesn't change the look of the page.
+
+TITLE_COLOR = "#2c3e50"
+LABEL_COLOR = "#495057"
+PIE_COLORS = (
+    "#2c3e50",
+    "#34495e",
+    "#7f8c8d",
+    "#95a5a6",
+    "#bdc3c7",
+    "#ecf0f1",
+    "#e74c3c",
+    "#c0392b",
+    "#f39c12",
+    "#f1c40f",
+)
+FONT = 'font-family="Helvetica, Arial, sans-serif"'
+
+
+def _number(value):
+    # Compact coordinates: 12.0 -> "12", 12.3456 -> "12.35"
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def _text(x, y, content, size=12, anchor="middle", extra=""):
+    return (
+        f'<text x="{_number(x)}" y="{_number(y)}" font-size="{size}" '
+        f'text-anchor="{anchor}" {extra}>{escape(content)}</text>'
+    )
+
+
+def _document(width, height, title, body):
+    return "".join(
+        [
+            f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+            f'width="{width}" height="{height}" role="img" {FONT}>',
+            f"<title>{escape(title)}</title>",
+            f'<rect width="{width}" height="{height}" fill="white"/>',
+            _text(
+                width / 2,
+                30,
+                title,
+                size=18,
+                extra=f'font-weight="bold" fill="{TITLE_COLOR}"',
+            ),
+            *body,
+            "</svg>",
+        ]
+    )
+
+
+def _value_axes(data, width, height, margin, rotate_labels):
+    """Grid, ticks and axis titles; returns (x positions, slot width, y(), body)."""
+    left, top, right, bottom = margin
+    plot_width = width - left - right
+    plot_height = height - top - bottom
+    highest = max(data["values"]) or 1
+    step = max(1, math.ceil(highest / 5))
+    y_max = highest * 1.15
+
+    def y(value):
+        return top + plot_height - value / y_max * plot_height
+
+    body = []
+    for tick in range(0, int(y_max) + 1, step):
+        body.append(
+            f'<line x1="{left}" x2="{left + plot_width}" y1="{_number(y(tick))}" '
+            f'y2="{_number(y(tick))}" stroke="#ccc" stroke-dasharray="4 3"/>'
+        )
+        body.append(_text(left - 8, y(tick) + 4, str(tick), size=11, anchor="end"))
+    body.append(
+        f'<line x1="{left}" x2="{left}" y1="{top}" y2="{top + plot_height}" '
+        f'stroke="#333"/>'
+    )
+    body.append(
+        f'<line x1="{left}" x2="{left + plot_width}" y1="{top + plot_height}" '
+        f'y2="{top + plot_height}" stroke="#333"/>'
+    )
+
+    slot = plot_width / len(data["values"])
+    xs = [left + slot * (i + 0.5) for i in range(len(data["values"]))]
+    for x, label in zip(xs, data["labels"]):
+        label_y = top + plot_height + 16
+        if rotate_labels:
+            body.append(
+                _text(
+                    x,
+                    label_y,
+                    label,
+                    size=11,
+                    anchor="end",
+                    extra=f'transform="rotate(-45 {_number(x)} {_number(label_y)})"',
+                )
+            )
+        else:
+            body.append(_text(x, label_y, label, size=11))
+
+    body.append(
+        _text(
+            left + plot_width / 2,
+            height - 12,
+            data.get("x_label", ""),
+            extra=f'fill="{LABEL_COLOR}"',
+        )
+    )
+    body.append(
+        _text(
+            16,
+            top + plot_height / 2,
+            data.get("y_label", ""),
+            extra=(
+                f'fill="{LABEL_COLOR}" '
+                f'transform="rotate(-90 16 {_number(top + plot_height / 2)})"'
+            ),
+        )
+    )
+    return xs, slot, y, body
+
+
+def bar_chart_svg(data, width=720, height=420):
+    """Vertical bars with value labels (the ingredients chart)."""
+    xs, slot, y, body = _value_axes(
+        data, width, height, (60, 50, 20, 130), rotate_labels=True
+    )
+    bar_width = slot * 0.8
+    baseline = y(0)
+    for x, value in zip(xs, data["values"]):
+        body.append(
+            f'<rect x="{_number(x - bar_width / 2)}" y="{_number(y(value))}" '
+            f'width="{_number(bar_width)}" height="{_number(baseline - y(value))}" '
+            f'fill="#2c3e50" fill-opacity="0.8"/>'
+        )
+        body.append(
+            _text(x, y(value) - 4, str(value), extra='font-weight="bold"'),
+        )
+    return _document(width, height, data["title"], body)
+
+
+def line_chart_svg(data, width=720, height=380):
+    """Line with markers and value labels (the cooking time chart)."""
+    xs, _, y, body = _value_axes(
+        data, width, height, (60, 50, 20, 70), rotate_labels=False
+    )
+    points = " ".join(
+        f"{_number(x)},{_number(y(value))}" for x, value in zip(xs, data["values"])
+    )
+    body.append(
+        f'<polyline points="{points}" fill="none" stroke="#2c3e50" '
+        f'stroke-width="3" stroke-linejoin="round"/>'
+    )
+    for x, value in zip(xs, data["values"]):
+        body.append(
+            f'<circle cx="{_number(x)}" cy="{_number(y(value))}" r="5" '
+            f'fill="#e74c3c" stroke="#2c3e50" stroke-width="1.5"/>'
+        )
+        body.append(_text(x, y(value) - 10, str(value), extra='font-weight="bold"'))
+    return _document(width, height, data["title"], body)
+
+
+def pie_chart_svg(data, width=560, height=440):
+    """Pie starting at 12 o'clock, anticlockwise, with percentages (categories)."""
+    cx, cy, radius = width / 2, height / 2 + 20, min(width, height) / 2 - 70
+    total = sum(data["values"])
+    body = []
+    angle = math.pi / 2
+
+    def point(theta, distance):
+        return cx + distance * math.cos(theta), cy - distance * math.sin(theta)
+
+    for i, (label, value) in enumerate(zip(data["labels"], data["values"])):
+        color = PIE_COLORS[i % len(PIE_COLORS)]
+        sweep = 2 * math.pi * value / total
+        if value == total:
+            body.append(
+                f'<circle cx="{_number(cx)}" cy="{_number(cy)}" '
+                f'r="{_number(radius)}" fill="{color}"/>'
+            )
+        else:
+            start_x, start_y = point(angle, radius)
+            end_x, end_y = point(angle + sweep, radius)
+            large_arc = 1 if sweep > math.pi else 0
+            body.append(
+                f'<path d="M{_number(cx)},{_number(cy)} '
+                f"L{_number(start_x)},{_number(start_y)} "
+                f"A{_number(radius)},{_number(radius)} 0 {large_arc} 0 "
+                f'{_number(end_x)},{_number(end_y)} Z" fill="{color}" '
+                f'stroke="white"/>'
+            )
+
+        middle = angle + sweep / 2
+        percent_x, percent_y = point(middle, radius * 0.6)
+        body.append(
+            _text(
+                percent_x,
+                percent_y + 4,
+                f"{value / total * 100:.1f}%",
+                size=11,
+                extra='fill="white" font-weight="bold"',
+            )
+        )
+        label_x, label_y = point(middle, radius * 1.12)
+        anchor = "start" if math.cos(middle) > 0.01 else "end"
+        if abs(math.cos(middle)) <= 0.01:
+            anchor = "middle"
+        body.append(_text(label_x, label_y + 4, label, size=12, anchor=anchor))
+        angle += sweep
+    return _document(width, height, data["title"], body)
+
+
+RENDERERS = {"bar": bar_chart_svg, "line": line_chart_svg, "pie": pie_chart_svg}
+
+
+def render_svg(data):
+    """SVG document for a chart_data dict."""
+    with timed("chart"):
+        return RENDERERS[data["type"]](data)
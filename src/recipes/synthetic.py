@@ -0,0 +1,281 @@
+import itertools
+import random
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from ingredients.models import Ingredient
+from .catalog import (
+    SITE_STATS,
+    SITE_STATS_KEY,
+    bump_catalog_generation,
+    invalidate_category_counts,
+)
+from .chart_cache import bump_favorites_versions
+from .favorites import counted_favorites
+from .insights import rebuild_rollups
+from .models import Favorite, Recipe
+
+# Deterministic synthetic catalogs for load testing and benchmarks
+# (generate_catalog and benchmark_views commands). Everything is written
+# with bulk_create in batches, so no signals run: favorites_count and the
+# insights rollups are recomputed once at the end instead.
+#
+# Popularity is Zipf-like, as in real catalogs: a few ingredients appear in
+# most recipes, a few recipes collect most favorites and a few users make
+# most of them. The same seed always produces the same data.
+
+# Zipf exponents: weight of the item ranked r is 1 / r**s
+INGREDIENT_EXPONENT = 1.1
+RECIPE_EXPONENT = 1.0
+USER_EXPONENT = 0.7
+
+# Ingredients per recipe
+MIN_INGREDIENTS = 3
+MAX_INGREDIENTS = 15
+
+# No user favorites more than this share of the catalog
+MAX_USER_SHARE = 0.25
+
+USERNAME_PREFIX = "synthetic"
+
+# fmt: off
+FOODS = (
+    "garlic", "onion", "tomato", "basil", "butter", "flour", "egg", "milk",
+    "rice", "chicken", "beef", "pork", "salmon", "shrimp", "tofu", "lentil",
+    "chickpea", "potato", "carrot", "celery", "spinach", "kale", "mushroom",
+    "pepper", "chili", "ginger", "lemon", "lime", "orange", "apple", "banana",
+    "honey", "sugar", "cinnamon", "cumin", "paprika", "oregano", "thyme",
+    "parsley", "cilantro", "yogurt", "cream", "cheese", "bread", "pasta",
+    "noodle", "bean", "corn", "pea", "zucchini", "eggplant", "cabbage",
+    "walnut", "almond", "peanut", "oat", "coconut", "vinegar", "mustard",
+    "soy sauce",
+)
+QUALIFIERS = (
+    "", "fresh", "dried", "smoked", "roasted", "ground", "toasted", "pickled",
+    "wild", "baby", "red", "green", "black", "white", "sweet", "spicy",
+    "organic", "frozen", "aged", "whole",
+)
+STYLES = (
+    "Classic", "Rustic", "Quick", "Spicy", "Creamy", "Crispy", "Slow-Cooked",
+    "Grilled", "Roasted", "Herby", "Smoky", "Zesty", "Hearty", "Light",
+)
+# fmt: on
+DISHES = {
+    "breakfast": ("Omelette", "Pancakes", "Porridge", "Hash"),
+    "lunch": ("Wrap", "Sandwich", "Bowl", "Flatbread"),
+    "dinner": ("Stew", "Curry", "Roast", "Stir-Fry", "Casserole"),
+    "entree": ("Skewers", "Fritters", "Tartlets"),
+    "salad": ("Salad", "Slaw"),
+    "soup": ("Soup", "Chowder", "Broth"),
+    "dessert": ("Cake", "Pie", "Pudding", "Crumble"),
+    "snack": ("Bites", "Dip", "Crackers"),
+    "drink": ("Smoothie", "Lemonade", "Tea"),
+    "other": ("Sauce", "Pickles", "Spread"),
+}
+
+
+def zipf_cum_weights(n, exponent):
+    """Cumulative Zipf weights for ranks 1..n (for random.choices)."""
+    return list(itertools.accumulate(1 / rank**exponent for rank in range(1, n + 1)))
+
+
+def distinct_choices(rng, population, cum_weights, k):
+    """k distinct items drawn by weight (fewer if the draws keep repeating)."""
+    chosen = set()
+    for _ in range(20):
+        chosen.update(
+            rng.choices(population, cum_weights=cum_weights, k=k - len(chosen))
+        )
+        if len(chosen) >= k:
+            break
+    return chosen
+
+
+def ingredient_name(i):
+    """Unique ingredient name for index i: "garlic", "fresh garlic", ..."""
+    food = FOODS[i % len(FOODS)]
+    qualifier = QUALIFIERS[(i // len(FOODS)) % len(QUALIFIERS)]
+    name = f"{qualifier} {food}".strip()
+    combinations = len(FOODS) * len(QUALIFIERS)
+    return name if i < combinations else f"{name} {i // combinations + 1}"
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def create_ingredients(count, batch_size):
+    """Ingredient ids in popularity order (existing same-named ones reused)."""
+    ids = []
+    for names in _batched((ingredient_name(i) for i in range(count)), batch_size):
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name) for name in names], ignore_conflicts=True
+        )
+        by_name = dict(
+            Ingredient.objects.filter(name__in=names).values_list("name", "id")
+        )
+        ids.extend(by_name[name] for name in names)
+    return ids
+
+
+def create_recipes(rng, count, ingredient_ids, batch_size):
+    """Create recipes with Zipf-distributed ingredients; returns their ids."""
+    categories = list(DISHES)
+    ingredient_weights = zipf_cum_weights(len(ingredient_ids), INGREDIENT_EXPONENT)
+    ingredient_ranks = range(len(ingredient_ids))
+    Link = Recipe.ingredients.through
+    recipe_ids = []
+    for indexes in _batched(range(count), batch_size):
+        recipes = []
+        links = []
+        for _ in indexes:
+            category = rng.choice(categories)
+            ranks = distinct_choices(
+                rng,
+                ingredient_ranks,
+                ingredient_weights,
+                min(rng.randint(MIN_INGREDIENTS, MAX_INGREDIENTS), len(ingredient_ids)),
+            )
+            main = ingredient_name(min(ranks)).title()
+            recipes.append(
+                Recipe(
+                    name=f"{rng.choice(STYLES)} {main} {rng.choice(DISHES[category])}",
+                    description=f"A synthetic {category} recipe with {len(ranks)} "
+                    "ingredients. " * rng.randint(1, 4),
+                    category=category,
+                    prep_time=rng.choice((0, 5, 10, 15, 20, 30, 45)),
+                    cooking_time=int(rng.lognormvariate(3.2, 0.7)) + 1,
+                    servings=rng.randint(1, 8),
+                )
+            )
+            links.append(sorted(ranks))
+        # Ids are read back by position: bulk_create only returns primary
+        # keys on some databases
+        with transaction.atomic():
+            last_id = Recipe.objects.order_by("-id").values_list("id", flat=True)
+            last_id = last_id.first() or 0
+            Recipe.objects.bulk_create(recipes)
+            ids = list(
+                Recipe.objects.filter(id__gt=last_id)
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+        Link.objects.bulk_create(
+            Link(recipe_id=recipe_id, ingredient_id=ingredient_ids[rank])
+            for recipe_id, ranks in zip(ids, links)
+            for rank in ranks
+        )
+        recipe_ids.extend(ids)
+    return recipe_ids
+
+
+def create_users(count, batch_size):
+    """Create (or reuse) synthetic users; returns their ids, most active first.
+
+    They all share the password "synthetic" (hashed once; hashing per user
+    would dominate the run).
+    """
+    password = make_password(USERNAME_PREFIX)
+    ids = []
+    for indexes in _batched(range(count), batch_size):
+        usernames = [f"{USERNAME_PREFIX}{i:07d}" for i in indexes]
+        User.objects.bulk_create(
+            [User(username=name, password=password) for name in usernames],
+            ignore_conflicts=True,
+        )
+        by_name = dict(
+            User.objects.filter(username__in=usernames).values_list("username", "id")
+        )
+        ids.extend(by_name[name] for name in usernames)
+    return ids
+
+
+def favorites_per_user(total, users, recipes):
+    """How many favorites each user (by activity rank) makes, about total in all."""
+    weights = [1 / rank**USER_EXPONENT for rank in range(1, users + 1)]
+    scale = total / sum(weights)
+    cap = max(1, int(recipes * MAX_USER_SHARE))
+    return [min(cap, round(weight * scale)) for weight in weights]
+
+
+def create_favorites(rng, total, user_ids, recipe_ids, batch_size):
+    """Favorites with Zipf-popular recipes and Zipf-active users; returns count."""
+    if not user_ids or not recipe_ids:
+        return 0
+    # Popularity ranks are shuffled so they don't follow creation order
+    by_popularity = list(recipe_ids)
+    rng.shuffle(by_popularity)
+    recipe_weights = zipf_cum_weights(len(by_popularity), RECIPE_EXPONENT)
+    # Favorites of synthetic users from an earlier run
+    existing = set(
+        Favorite.objects.filter(user__username__startswith=USERNAME_PREFIX).values_list(
+            "user_id", "recipe_id"
+        )
+    )
+
+    def favorites():
+        counts = favorites_per_user(total, len(user_ids), len(recipe_ids))
+        for user_id, count in zip(user_ids, counts):
+            if count:
+                for recipe_id in distinct_choices(
+                    rng, by_popularity, recipe_weights, count
+                ):
+                    if (user_id, recipe_id) not in existing:
+                        yield Favorite(user_id=user_id, recipe_id=recipe_id)
+
+    created = 0
+    for batch in _batched(favorites(), batch_size):
+        Favorite.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def reset_catalog_caches():
+    """Drop search results, suggestions, counts etc. cached for the catalog.
+
+    Needed after bulk writes (which send no signals) and after rolling
+    them back.
+    """
+    bump_catalog_generation()
+    invalidate_category_counts()
+    cache.delete_many([SITE_STATS_KEY.format(name) for name in SITE_STATS])
+
+
+def generate_catalog(
+    recipes, ingredients, users, favorites, seed=0, batch_size=5000, log=None
+):
+    """Bulk-create a synthetic catalog; returns the numbers created.
+
+    Derived data the skipped signals would maintain is rebuilt afterwards:
+    Recipe.favorites_count, the insights rollups, favorites versions and
+    the catalog caches.
+    Similar-recipe suggestions are left to rebuild_similarities.
+    """
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+
+    ingredient_ids = create_ingredients(ingredients, batch_size)
+    log(f"{len(ingredient_ids)} ingredients")
+    recipe_ids = create_recipes(rng, recipes, ingredient_ids, batch_size)
+    log(f"{len(recipe_ids)} recipes")
+    user_ids = create_users(users, batch_size)
+    log(f"{len(user_ids)} users")
+    favorite_count = create_favorites(rng, favorites, user_ids, recipe_ids, batch_size)
+    log(f"{favorite_count} favorites")
+
+    Recipe.objects.update(favorites_count=counted_favorites())
+    rebuild_rollups()
+    # Reused synthetic users may have charts cached for their old favorites
+    for batch in _batched(user_ids, batch_size):
+        bump_favorites_versions(batch)
+    reset_catalog_caches()
+    log("Rebuilt favorites counts and insights rollups")
+    return {
+        "ingredients": len(ingredient_ids),
+        "recipes": len(recipe_ids),
+        "users": len(user_ids),
+        "favorites": favorite_count,
+    }
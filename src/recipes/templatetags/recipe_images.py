@@ -0,0 +1,70 @@
+from django import template
+from django.utils.html import format_html
+from recipes import images
+
+register = template.Library()
+
+
+def _image(recipe):
+    # Recipe.image is a FieldFile; search result rows carry the stored name
+    image = recipe.image
+    return getattr(image, "name", image) or "", recipe.image_derivatives
+
+
+@register.filter
+def image_srcset(recipe, fmt="jpeg"):
+    """srcset of a recipe's resized images: {{ recipe|image_srcset:"webp" }}."""
+    name, derivatives = _image(recipe)
+    return images.srcset(name, derivatives, fmt)
+
+
+def _placeholder_style(recipe):
+    # Painted behind the <img> until the real image covers it; the row
+    # already carries it, so it costs no request or query
+    placeholder = getattr(recipe, "image_placeholder", "")
+    if not placeholder:
+        return ""
+    return format_html(
+        ' style="background: center / cover no-repeat url({})"', placeholder
+    )
+
+
+@register.simple_tag
+def responsive_image(recipe, sizes, css_class="", alt=None, loading="lazy"):
+    """A <picture> offering WebP and JPEG derivatives, sized by `sizes`.
+
+    Falls back to a plain <img> of the original until derivatives exist.
+    The recipe's low-quality placeholder, if any, shows while it loads.
+    """
+    name, derivatives = _image(recipe)
+    alt = recipe.name if alt is None else alt
+    style = _placeholder_style(recipe)
+    jpeg_srcset = images.srcset(name, derivatives, "jpeg")
+    if not jpeg_srcset:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}"{}>',
+            images.image_storage().url(name),
+            alt,
+            css_class,
+            loading,
+            style,
+        )
+    return format_html(
+        "<picture>"
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}"{}>'
+        "</picture>",
+        images.srcset(name, derivatives, "webp"),
+        sizes,
+        # Browsers without srcset support get the largest derivative, not
+        # the multi-megabyte original
+        images.derivative_storage().url(
+            images.derivative_name(name, derivatives["widths"][-1], "jpeg")
+        ),
+        jpeg_srcset,
+        sizes,
+        alt,
+        css_class,
+        loading,
+        style,
+    )
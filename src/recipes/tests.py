@@ -1,8 +1,68 @@
-from django.test import TestCase, Client
+import base64
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+from xml.etree import ElementTree
+from django.conf import settings
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.core.management import call_command
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count
+from django.http import HttpResponse
+from django.utils import timezone
 from ingredients.models import Ingredient
-from .models import Recipe, Favorite
+from .models import (
+    Recipe,
+    Favorite,
+    FavoritesVersion,
+    RecipeSimilarity,
+    ChartJob,
+    CategoryFavoriteRollup,
+    CookingTimeFavoriteRollup,
+    IngredientFavoriteRollup,
+)
+from .search_cache import cached_search, normalize_criteria, search_cache_stats
+from .suggest import PrefixIndex
+from .pantry import pantry_search
+from .facets import compute_facets
+from .similarity import rebuild_all
+from .chart_cache import chart_cache_stats, favorites_version
+from .favorites import reconcile_favorites_counts
+from .insights import rebuild_rollups
+from .catalog import recipe_category_counts, site_stats
+from .featured import random_recipe
+from .instrumentation import SQLInstrumentationMiddleware, fingerprint
+from .synthetic import generate_catalog
+from .images import (
+    backfill_derivatives,
+    backfill_placeholders,
+    derivative_name,
+    derivative_storage,
+    image_storage,
+    process_image,
+    rehash_images,
+)
+from .media import serve_media
+from .storage import ContentAddressedStorage, is_content_addressed
+from .chart_data import SAMPLE_CHART_DATA, saved_recipe_chart_data
+from .svg_charts import render_svg
+from .chart_utils import FigurePool, render_charts_from_data
+from . import chart_cache, chart_utils, warmup
+from .chart_jobs import CHARTS, claim_job, run_chart_job
 
 
 class RecipeModelTests(TestCase):
@@ -42,6 +102,14 @@ class RecipeModelTests(TestCase):
         )
         self.assertEqual(recipe.total_time, 75)
 
+    def test_recipe_total_time_follows_edits_after_with_metrics(self):
+        """Test that total_time reflects edits to an annotated recipe."""
+        Recipe.objects.create(name="Stew", prep_time=10, cooking_time=20)
+        recipe = Recipe.objects.with_metrics().get(name="Stew")
+        self.assertEqual(recipe.total_minutes, 30)
+        recipe.cooking_time = 50
+        self.assertEqual(recipe.total_time, 60)
+
     def test_recipe_difficulty_easy(self):
         """Test that recipes with short time and few ingredients are marked as Easy."""
         recipe = Recipe.objects.create(
@@ -79,6 +147,31 @@ class RecipeModelTests(TestCase):
         # Total time (90) > 30 minutes should be Hard
         self.assertEqual(recipe.difficulty, "Hard")
 
+    def test_with_metrics_matches_difficulty_property(self):
+        """Test that with_metrics() annotations agree with the Python properties."""
+        easy = Recipe.objects.create(name="Toast", prep_time=2, cooking_time=3)
+        easy.ingredients.add(self.salt)
+        medium = Recipe.objects.create(name="Stew", prep_time=10, cooking_time=15)
+        medium.ingredients.add(self.salt, self.garlic, self.pasta)
+        hard = Recipe.objects.create(name="Roast", prep_time=30, cooking_time=60)
+
+        annotated = {r.id: r for r in Recipe.objects.with_metrics()}
+        for recipe in (easy, medium, hard):
+            self.assertEqual(annotated[recipe.id].difficulty, recipe.difficulty)
+            self.assertEqual(annotated[recipe.id].total_minutes, recipe.total_time)
+        self.assertEqual(annotated[medium.id].ingredient_count, 3)
+        self.assertEqual(annotated[hard.id].ingredient_count, 0)
+
+    def test_with_metrics_difficulty_needs_no_extra_queries(self):
+        """Test that annotated recipes don't run a COUNT query per difficulty read."""
+        for i in range(3):
+            recipe = Recipe.objects.create(name=f"Dish {i}", cooking_time=10)
+            recipe.ingredients.add(self.salt)
+
+        with self.assertNumQueries(1):
+            difficulties = [r.difficulty for r in Recipe.objects.with_metrics()]
+        self.assertEqual(difficulties, ["Easy", "Easy", "Easy"])
+
     def test_recipe_category_choices(self):
         """Test that recipe categories can be set and retrieved correctly."""
         recipe = Recipe.objects.create(
@@ -685,6 +778,10 @@ class RecipeSearchViewTests(TestCase):
         )
         cls.complex_recipe.ingredients.add(cls.tomato, cls.garlic)
 
+    def setUp(self):
+        """Start each test with an empty search cache."""
+        cache.clear()
+
     def test_search_view_accessible(self):
         """Test that search view is accessible via URL."""
         response = self.client.get(reverse("recipes:recipe_search"))
@@ -738,6 +835,37 @@ class RecipeSearchViewTests(TestCase):
         self.assertContains(response, "Garlic Pasta")
         self.assertNotContains(response, "Tomato Sauce")
 
+    def test_search_by_difficulty_with_ingredient_filter(self):
+        """Test that ingredient filters don't skew the SQL difficulty count."""
+        response = self.client.get(
+            reverse("recipes:recipe_search"),
+            {"ingredients": "garlic", "difficulty": "Easy"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["results_count"], 1)
+        self.assertContains(response, "Garlic Pasta")
+        self.assertNotContains(response, "Tomato Sauce")
+
+    def test_search_exact_name_match_ranked_first(self):
+        """Test that exact name matches come before faster partial matches."""
+        Recipe.objects.create(name="Pasta", category="dinner", cooking_time=45)
+        response = self.client.get(
+            reverse("recipes:recipe_search"), {"recipe_name": "PASTA"}
+        )
+        names = [row.name for row in response.context["search_results_list"]]
+        self.assertEqual(names, ["Pasta", "Garlic Pasta"])
+        self.assertEqual(response.context["results_count"], 2)
+
+    def test_search_results_sorted_by_total_time(self):
+        """Test that results without a name search are ordered by total time."""
+        response = self.client.get(
+            reverse("recipes:recipe_search"), {"ingredients": "garlic"}
+        )
+        rows = response.context["search_results_list"]
+        self.assertEqual([row.name for row in rows], ["Garlic Pasta", "Tomato Sauce"])
+        self.assertEqual(rows[0].category, "Lunch")
+        self.assertEqual(rows[0].difficulty, "Easy")
+
     def test_search_no_results(self):
         """Test search with no matching results."""
         response = self.client.get(
@@ -751,4 +879,1876 @@ class RecipeSearchViewTests(TestCase):
         response = self.client.get(reverse("recipes:recipe_search"))
         self.assertIn("search_performed", response.context)
 
-    
\ No newline at end of file
+
+class RecipePaginationTests(TestCase):
+    """Test cases for keyset (cursor) pagination on list and search pages."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create recipes that share a created_at so ties need the id key."""
+        cls.recipes = [
+            Recipe.objects.create(name=f"Recipe {i}", cooking_time=10 + i)
+            for i in range(5)
+        ]
+        Recipe.objects.update(created_at=timezone.now())
+
+    def walk(self, url, params):
+        """Follow next-page links, returning the page contents in order."""
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            pages.append(response)
+            if not response.context["page_obj"].has_next:
+                return pages
+            response = self.client.get(url + response.context["next_page_url"])
+
+    def test_recipes_list_pages_cover_every_recipe_once(self):
+        """Test that paging with tied created_at visits each recipe exactly once."""
+        pages = self.walk(reverse("recipes:recipes_list"), {"page_size": 2})
+        ids = [r.id for page in pages for r in page.context["recipes"]]
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(ids, sorted((r.id for r in self.recipes), reverse=True))
+
+    def test_recipes_list_previous_page(self):
+        """Test that the previous cursor returns the page before."""
+        url = reverse("recipes:recipes_list")
+        first = self.client.get(url, {"page_size": 2})
+        second = self.client.get(url + first.context["next_page_url"])
+        back = self.client.get(url + second.context["previous_page_url"])
+        self.assertEqual(
+            [r.id for r in back.context["recipes"]],
+            [r.id for r in first.context["recipes"]],
+        )
+        self.assertFalse(back.context["page_obj"].has_previous)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """Test that a tampered cursor token shows the first page."""
+        response = self.client.get(
+            reverse("recipes:recipes_list"), {"cursor": "bogus", "page_size": 2}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["recipes"]), 2)
+        self.assertFalse(response.context["page_obj"].has_previous)
+
+    def test_show_all_is_paginated_by_name(self):
+        """Test that Show All pages through every recipe alphabetically."""
+        pages = self.walk(
+            reverse("recipes:recipe_search"), {"show_all": "1", "page_size": 2}
+        )
+        names = [r.name for p in pages for r in p.context["search_results_list"]]
+        self.assertEqual(names, [f"Recipe {i}" for i in range(5)])
+        self.assertEqual(pages[0].context["results_count"], 5)
+
+    def test_search_pages_keep_relevance_order(self):
+        """Test that search pages continue in total time order."""
+        pages = self.walk(
+            reverse("recipes:recipe_search"), {"recipe_name": "recipe", "page_size": 3}
+        )
+        times = [r.total_time for p in pages for r in p.context["search_results_list"]]
+        self.assertEqual(times, [10, 11, 12, 13, 14])
+
+
+class SearchCacheTests(TestCase):
+    """Test cases for the normalized, generation-invalidated search cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up a recipe to search for."""
+        cls.garlic = Ingredient.objects.create(name="Garlic")
+        cls.tomato = Ingredient.objects.create(name="Tomato")
+        cls.recipe = Recipe.objects.create(name="Garlic Bread", cooking_time=10)
+        cls.recipe.ingredients.add(cls.garlic)
+
+    def setUp(self):
+        """Start each test with an empty cache."""
+        cache.clear()
+
+    def search(self, **params):
+        return self.client.get(reverse("recipes:recipe_search"), params)
+
+    def test_normalize_criteria_is_canonical(self):
+        """Test that case, whitespace and ingredient order don't change the key."""
+        a = normalize_criteria({"ingredients": " Tomato,garlic ,", "recipe_name": "X "})
+        b = normalize_criteria({"ingredients": "GARLIC, tomato", "recipe_name": "x"})
+        self.assertEqual(a, b)
+        self.assertEqual(a["ingredients"], "garlic, tomato")
+
+    def test_repeated_search_is_a_cache_hit(self):
+        """Test that an equivalent repeat search skips the search query."""
+        self.search(ingredients="garlic")
+        with self.assertNumQueries(1):  # only the page's rows
+            response = self.search(ingredients=" GARLIC ")
+        self.assertContains(response, "Garlic Bread")
+        stats = search_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_recipe_save_invalidates_results(self):
+        """Test that a new recipe appears in an already-cached search."""
+        self.search(ingredients="garlic")
+        other = Recipe.objects.create(name="Garlic Soup", cooking_time=20)
+        other.ingredients.add(self.garlic)
+        response = self.search(ingredients="garlic")
+        self.assertContains(response, "Garlic Soup")
+        self.assertEqual(search_cache_stats()["misses"], 2)
+
+    def test_ingredient_change_invalidates_results(self):
+        """Test that m2m changes on Recipe.ingredients invalidate the cache."""
+        self.assertNotContains(self.search(ingredients="tomato"), "Garlic Bread")
+        self.recipe.ingredients.add(self.tomato)
+        self.assertContains(self.search(ingredients="tomato"), "Garlic Bread")
+
+    def test_cache_stats_view_requires_staff(self):
+        """Test that the stats endpoint is staff-only and returns counters."""
+        url = reverse("recipes:search_cache_stats")
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        User.objects.create_user(username="admin", password="pass", is_staff=True)
+        self.client.login(username="admin", password="pass")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["hits"], 0)
+
+
+class RecipeSuggestTests(TestCase):
+    """Test cases for the autocomplete prefix index and JSON endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up ingredients and recipes sharing prefixes."""
+        for name in ("Garlic", "Garam Masala", "Ginger", "Tomato"):
+            Ingredient.objects.create(name=name)
+        cls.recipe = Recipe.objects.create(name="Garlic Bread", cooking_time=10)
+
+    def setUp(self):
+        """Start each test with a fresh catalog generation."""
+        cache.clear()
+
+    def suggest(self, q, **params):
+        return self.client.get(reverse("recipes:recipe_suggest"), {"q": q, **params})
+
+    def test_prefix_index_lookup(self):
+        """Test case-insensitive, sorted, limited prefix matching."""
+        index = PrefixIndex([("Garlic", 1), ("garam masala", 2), ("Ginger", 3)])
+        self.assertEqual(index.lookup("GAR"), [("garam masala", 2), ("Garlic", 1)])
+        self.assertEqual(index.lookup("g", limit=1), [("garam masala", 2)])
+        self.assertEqual(index.lookup("x"), [])
+
+    def test_suggest_returns_ingredients_and_recipes(self):
+        """Test that the endpoint returns both kinds of matches."""
+        data = self.suggest("gar").json()
+        self.assertEqual(data["ingredients"], ["Garam Masala", "Garlic"])
+        self.assertEqual(
+            data["recipes"], [{"id": self.recipe.id, "name": "Garlic Bread"}]
+        )
+
+    def test_suggest_empty_query(self):
+        """Test that a blank query returns empty lists."""
+        data = self.suggest("  ").json()
+        self.assertEqual((data["ingredients"], data["recipes"]), ([], []))
+
+    def test_suggest_needs_no_queries_between_changes(self):
+        """Test that repeat lookups are served from the in-memory index."""
+        self.suggest("gi")
+        with self.assertNumQueries(0):
+            self.assertEqual(self.suggest("gi").json()["ingredients"], ["Ginger"])
+
+    def test_suggest_index_refreshes_on_model_changes(self):
+        """Test that new ingredients appear after the catalog changes."""
+        self.suggest("gi")
+        Ingredient.objects.create(name="Gin")
+        self.assertEqual(self.suggest("gi").json()["ingredients"], ["Gin", "Ginger"])
+
+
+class PantrySearchTests(TestCase):
+    """Test cases for "What can I cook?" pantry-match ranking."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up recipes that need more or less of a small pantry."""
+        names = ("Egg", "Butter", "Flour", "Sugar", "Milk")
+        cls.egg, cls.butter, cls.flour, cls.sugar, cls.milk = [
+            Ingredient.objects.create(name=name) for name in names
+        ]
+        cls.omelet = Recipe.objects.create(name="Omelet", cooking_time=5)
+        cls.omelet.ingredients.add(cls.egg, cls.butter)
+        cls.cake = Recipe.objects.create(
+            name="Cake", category="dessert", cooking_time=40
+        )
+        cls.cake.ingredients.add(cls.egg, cls.butter, cls.flour, cls.sugar)
+        cls.pancakes = Recipe.objects.create(name="Pancakes", cooking_time=15)
+        cls.pancakes.ingredients.add(cls.egg, cls.flour, cls.milk)
+        cls.shake = Recipe.objects.create(name="Shake", cooking_time=2)
+        cls.shake.ingredients.add(cls.milk, cls.sugar)
+
+    def setUp(self):
+        """Start each test with a fresh catalog generation."""
+        cache.clear()
+
+    def test_rank_orders_by_missing_then_coverage(self):
+        """Test that recipes needing fewer extra ingredients rank first."""
+        match = pantry_search({"ingredients": "egg, BUTTER, flour"})
+        self.assertEqual(match.ids, [self.omelet.id, self.cake.id, self.pancakes.id])
+        self.assertEqual(
+            match.metrics([self.cake.id, self.pancakes.id]),
+            {self.cake.id: (3, 4), self.pancakes.id: (2, 3)},
+        )
+
+    def test_rank_applies_other_filters(self):
+        """Test that category and time filters narrow pantry results."""
+        match = pantry_search({"ingredients": "egg", "max_cooking_time": 20})
+        self.assertEqual(match.ids, [self.omelet.id, self.pancakes.id])
+        match = pantry_search({"ingredients": "egg", "category": "dessert"})
+        self.assertEqual(match.ids, [self.cake.id])
+
+    def test_pantry_mode_in_search_view(self):
+        """Test that pantry mode ranks rows and shows match columns."""
+        response = self.client.get(
+            reverse("recipes:recipe_search"),
+            {"ingredients": "milk, sugar", "pantry_mode": "on"},
+        )
+        rows = response.context["search_results_list"]
+        self.assertTrue(response.context["pantry_mode"])
+        self.assertEqual([row.name for row in rows], ["Shake", "Pancakes", "Cake"])
+        self.assertEqual(rows[0].missing_count, 0)
+        self.assertContains(response, "Pantry Match")
+
+    def test_pantry_json_lists_missing_ingredients(self):
+        """Test the JSON variant's coverage and missing ingredient names."""
+        response = self.client.get(
+            reverse("recipes:recipe_pantry"), {"ingredients": "egg, flour"}
+        )
+        data = response.json()
+        self.assertEqual(data["results_count"], 3)
+        pancakes = data["results"][0]
+        self.assertEqual(pancakes["name"], "Pancakes")
+        self.assertEqual(pancakes["missing_ingredients"], ["Milk"])
+        self.assertAlmostEqual(pancakes["coverage"], 2 / 3, places=4)
+
+    def test_pantry_json_requires_ingredients(self):
+        """Test that an empty pantry is a 400 error."""
+        response = self.client.get(reverse("recipes:recipe_pantry"))
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchFacetTests(TestCase):
+    """Test cases for facet counts returned alongside search results."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up recipes spread across categories, times and servings."""
+        cls.salt = Ingredient.objects.create(name="Salt")
+        for name, category, cooking_time, servings in (
+            ("Salted Toast", "breakfast", 5, 1),
+            ("Salted Oats", "breakfast", 20, 2),
+            ("Salted Roast", "dinner", 90, 8),
+            ("Sweet Tea", "drink", 5, 1),
+        ):
+            recipe = Recipe.objects.create(
+                name=name,
+                category=category,
+                cooking_time=cooking_time,
+                servings=servings,
+            )
+            if name.startswith("Salted"):
+                recipe.ingredients.add(cls.salt)
+
+    def setUp(self):
+        """Start each test with an empty cache."""
+        cache.clear()
+
+    def counts(self, facet_list):
+        return {
+            entry["label"]: entry["count"] for entry in facet_list if entry["count"]
+        }
+
+    def test_facets_in_one_aggregate_query(self):
+        """Test that every facet is computed by a single query."""
+        with self.assertNumQueries(1):
+            facets = compute_facets(Recipe.objects.with_metrics())
+        self.assertEqual(
+            self.counts(facets["category"]), {"Breakfast": 2, "Dinner": 1, "Drink": 1}
+        )
+        self.assertEqual(
+            self.counts(facets["total_time"]),
+            {"0-15 min": 2, "16-30 min": 1, "60+ min": 1},
+        )
+        self.assertEqual(self.counts(facets["servings"]), {"1-2": 3, "7+": 1})
+
+    def test_search_facets_cover_filtered_set(self):
+        """Test that facets describe only the current search results."""
+        response = self.client.get(
+            reverse("recipes:recipe_search"), {"ingredients": "salt"}
+        )
+        facets = response.context["facets"]
+        self.assertEqual(self.counts(facets["category"]), {"Breakfast": 2, "Dinner": 1})
+        self.assertEqual(
+            self.counts(facets["difficulty"]), {"Easy": 1, "Medium": 1, "Hard": 1}
+        )
+        self.assertContains(response, "facet-count")
+
+    def test_facet_link_narrows_search(self):
+        """Test that facet links add the filter and drop show_all."""
+        response = self.client.get(reverse("recipes:recipe_search"), {"show_all": "1"})
+        breakfast = response.context["facets"]["category"][0]
+        self.assertEqual(breakfast["url"], "?category=breakfast")
+        response = self.client.get(reverse("recipes:recipe_search") + breakfast["url"])
+        self.assertEqual(response.context["results_count"], 2)
+
+    def test_time_facet_links_match_their_counts(self):
+        """Test that each time bucket link finds exactly the recipes it counts."""
+        response = self.client.get(reverse("recipes:recipe_search"), {"show_all": "1"})
+        for entry in response.context["facets"]["total_time"]:
+            response = self.client.get(reverse("recipes:recipe_search") + entry["url"])
+            self.assertEqual(
+                response.context["results_count"], entry["count"], entry["label"]
+            )
+        self.assertEqual(entry["url"], "?min_cooking_time=61")
+
+    def test_pantry_facets_match_sql_facets(self):
+        """Test that array-computed pantry facets agree with the SQL ones."""
+        match = pantry_search({"ingredients": "salt"})
+        sql = compute_facets(
+            Recipe.objects.with_metrics().filter(ingredients=self.salt)
+        )
+        self.assertEqual(match.facets, sql)
+
+
+class SimilarRecipeTests(TestCase):
+    """Test cases for precomputed MinHash/LSH similar recipes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up recipes with overlapping ingredient lists."""
+        names = ("Egg", "Butter", "Flour", "Sugar", "Milk", "Basil")
+        cls.egg, cls.butter, cls.flour, cls.sugar, cls.milk, cls.basil = [
+            Ingredient.objects.create(name=name) for name in names
+        ]
+        cls.cake = Recipe.objects.create(
+            name="Cake", category="dessert", cooking_time=10
+        )
+        cls.cake.ingredients.add(cls.egg, cls.butter, cls.flour, cls.sugar)
+        cls.cookies = Recipe.objects.create(
+            name="Cookies", category="dessert", cooking_time=10
+        )
+        cls.cookies.ingredients.add(cls.egg, cls.butter, cls.flour, cls.sugar)
+        cls.pancakes = Recipe.objects.create(
+            name="Pancakes", category="breakfast", cooking_time=10
+        )
+        cls.pancakes.ingredients.add(cls.egg, cls.flour, cls.milk)
+        cls.pesto = Recipe.objects.create(
+            name="Pesto", category="dinner", cooking_time=10
+        )
+        cls.pesto.ingredients.add(cls.basil)
+
+    def neighbours(self, recipe):
+        return list(
+            RecipeSimilarity.objects.filter(recipe=recipe).values_list(
+                "similar__name", "score"
+            )
+        )
+
+    def test_ingredient_changes_refresh_neighbours(self):
+        """Test that adding ingredients stores ranked neighbours both ways."""
+        self.assertEqual(self.neighbours(self.cake)[0], ("Cookies", 1.0))
+        self.assertIn(("Cake", 1.0), self.neighbours(self.cookies))
+        self.assertEqual(self.neighbours(self.pesto), [])
+
+    def test_removing_ingredients_drops_recipe_from_lists(self):
+        """Test that a recipe with no ingredients left is no longer similar."""
+        self.cookies.ingredients.clear()
+        self.assertEqual(self.neighbours(self.cookies), [])
+        self.assertNotIn("Cookies", [name for name, _ in self.neighbours(self.cake)])
+
+    def test_edit_updates_lists_pointing_at_recipe(self):
+        """Test that an edit rescores the recipe in the lists that hold it."""
+        self.cookies.ingredients.remove(self.sugar)
+        self.assertIn(("Cookies", 0.75), self.neighbours(self.cake))
+        self.assertNotIn(("Cookies", 1.0), self.neighbours(self.cake))
+        self.cookies.ingredients.remove(self.egg, self.butter, self.flour)
+        self.cookies.ingredients.add(self.basil)
+        self.assertNotIn("Cookies", [name for name, _ in self.neighbours(self.cake)])
+        self.assertIn(("Cookies", 1.0), self.neighbours(self.pesto))
+
+    def test_rebuild_matches_incremental_result(self):
+        """Test that a full rebuild agrees with incremental refreshes."""
+        self.cookies.ingredients.remove(self.butter, self.sugar)
+        self.cookies.ingredients.add(self.milk)
+        recipes = (self.cake, self.cookies, self.pancakes, self.pesto)
+        incremental = [self.neighbours(recipe) for recipe in recipes]
+        self.assertEqual(rebuild_all(workers=1), 4)
+        self.assertEqual([self.neighbours(recipe) for recipe in recipes], incremental)
+
+    def test_detail_page_shows_similar_recipes(self):
+        """Test that the detail page lists similar recipes before same-category ones."""
+        response = self.client.get(
+            reverse("recipes:recipe_detail", args=[self.pancakes.id])
+        )
+        self.assertTrue(response.context["related_are_similar"])
+        self.assertEqual(
+            [recipe.name for recipe in response.context["related_recipes"]],
+            ["Cake", "Cookies"],
+        )
+        self.assertContains(response, "Similar Recipes")
+
+
+class FavoritesChartCacheTests(TestCase):
+    """Test cases for per-user caching of rendered favorites charts."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up a user with one favorited recipe."""
+        cls.user = User.objects.create_user(username="charts", password="pass12345")
+        cls.egg = Ingredient.objects.create(name="Egg")
+        cls.omelet = Recipe.objects.create(name="Omelet", cooking_time=5)
+        cls.omelet.ingredients.add(cls.egg)
+        cls.toast = Recipe.objects.create(name="Toast", cooking_time=3)
+        Favorite.objects.create(user=cls.user, recipe=cls.omelet)
+
+    def setUp(self):
+        """Log in and start from an empty cache."""
+        cache.clear()
+        self.client.login(username="charts", password="pass12345")
+
+    def view_charts(self):
+        response = self.client.get(reverse("recipes:favorites_list"))
+        url = response.context["chart_urls"]["categories_chart"]
+        response = self.client.get(url)
+        self.assertEqual(response["Content-Type"], "image/png")
+        return response.content
+
+    def test_repeat_views_hit_cache(self):
+        """Test that unchanged favorites are rendered once and then served."""
+        first = self.view_charts()
+        self.assertEqual(self.view_charts(), first)
+        stats = chart_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        # Each hit is credited with one chart's share of the render time
+        self.assertEqual(stats["saved_ms"], stats["render_ms"] // 3)
+
+    def test_adding_favorite_invalidates(self):
+        """Test that adding or removing a favorite re-renders the charts."""
+        self.view_charts()
+        self.client.get(reverse("recipes:add_favorite", args=[self.toast.id]))
+        self.view_charts()
+        self.client.get(reverse("recipes:remove_favorite", args=[self.toast.id]))
+        self.view_charts()
+        self.assertEqual(chart_cache_stats()["misses"], 3)
+
+    def test_favorited_recipe_changes_invalidate(self):
+        """Test that edits to what the charts show re-render them."""
+        self.view_charts()
+        self.omelet.description = "Fluffy"
+        self.omelet.save()
+        self.view_charts()
+        self.assertEqual(chart_cache_stats()["misses"], 1)
+
+        self.omelet.category = "lunch"
+        self.omelet.save()
+        self.view_charts()
+        self.omelet.ingredients.add(Ingredient.objects.create(name="Chive"))
+        self.view_charts()
+        self.egg.name = "Duck egg"
+        self.egg.save()
+        self.view_charts()
+        self.assertEqual(chart_cache_stats()["misses"], 4)
+
+    def test_favorites_version_is_stored_in_database(self):
+        """Test that the version survives a cleared cache and bumps with changes."""
+        version = favorites_version(self.user.pk)
+        cache.clear()
+        self.assertEqual(favorites_version(self.user.pk), version)
+        Favorite.objects.create(user=self.user, recipe=self.toast)
+        self.assertEqual(
+            FavoritesVersion.objects.get(user=self.user).version, version + 1
+        )
+
+    def test_other_recipes_do_not_invalidate(self):
+        """Test that edits to recipes nobody favorited keep the cache."""
+        self.view_charts()
+        self.toast.cooking_time = 4
+        self.toast.save()
+        self.toast.ingredients.add(self.egg)
+        self.view_charts()
+        self.assertEqual(chart_cache_stats()["misses"], 1)
+
+
+@override_settings(RECIPES_CHART_JOBS_EAGER=False)
+class ChartJobTests(TestCase):
+    """Test cases for queued favorites chart rendering."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up a user with a favorite and another user."""
+        cls.user = User.objects.create_user(username="queued", password="pass12345")
+        cls.other = User.objects.create_user(username="other", password="pass12345")
+        cls.recipe = Recipe.objects.create(name="Stew", cooking_time=90)
+        Favorite.objects.create(user=cls.user, recipe=cls.recipe)
+
+    def setUp(self):
+        """Log in and start from an empty cache."""
+        cache.clear()
+        self.client.login(username="queued", password="pass12345")
+
+    def test_favorites_page_queues_job_and_renders_placeholders(self):
+        """Test that the page returns without charts while the job is pending."""
+        response = self.client.get(reverse("recipes:favorites_list"))
+        job = response.context["chart_job"]
+        self.assertEqual(job.status, ChartJob.PENDING)
+        self.assertContains(response, "chart-placeholder")
+        # Images wait for the job; requested early they are not ready yet
+        url = response.context["chart_urls"]["categories_chart"]
+        self.assertContains(response, f'data-src="{url}"')
+        self.assertEqual(self.client.get(url).status_code, 503)
+        self.assertContains(
+            response, reverse("recipes:chart_job_status", args=[job.id])
+        )
+
+        # Reloading reuses the queued job
+        response = self.client.get(reverse("recipes:favorites_list"))
+        self.assertEqual(response.context["chart_job"].id, job.id)
+        self.assertEqual(ChartJob.objects.count(), 1)
+
+    def test_worker_renders_job_and_status_returns_charts(self):
+        """Test that the worker completes the job and the status endpoint serves it."""
+        job = self.client.get(reverse("recipes:favorites_list")).context["chart_job"]
+        status_url = reverse("recipes:chart_job_status", args=[job.id])
+        self.assertEqual(self.client.get(status_url).json()["status"], "pending")
+
+        call_command("run_chart_worker", "--workers", "1", "--once", stdout=StringIO())
+        status = self.client.get(status_url).json()
+        self.assertEqual(status["status"], "done")
+        url = status["charts"]["categories_chart"]
+        self.assertEqual(self.client.get(url)["Content-Type"], "image/png")
+
+        # The next page view loads the images straight away
+        response = self.client.get(reverse("recipes:favorites_list"))
+        self.assertIsNone(response.context["chart_job"])
+        self.assertContains(response, f'src="{url}"')
+
+    def test_favorite_change_supersedes_job(self):
+        """Test that a new favorites version replaces the previous job."""
+        self.client.get(reverse("recipes:favorites_list"))
+        Favorite.objects.filter(user=self.user).delete()
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        job = self.client.get(reverse("recipes:favorites_list")).context["chart_job"]
+        self.assertEqual(list(ChartJob.objects.values_list("id", flat=True)), [job.id])
+
+    def test_status_is_private_to_job_owner(self):
+        """Test that users can't poll each other's jobs."""
+        job = self.client.get(reverse("recipes:favorites_list")).context["chart_job"]
+        self.client.login(username="other", password="pass12345")
+        response = self.client.get(reverse("recipes:chart_job_status", args=[job.id]))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(RECIPES_CHART_JOBS_EAGER=True)
+    def test_eager_mode_renders_on_image_request(self):
+        """Test that eager mode renders when the first chart image is requested."""
+        response = self.client.get(reverse("recipes:favorites_list"))
+        self.assertIsNone(response.context["chart_job"])
+        self.assertFalse(ChartJob.objects.exists())
+
+        url = response.context["chart_urls"]["cooking_time_chart"]
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(ChartJob.objects.get().status, ChartJob.DONE)
+
+    @override_settings(RECIPES_CHART_JOBS_EAGER=True)
+    def test_failed_job_stays_failed_until_favorites_change(self):
+        """Test that a failed render answers 500 without rendering again."""
+        url = reverse("recipes:favorite_chart", args=["categories"])
+        empty = ({key: None for key in CHARTS.values()}, 1)
+        with mock.patch(
+            "recipes.chart_jobs.render_charts", return_value=empty
+        ) as render:
+            self.assertEqual(self.client.get(url).status_code, 500)
+            self.assertEqual(self.client.get(url).status_code, 500)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(ChartJob.objects.get().status, ChartJob.FAILED)
+
+        Favorite.objects.create(
+            user=self.user, recipe=Recipe.objects.create(name="Soup", cooking_time=9)
+        )
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(RECIPES_CHART_JOBS_EAGER=True)
+    def test_eager_request_renders_inline_while_job_runs(self):
+        """Test that a request doesn't wait for a job another request is running."""
+        version = favorites_version(self.user.pk)
+        ChartJob.objects.create(
+            user=self.user, version=version, status=ChartJob.RUNNING
+        )
+        url = reverse("recipes:favorite_chart", args=["categories"])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(ChartJob.objects.get().status, ChartJob.RUNNING)
+
+    def test_job_discarded_when_favorites_change_during_render(self):
+        """Test that charts aren't stored under a version they weren't drawn for."""
+        job = self.client.get(reverse("recipes:favorites_list")).context["chart_job"]
+        render = chart_cache.render_charts
+
+        def render_then_change(user):
+            result = render(user)
+            Favorite.objects.create(
+                user=user, recipe=Recipe.objects.create(name="Pie", cooking_time=40)
+            )
+            return result
+
+        self.assertTrue(claim_job(job.pk))
+        with mock.patch("recipes.chart_jobs.render_charts", render_then_change):
+            self.assertIsNone(run_chart_job(job.pk))
+        self.assertFalse(ChartJob.objects.filter(pk=job.pk).exists())
+
+
+class FavoriteChartImageTests(TestCase):
+    """Test cases for the per-chart PNG endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up a user whose favorite has no ingredients."""
+        cls.user = User.objects.create_user(username="png", password="pass12345")
+        cls.recipe = Recipe.objects.create(name="Water", cooking_time=1)
+        Favorite.objects.create(user=cls.user, recipe=cls.recipe)
+
+    def setUp(self):
+        """Log in and start from an empty cache."""
+        cache.clear()
+        self.client.login(username="png", password="pass12345")
+
+    def test_favorites_page_does_not_render_charts(self):
+        """Test that the page links chart images instead of embedding them."""
+        response = self.client.get(reverse("recipes:favorites_list"))
+        self.assertNotContains(response, "data:image/png;base64")
+        self.assertContains(
+            response, reverse("recipes:favorite_chart", args=["categories"])
+        )
+        self.assertEqual(chart_cache_stats()["misses"], 0)
+
+    def test_etag_revalidation(self):
+        """Test that a matching If-None-Match gets a 304 until favorites change."""
+        url = reverse("recipes:favorite_chart", args=["categories"])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b"\x89PNG"))
+        etag = response["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        other = Recipe.objects.create(name="Tea", cooking_time=5)
+        Favorite.objects.create(user=self.user, recipe=other)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_etag_follows_database_state(self):
+        """Test that the ETag survives a cleared cache and changes with recipe edits."""
+        url = reverse("recipes:favorite_chart_data")
+        etag = self.client.get(url)["ETag"]
+        cache.clear()
+        self.assertEqual(self.client.get(url)["ETag"], etag)
+
+        self.recipe.cooking_time = 2
+        self.recipe.save()
+        self.assertNotEqual(self.client.get(url)["ETag"], etag)
+
+    def test_empty_and_unknown_charts_are_404(self):
+        """Test that a chart with no data, or an unknown name, is not found."""
+        for name in ("ingredients", "nonexistent"):
+            url = reverse("recipes:favorite_chart", args=[name])
+            self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_chart_requires_login(self):
+        """Test that anonymous users are redirected to log in."""
+        self.client.logout()
+        url = reverse("recipes:favorite_chart", args=["categories"])
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+
+class ChartDataTests(TestCase):
+    """Test cases for the chart-data API and the SVG chart renderer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Set up a user with three favorites sharing some ingredients."""
+        cls.user = User.objects.create_user(username="svg", password="pass12345")
+        egg, flour, milk = [
+            Ingredient.objects.create(name=name) for name in ("Egg", "Flour", "Milk")
+        ]
+        recipes = [
+            ("Crepes", "breakfast", 20, [egg, flour, milk]),
+            ("Omelet", "breakfast", 10, [egg]),
+            ("Bread", "dinner", 90, [flour]),
+        ]
+        for name, category, cooking_time, ingredients in recipes:
+            recipe = Recipe.objects.create(
+                name=name, category=category, cooking_time=cooking_time
+            )
+            recipe.ingredients.add(*ingredients)
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        """Log in and start from an empty cache."""
+        cache.clear()
+        self.client.login(username="svg", password="pass12345")
+
+    def test_chart_data_aggregates(self):
+        """Test the aggregated numbers behind each chart."""
+        data = saved_recipe_chart_data(self.user)
+        ingredients = data["ingredients_chart"]
+        self.assertEqual(ingredients["labels"], ["Egg", "Flour", "Milk"])
+        self.assertEqual(ingredients["values"], [2, 2, 1])
+        categories = data["categories_chart"]
+        self.assertEqual(categories["labels"], ["Breakfast", "Dinner"])
+        self.assertEqual(categories["values"], [2, 1])
+        self.assertEqual(data["cooking_time_chart"]["values"], [1, 1, 0, 1])
+
+    def test_chart_data_endpoint(self):
+        """Test that the JSON endpoint serves the data with an ETag."""
+        url = reverse("recipes:favorite_chart_data")
+        response = self.client.get(url)
+        self.assertEqual(
+            response.json(), json.loads(json.dumps(saved_recipe_chart_data(self.user)))
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_svg_renderer_draws_every_chart_type(self):
+        """Test that bar, pie and line charts are well-formed SVG."""
+        for key, data in saved_recipe_chart_data(self.user).items():
+            root = ElementTree.fromstring(render_svg(data))
+            self.assertTrue(root.tag.endswith("svg"), key)
+        single = {"type": "pie", "title": "A & B", "labels": ["X"], "values": [3]}
+        svg = render_svg(single)
+        self.assertIn("<circle", svg)
+        self.assertIn("A &amp; B", svg)
+
+    @override_settings(RECIPES_CHART_RENDERER="svg", RECIPES_CHART_JOBS_EAGER=False)
+    def test_svg_deployment_skips_matplotlib(self):
+        """Test that with the SVG renderer charts are drawn per request."""
+        response = self.client.get(reverse("recipes:favorites_list"))
+        self.assertIsNone(response.context["chart_job"])
+        url = response.context["chart_urls"]["ingredients_chart"]
+        self.assertIn(".svg?v=", url)
+
+        response = self.client.get(url)
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertContains(response, "Flour")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(ChartJob.objects.exists())
+        self.assertEqual(chart_cache_stats()["misses"], 0)
+
+
+class ChartRendererTests(TestCase):
+    """Test cases for thread-safe chart rendering on pooled figures."""
+
+    def test_threaded_renders_are_byte_identical(self):
+        """Test that charts rendered from many threads match a serial render."""
+        expected = render_charts_from_data(SAMPLE_CHART_DATA)
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            results = list(
+                executor.map(render_charts_from_data, [SAMPLE_CHART_DATA] * 6)
+            )
+        for charts in results:
+            self.assertEqual(charts, expected)
+
+    def test_pool_bounds_concurrent_renders(self):
+        """Test that renders beyond the pool's limit wait for a free figure."""
+        pool = FigurePool(max_concurrent=2)
+        acquired = threading.Event()
+
+        def third_render():
+            with pool.figure("line"):
+                acquired.set()
+
+        with pool.figure("bar") as first, pool.figure("bar") as second:
+            self.assertIsNot(first, second)
+            thread = threading.Thread(target=third_render)
+            thread.start()
+            self.assertFalse(acquired.wait(timeout=0.2))
+        thread.join(timeout=5)
+        self.assertTrue(acquired.is_set())
+
+    def test_figures_are_reused_blank(self):
+        """Test that a returned figure is cleared and handed out again."""
+        pool = FigurePool(max_concurrent=1)
+        with pool.figure("pie") as figure:
+            figure.add_subplot().plot([1, 2])
+        with pool.figure("pie") as reused:
+            self.assertIs(reused, figure)
+            self.assertEqual(reused.axes, [])
+
+    def test_render_errors_are_logged(self):
+        """Test that a failed render is logged and yields empty charts."""
+        user = User.objects.create_user(username="broken", password="pass12345")
+        with mock.patch.object(
+            chart_utils, "render_charts_from_data", side_effect=ValueError("boom")
+        ), self.assertLogs("recipes.chart_utils", "ERROR") as logs:
+            charts = chart_utils.generate_all_saved_recipe_charts(user)
+        self.assertEqual(set(charts.values()), {None})
+        self.assertIn("ValueError: boom", logs.output[0])
+
+
+class ImportBudgetTests(TestCase):
+    """Test that heavy libraries stay off the boot path."""
+
+    HEAVY_MODULES = ("matplotlib", "pandas")
+
+    def test_setup_and_url_resolution_skip_heavy_imports(self):
+        """Test that booting and loading every view imports no pandas/matplotlib."""
+        script = (
+            "import django; django.setup(); "
+            "from django.urls import get_resolver, resolve; "
+            "get_resolver().url_patterns; resolve('/'); resolve('/favorites/')"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE="recipe_project.settings")
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", script],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        # -X importtime lines: "import time: self [us] | cumulative | name"
+        imported = {
+            line.rsplit("|", 1)[-1].strip()
+            for line in result.stderr.splitlines()
+            if line.startswith("import time:")
+        }
+        self.assertIn("recipes.views", imported)
+        heavy = sorted(
+            name for name in imported if name.split(".")[0] in self.HEAVY_MODULES
+        )
+        self.assertEqual(heavy, [])
+
+
+@override_settings(RECIPES_WARMUP_REQUIRED=True, RECIPES_CHART_RENDERER="svg")
+class WarmUpTests(TestCase):
+    """Test the worker warm-up and the readiness probe."""
+
+    def setUp(self):
+        warmup._ready.clear()
+        self.addCleanup(warmup._ready.clear)
+        Recipe.objects.create(name="Warm Soup", description="Soup", cooking_time=10)
+
+    def test_readiness_flips_after_warm_up(self):
+        """Test that /healthz/ready answers 503 before warm-up and 200 after."""
+        url = reverse("recipes:readiness")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()["ready"])
+
+        report = warmup.warm_up()
+        self.assertTrue(all(step["ok"] for step in report.values()), report)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()["steps"]), set(report))
+        self.assertIn("no-store", response["Cache-Control"])
+
+    def test_warm_up_compiles_every_template(self):
+        """Test that all recipes and accounts templates are loaded."""
+        templates = [
+            path
+            for label in warmup.TEMPLATE_APPS
+            for path in (settings.BASE_DIR / label / "templates").rglob("*.html")
+        ]
+        self.assertEqual(warmup.compile_templates(), len(templates))
+
+    def test_priming_leaves_search_cache_stats_alone(self):
+        """Test that warm-up fills the search cache without counting a miss."""
+        cache.clear()
+        warmup.prime_catalog_caches()
+        stats = search_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (0, 0))
+        cached_search({})
+        self.assertEqual(search_cache_stats()["hits"], 1)
+
+    def test_failing_step_does_not_block_readiness(self):
+        """Test that a broken step is reported and the worker still turns ready."""
+
+        def broken():
+            raise RuntimeError("boom")
+
+        steps = (("broken", broken),) + warmup.WARM_UP_STEPS[1:]
+        with mock.patch.object(warmup, "WARM_UP_STEPS", steps):
+            report = warmup.warm_up()
+        self.assertFalse(report["broken"]["ok"])
+        self.assertTrue(warmup.is_ready())
+
+    @override_settings(RECIPES_WARMUP_REQUIRED=False)
+    def test_ready_when_warm_up_not_required(self):
+        """Test that servers without the hook can opt out of the warm-up gate."""
+        self.assertEqual(self.client.get(reverse("recipes:readiness")).status_code, 200)
+
+    def test_warm_up_command(self):
+        """Test that the command prints a timing per step."""
+        out = StringIO()
+        call_command("warm_up", stdout=out)
+        for name, _ in warmup.WARM_UP_STEPS:
+            self.assertIn(f"{name}:", out.getvalue())
+
+
+class InsightsRollupTests(TestCase):
+    """Test that the site-wide insights rollups track favorites incrementally."""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f"cook{i}", password="pass12345")
+            for i in range(3)
+        ]
+        self.garlic = Ingredient.objects.create(name="garlic")
+        self.basil = Ingredient.objects.create(name="basil")
+        self.rice = Ingredient.objects.create(name="rice")
+        self.pasta = Recipe.objects.create(
+            name="Pasta", category="dinner", prep_time=5, cooking_time=10
+        )
+        self.pasta.ingredients.add(self.garlic, self.basil)
+        self.risotto = Recipe.objects.create(
+            name="Risotto", category="dinner", prep_time=10, cooking_time=40
+        )
+        self.risotto.ingredients.add(self.garlic, self.rice)
+
+    def snapshot(self):
+        """Non-zero rollup counters, comparable across rebuilds."""
+        return {
+            "ingredients": {
+                (row.ingredient.name, row.favorites)
+                for row in IngredientFavoriteRollup.objects.select_related(
+                    "ingredient"
+                ).filter(favorites__gt=0)
+            },
+            "categories": set(
+                CategoryFavoriteRollup.objects.filter(favorites__gt=0).values_list(
+                    "month", "category", "favorites"
+                )
+            ),
+            "cooking_times": set(
+                CookingTimeFavoriteRollup.objects.filter(favorites__gt=0).values_list(
+                    "bucket", "favorites"
+                )
+            ),
+        }
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        rebuild_rollups()
+        self.assertEqual(incremental, self.snapshot())
+        return incremental
+
+    def favorite(self, user, recipe):
+        return Favorite.objects.create(user=user, recipe=recipe)
+
+    def test_favorites_update_rollups(self):
+        """Test that creating and deleting favorites adjusts every rollup."""
+        for user in self.users:
+            self.favorite(user, self.pasta)
+        self.favorite(self.users[0], self.risotto)
+        snapshot = self.assertMatchesRebuild()
+        self.assertIn(("garlic", 4), snapshot["ingredients"])
+        self.assertIn(("rice", 1), snapshot["ingredients"])
+        self.assertEqual(snapshot["cooking_times"], {(0, 3), (2, 1)})
+
+        Favorite.objects.filter(user=self.users[1]).delete()
+        snapshot = self.assertMatchesRebuild()
+        self.assertIn(("garlic", 3), snapshot["ingredients"])
+
+    def test_favorite_views_update_rollups(self):
+        """Test that add_favorite and remove_favorite feed the rollups."""
+        self.client.login(username="cook0", password="pass12345")
+        self.client.post(reverse("recipes:add_favorite", args=[self.pasta.id]))
+        self.assertEqual(
+            IngredientFavoriteRollup.objects.get(ingredient=self.basil).favorites, 1
+        )
+        self.client.post(reverse("recipes:remove_favorite", args=[self.pasta.id]))
+        self.assertEqual(
+            IngredientFavoriteRollup.objects.get(ingredient=self.basil).favorites, 0
+        )
+
+    def test_recipe_edits_move_favorites(self):
+        """Test that category and cooking time changes re-file existing favorites."""
+        self.favorite(self.users[0], self.pasta)
+        self.favorite(self.users[1], self.pasta)
+        self.pasta.category = "lunch"
+        self.pasta.cooking_time = 50
+        self.pasta.save()
+        snapshot = self.assertMatchesRebuild()
+        self.assertEqual({row[1] for row in snapshot["categories"]}, {"lunch"})
+        self.assertEqual(snapshot["cooking_times"], {(2, 2)})
+
+    def test_ingredient_link_changes_adjust_counts(self):
+        """Test forward and reverse add/remove/clear, including no-op removes."""
+        self.favorite(self.users[0], self.pasta)
+        self.favorite(self.users[1], self.pasta)
+        self.favorite(self.users[2], self.risotto)
+
+        self.pasta.ingredients.add(self.rice)
+        self.assertMatchesRebuild()
+        self.pasta.ingredients.remove(self.rice, self.basil)
+        self.pasta.ingredients.remove(self.basil)  # no longer linked
+        self.assertMatchesRebuild()
+        self.basil.recipes.add(self.pasta, self.risotto)
+        self.assertMatchesRebuild()
+        self.garlic.recipes.remove(self.risotto)
+        self.assertMatchesRebuild()
+        self.basil.recipes.clear()
+        self.assertMatchesRebuild()
+        self.pasta.ingredients.clear()
+        snapshot = self.assertMatchesRebuild()
+        self.assertEqual(snapshot["ingredients"], {("rice", 1)})
+
+    def test_cascading_deletes_keep_rollups_consistent(self):
+        """Test deleting a favorited recipe, ingredient or user."""
+        self.favorite(self.users[0], self.pasta)
+        self.favorite(self.users[0], self.risotto)
+        self.favorite(self.users[1], self.risotto)
+
+        self.garlic.delete()
+        self.assertMatchesRebuild()
+        self.risotto.delete()
+        self.assertMatchesRebuild()
+        self.users[0].delete()
+        self.assertEqual(self.assertMatchesRebuild()["ingredients"], set())
+
+    def test_insights_page_reads_rollups_only(self):
+        """Test that the page costs the same queries however many favorites exist."""
+        self.favorite(self.users[0], self.pasta)
+        url = reverse("recipes:insights")
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertContains(response, "Most Favorited Ingredients")
+        self.assertContains(response, "<svg", count=2)
+        self.assertContains(response, "100%")
+
+        for user in self.users[1:]:
+            self.favorite(user, self.pasta)
+            self.favorite(user, self.risotto)
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertContains(response, "rice")
+
+    def test_insights_page_without_favorites(self):
+        """Test the empty state."""
+        response = self.client.get(reverse("recipes:insights"))
+        self.assertContains(response, "No insights yet!")
+
+    def test_rebuild_command(self):
+        """Test that the command restores rollups that drifted."""
+        self.favorite(self.users[0], self.pasta)
+        IngredientFavoriteRollup.objects.update(favorites=99)
+        out = StringIO()
+        call_command("rebuild_insights", stdout=out)
+        self.assertIn("Rebuilt 2 ingredient", out.getvalue())
+        self.assertEqual(
+            IngredientFavoriteRollup.objects.get(ingredient=self.garlic).favorites, 1
+        )
+
+
+def jpeg_upload(name="photo.jpg", size=(1600, 1200), color="tomato"):
+    """An in-memory JPEG carrying EXIF data (camera model and orientation)."""
+    from PIL import Image
+
+    image = Image.new("RGB", size, color)
+    exif = Image.Exif()
+    exif[0x0110] = "Test Camera"  # Model
+    exif[0x0112] = 1  # Orientation
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+class ImageDerivativeTests(TestCase):
+    """Test the resized JPEG/WebP copies of recipe images."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def open_derivative(self, recipe, width, fmt):
+        from PIL import Image
+
+        name = derivative_name(recipe.image.name, width, fmt)
+        with image_storage().open(name) as file:
+            image = Image.open(file)
+            image.load()
+        return image
+
+    def test_upload_generates_derivatives_without_exif(self):
+        """Test that saving a recipe image writes every width in both formats."""
+        recipe = Recipe.objects.create(
+            name="Salad", cooking_time=0, image=jpeg_upload()
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_derivatives["widths"], [160, 480, 1200])
+        self.assertEqual(recipe.image_derivatives["source"], recipe.image.name)
+        for width in (160, 480, 1200):
+            jpeg = self.open_derivative(recipe, width, "jpeg")
+            self.assertEqual(jpeg.format, "JPEG")
+            self.assertEqual(jpeg.size, (width, width * 3 // 4))
+            self.assertFalse(jpeg.getexif())
+            self.assertEqual(self.open_derivative(recipe, width, "webp").format, "WEBP")
+
+    def test_small_images_are_not_upscaled(self):
+        """Test that a 300px image gets a 160px copy and one at its own size."""
+        recipe = Recipe.objects.create(
+            name="Toast", cooking_time=2, image=jpeg_upload(size=(300, 200))
+        )
+        self.assertEqual(recipe.image_derivatives["widths"], [160, 300])
+
+    def test_replacing_the_image_regenerates(self):
+        """Test that derivatives follow the current image."""
+        recipe = Recipe.objects.create(
+            name="Soup", cooking_time=20, image=jpeg_upload("one.jpg")
+        )
+        recipe.image = jpeg_upload("two.jpg", size=(400, 300))
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_derivatives["source"], recipe.image.name)
+        self.assertEqual(recipe.image_derivatives["widths"], [160, 400])
+
+    def test_only_new_images_are_processed(self):
+        """Test that the default image and unchanged saves skip processing."""
+        with mock.patch(
+            "recipes.images.process_image", wraps=process_image
+        ) as processed:
+            plain = Recipe.objects.create(name="Plain", cooking_time=5)
+            plain.save()
+            self.assertEqual(processed.call_count, 0)
+            self.assertEqual(plain.image_derivatives, {})
+
+            recipe = Recipe.objects.create(
+                name="Soup", cooking_time=20, image=jpeg_upload()
+            )
+            # An edit that keeps the image, even with derivatives cleared
+            Recipe.objects.filter(pk=recipe.pk).update(image_derivatives={})
+            recipe.refresh_from_db()
+            recipe.cooking_time = 25
+            recipe.save()
+            self.assertEqual(processed.call_count, 1)
+
+    def test_processing_updates_only_stale_rows(self):
+        """Test that recipes sharing the file are updated only if they lack derivatives."""
+        source = Recipe.objects.create(name="A", cooking_time=5, image=jpeg_upload())
+        stale = Recipe.objects.create(name="B", cooking_time=5)
+        current = Recipe.objects.create(name="C", cooking_time=5)
+        Recipe.objects.filter(pk=stale.pk).update(image=source.image.name)
+        Recipe.objects.filter(pk=current.pk).update(
+            image=source.image.name,
+            image_derivatives=source.image_derivatives,
+            image_placeholder="data:current",
+        )
+        # Another recipe gets the same picture uploaded
+        recipe = Recipe.objects.create(name="D", cooking_time=5)
+        recipe.image = jpeg_upload()
+        recipe.save()
+
+        stale.refresh_from_db()
+        current.refresh_from_db()
+        self.assertEqual(recipe.image.name, source.image.name)
+        self.assertEqual(stale.image_derivatives["source"], source.image.name)
+        self.assertEqual(current.image_placeholder, "data:current")
+
+    def test_responsive_image_tag(self):
+        """Test the <picture> markup, and the plain <img> before derivatives exist."""
+        recipe = Recipe.objects.create(
+            name="Stew", cooking_time=60, image=jpeg_upload()
+        )
+        template = Template(
+            '{% load recipe_images %}{% responsive_image recipe sizes="50px" %}'
+            "|{{ recipe|image_srcset:'webp' }}"
+        )
+        html = template.render(Context({"recipe": recipe}))
+        webp_480 = image_storage().url(derivative_name(recipe.image.name, 480, "webp"))
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn(f"{webp_480} 480w", html)
+        self.assertIn('sizes="50px"', html)
+        self.assertNotIn(f'src="{recipe.image.url}"', html)
+
+        recipe.image_derivatives = {}
+        html = template.render(Context({"recipe": recipe}))
+        self.assertNotIn("<picture>", html)
+        self.assertIn(f'src="{recipe.image.url}"', html)
+
+    def test_search_thumbnails_use_derivatives(self):
+        """Test that search result rows carry what srcset needs (no extra queries)."""
+        Recipe.objects.create(name="Curry", cooking_time=30, image=jpeg_upload())
+        response = self.client.get(reverse("recipes:recipe_search"), {"show_all": 1})
+        self.assertContains(response, "_160w.webp 160w")
+
+    def test_backfill_is_resumable(self):
+        """Test that the backfill processes pending images only."""
+        recipes = [
+            Recipe.objects.create(
+                name=f"Dish {i}",
+                cooking_time=10,
+                image=jpeg_upload(f"dish{i}.jpg", color=(40 * i, 90, 60)),
+            )
+            for i in range(3)
+        ]
+        Recipe.objects.filter(pk__in=[r.pk for r in recipes[1:]]).update(
+            image_derivatives={}
+        )
+        Recipe.objects.create(name="Plain", cooking_time=5)  # default, missing file
+
+        self.assertEqual(backfill_derivatives(workers=2), (2, 1))
+        self.assertEqual(backfill_derivatives(workers=2), (0, 1))
+        for recipe in recipes:
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.image_derivatives["source"], recipe.image.name)
+
+        out = StringIO()
+        call_command("backfill_image_derivatives", "--workers", "1", stdout=out)
+        self.assertIn("Generated derivatives for 0 image(s)", out.getvalue())
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test hash-named, deduplicated recipe image storage."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+
+    def test_uploads_are_sharded_by_content_hash(self):
+        """Test the ab/cd/<sha256>.ext layout, with the extension lowercased."""
+        recipe = Recipe.objects.create(
+            name="Tart", cooking_time=30, image=jpeg_upload("My Tart.JPG")
+        )
+        digest = hashlib.sha256(jpeg_upload().read()).hexdigest()
+        self.assertEqual(
+            recipe.image.name, f"recipe_images/{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+        )
+        self.assertTrue(is_content_addressed(recipe.image.name))
+        self.assertTrue(
+            is_content_addressed(derivative_name(recipe.image.name, 160, "webp"))
+        )
+        self.assertFalse(is_content_addressed("recipe_images/omelet.jpg"))
+
+    def test_identical_uploads_share_one_file(self):
+        """Test that re-uploading the same bytes stores nothing new."""
+        first = Recipe.objects.create(
+            name="A", cooking_time=5, image=jpeg_upload("a.jpg")
+        )
+        second = Recipe.objects.create(
+            name="B", cooking_time=5, image=jpeg_upload("b.jpg")
+        )
+        self.assertEqual(first.image.name, second.image.name)
+        originals = [
+            path
+            for path in Path(self.media_root).rglob("*.jpg")
+            if "derivatives" not in path.parts
+        ]
+        self.assertEqual(len(originals), 1)
+
+    def test_concurrent_identical_save_returns_existing_name(self):
+        """Test that losing the exists() race keeps one file under the hash name."""
+        storage = ContentAddressedStorage(location=self.media_root)
+        name = storage.save("recipe_images/a.jpg", jpeg_upload())
+        real_exists = storage.exists
+        raced = []
+
+        def exists(path):
+            # The other writer lands just after this process checked
+            if path == name and not raced:
+                raced.append(path)
+                return False
+            return real_exists(path)
+
+        with mock.patch.object(storage, "exists", side_effect=exists):
+            self.assertEqual(storage.save("recipe_images/b.jpg", jpeg_upload()), name)
+        self.assertEqual(len(list(Path(self.media_root).rglob("*.jpg"))), 1)
+
+    def test_rehash_moves_legacy_images(self):
+        """Test that the rehash rewrites names in batches and can be rerun."""
+        storage = derivative_storage()
+        legacy = []
+        for i in range(3):
+            name = storage.save(
+                f"recipe_images/legacy{i}.jpg",
+                jpeg_upload(color=(60 * i, 60, 60), size=(600, 400)),
+            )
+            recipe = Recipe.objects.create(name=f"Old {i}", cooking_time=10)
+            Recipe.objects.filter(pk=recipe.pk).update(image=name)
+            legacy.append(recipe)
+        # Two recipes sharing a file, one pointing at a missing file
+        Recipe.objects.filter(pk=legacy[2].pk).update(image="recipe_images/legacy1.jpg")
+        Recipe.objects.create(name="Lost", cooking_time=1)
+        backfill_derivatives()
+
+        self.assertEqual(rehash_images(batch_size=1, delete_originals=True), (2, 1))
+        names = set()
+        for recipe in legacy:
+            recipe.refresh_from_db()
+            names.add(recipe.image.name)
+            self.assertTrue(is_content_addressed(recipe.image.name))
+            self.assertEqual(recipe.image_derivatives["source"], recipe.image.name)
+            self.assertTrue(
+                storage.exists(derivative_name(recipe.image.name, 160, "jpeg"))
+            )
+        self.assertEqual(len(names), 2)
+        self.assertFalse(storage.exists("recipe_images/legacy0.jpg"))
+        self.assertFalse(
+            storage.exists(derivative_name("recipe_images/legacy0.jpg", 160, "jpeg"))
+        )
+
+        out = StringIO()
+        call_command("rehash_recipe_images", stdout=out)
+        self.assertIn("Rehashed 0 image(s)", out.getvalue())
+
+    @override_settings(RECIPES_SERVE_MEDIA=True)
+    def test_hashed_media_is_served_immutable(self):
+        """Test the far-future Cache-Control on content-addressed files only."""
+        recipe = Recipe.objects.create(name="Pie", cooking_time=40, image=jpeg_upload())
+        derivative_storage().save("recipe_images/plain.jpg", jpeg_upload())
+        request = RequestFactory().get("/media/")
+        self.assertTrue(recipe.image.storage.is_immutable(recipe.image.name))
+        self.assertFalse(recipe.image.storage.is_immutable("recipe_images/plain.jpg"))
+
+        response = serve_media(request, recipe.image.name, self.media_root)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("max-age=31536000", response["Cache-Control"])
+
+        response = serve_media(request, "recipe_images/plain.jpg", self.media_root)
+        self.assertNotIn("immutable", response["Cache-Control"])
+
+
+@override_settings(RECIPES_SERVE_MEDIA=True)
+class MediaServingTests(TestCase):
+    """Test the media view: validators, byte ranges and proxy offload."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+        self.content = bytes(range(256)) * 4
+        self.name = derivative_storage().save(
+            "recipe_images/data.bin", ContentFile(self.content)
+        )
+        self.url = f"/media/{self.name}"
+
+    def get(self, **headers):
+        return self.client.get(self.url, headers=headers)
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    @override_settings(DEBUG=False, RECIPES_SERVE_MEDIA=False)
+    def test_media_left_to_proxy_when_not_served(self):
+        """Test that media is 404 unless DEBUG or RECIPES_SERVE_MEDIA is on."""
+        self.assertEqual(self.get().status_code, 404)
+
+    def test_full_response_is_streamed_with_validators(self):
+        """Test a plain GET: streamed body, ETag, Last-Modified, Accept-Ranges."""
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(self.body(response), self.content)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertTrue(response.has_header("ETag"))
+        self.assertTrue(response.has_header("Last-Modified"))
+        self.assertIn("no-cache", response["Cache-Control"])
+
+    def test_conditional_requests(self):
+        """Test 304s for a matching ETag or an unchanged modification date."""
+        first = self.get()
+        response = self.get(if_none_match=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+        response = self.get(if_modified_since=first["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+        response = self.get(if_none_match='"something-else"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_byte_ranges(self):
+        """Test bounded, open-ended and suffix ranges."""
+        size = len(self.content)
+        for header, start, end in (
+            ("bytes=0-9", 0, 9),
+            ("bytes=1000-", 1000, size - 1),
+            ("bytes=-24", size - 24, size - 1),
+            ("bytes=100-99999", 100, size - 1),
+        ):
+            with self.subTest(header):
+                response = self.get(range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(
+                    response["Content-Range"], f"bytes {start}-{end}/{size}"
+                )
+                self.assertEqual(response["Content-Length"], str(end - start + 1))
+                self.assertEqual(self.body(response), self.content[start : end + 1])
+
+    def test_unsatisfiable_and_stale_ranges(self):
+        """Test 416 past the end, and the whole file when If-Range is stale."""
+        response = self.get(range="bytes=5000-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.content)}")
+
+        response = self.get(range="bytes=0-9", if_range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        response = self.get(range="bytes=0-9", if_range=etag)
+        self.assertEqual(response.status_code, 206)
+        # Several ranges at once are answered with the whole file
+        response = self.get(range="bytes=0-1,5-6")
+        self.assertEqual(response.status_code, 200)
+
+    def test_head_and_methods(self):
+        """Test HEAD (headers only) and that writes are refused."""
+        response = self.client.head(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Length"], str(len(self.content)))
+        self.assertEqual(response.content, b"")
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+    def test_missing_and_outside_files_are_404(self):
+        """Test unknown names, directories and path traversal."""
+        for path in ("recipe_images/nope.jpg", "recipe_images", "../settings.py"):
+            with self.subTest(path):
+                self.assertEqual(self.client.get(f"/media/{path}").status_code, 404)
+
+    def test_proxy_offload(self):
+        """Test X-Accel-Redirect and X-Sendfile responses carry no body."""
+        with self.settings(
+            RECIPES_MEDIA_ACCEL="x-accel-redirect",
+            RECIPES_MEDIA_ACCEL_PREFIX="/protected-media/",
+        ):
+            response = self.get(range="bytes=0-9")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.name}")
+        self.assertEqual(response.content, b"")
+        self.assertTrue(response.has_header("ETag"))
+
+        with self.settings(RECIPES_MEDIA_ACCEL="x-sendfile"):
+            response = self.get()
+        self.assertEqual(
+            response["X-Sendfile"], os.path.join(self.media_root, self.name)
+        )
+
+    def test_content_addressed_images_are_immutable(self):
+        """Test the content hash as ETag and the far-future Cache-Control."""
+        recipe = Recipe.objects.create(
+            name="Flan", cooking_time=50, image=jpeg_upload()
+        )
+        response = self.client.get(recipe.image.url)
+        digest = os.path.splitext(os.path.basename(recipe.image.name))[0]
+        self.assertEqual(response["ETag"], f'"{digest}"')
+        self.assertIn("immutable", response["Cache-Control"])
+
+
+class ImagePlaceholderTests(TestCase):
+    """Test the tiny inline placeholders stored on recipes."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.recipe = Recipe.objects.create(
+            name="Gazpacho", cooking_time=0, image=jpeg_upload(size=(1600, 900))
+        )
+
+    def test_placeholder_is_computed_on_upload(self):
+        """Test that the placeholder is a ~20px JPEG data URI."""
+        from PIL import Image
+
+        self.recipe.refresh_from_db()
+        prefix = "data:image/jpeg;base64,"
+        self.assertTrue(self.recipe.image_placeholder.startswith(prefix))
+        self.assertLess(len(self.recipe.image_placeholder), 1500)
+        data = base64.b64decode(self.recipe.image_placeholder[len(prefix) :])
+        with Image.open(BytesIO(data)) as image:
+            self.assertEqual(image.size, (20, 11))
+
+    def test_cards_render_placeholder_inline(self):
+        """Test that list and search cards paint the placeholder with no extra request."""
+        self.recipe.refresh_from_db()
+        for url, params in (
+            (reverse("recipes:recipes_list"), {}),
+            (reverse("recipes:recipe_search"), {"show_all": 1}),
+        ):
+            with self.subTest(url):
+                response = self.client.get(url, params)
+                self.assertContains(
+                    response, f"no-repeat url({self.recipe.image_placeholder})"
+                )
+
+    def test_unreadable_image_clears_placeholder(self):
+        """Test that a placeholder never outlives the image it was made from."""
+        self.recipe.image = "recipe_images/missing.jpg"
+        self.recipe.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_placeholder, "")
+
+    def test_backfill(self):
+        """Test the batch backfill, from derivatives or the original."""
+        other = Recipe.objects.create(
+            name="Borscht", cooking_time=60, image=jpeg_upload(color="purple")
+        )
+        Recipe.objects.create(name="Plain", cooking_time=5)  # missing file
+        # One recipe without derivatives, so its original is decoded instead
+        Recipe.objects.filter(pk=other.pk).update(image_derivatives={})
+        expected = dict(Recipe.objects.values_list("id", "image_placeholder"))
+        Recipe.objects.update(image_placeholder="")
+
+        self.assertEqual(backfill_placeholders(batch_size=1), (2, 1))
+        for recipe_id, placeholder in Recipe.objects.values_list(
+            "id", "image_placeholder"
+        ):
+            if expected[recipe_id]:
+                self.assertTrue(placeholder.startswith("data:image/jpeg;base64,"))
+        out = StringIO()
+        call_command("backfill_image_placeholders", stdout=out)
+        self.assertIn("Stored 0 placeholder(s)", out.getvalue())
+
+
+class FavoritesCountTests(TestCase):
+    """Test the denormalized Recipe.favorites_count and popularity sort."""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f"fan{i}", password="pass12345")
+            for i in range(3)
+        ]
+        self.soup = Recipe.objects.create(name="Soup", category="soup", cooking_time=30)
+        self.cake = Recipe.objects.create(
+            name="Cake", category="dessert", cooking_time=45
+        )
+        self.salad = Recipe.objects.create(
+            name="Salad", category="salad", cooking_time=5
+        )
+        for user in self.users:
+            Favorite.objects.create(user=user, recipe=self.cake)
+        Favorite.objects.create(user=self.users[0], recipe=self.salad)
+
+    def counts(self):
+        return dict(Recipe.objects.values_list("name", "favorites_count"))
+
+    def test_signals_keep_count(self):
+        """Test that creating and deleting favorites (or users) adjusts the count."""
+        self.assertEqual(self.counts(), {"Soup": 0, "Cake": 3, "Salad": 1})
+        Favorite.objects.filter(user=self.users[1], recipe=self.cake).delete()
+        self.users[2].delete()  # cascades to the user's favorites
+        self.assertEqual(self.counts(), {"Soup": 0, "Cake": 1, "Salad": 1})
+
+    def test_views_count_once(self):
+        """Test that add_favorite/remove_favorite move the count by exactly one."""
+        self.client.login(username="fan0", password="pass12345")
+        self.client.get(reverse("recipes:add_favorite", args=[self.soup.id]))
+        self.client.get(reverse("recipes:add_favorite", args=[self.soup.id]))
+        self.assertEqual(self.counts()["Soup"], 1)
+        self.client.get(reverse("recipes:remove_favorite", args=[self.cake.id]))
+        self.assertEqual(self.counts()["Cake"], 2)
+
+    def test_stale_instance_save_keeps_count(self):
+        """Test that saving a recipe loaded earlier doesn't overwrite the count."""
+        stale = Recipe.objects.get(pk=self.soup.pk)
+        Favorite.objects.create(user=self.users[0], recipe=self.soup)
+        stale.name = "Tomato Soup"
+        stale.save()
+        self.assertEqual(self.counts()["Tomato Soup"], 1)
+
+    def test_deferred_instance_save_keeps_count(self):
+        """Test that saving a deferred load writes only its loaded fields."""
+        deferred = Recipe.objects.only("name").get(pk=self.soup.pk)
+        Favorite.objects.create(user=self.users[0], recipe=self.soup)
+        deferred.name = "Tomato Soup"
+        deferred.save()
+        self.assertEqual(self.counts()["Tomato Soup"], 1)
+
+    def test_reconcile_repairs_drift(self):
+        """Test that the reconcile command recounts only drifted recipes."""
+        Recipe.objects.filter(pk=self.cake.pk).update(favorites_count=7)
+        Recipe.objects.filter(pk=self.soup.pk).update(favorites_count=2)
+        self.assertEqual(reconcile_favorites_counts(batch_size=2), (3, 2))
+        self.assertEqual(self.counts(), {"Soup": 0, "Cake": 3, "Salad": 1})
+
+        out = StringIO()
+        call_command("reconcile_favorites_count", stdout=out)
+        self.assertIn("Checked 3 recipe(s), repaired 0", out.getvalue())
+
+    def test_removing_from_drifted_zero_count(self):
+        """Test that a count that drifted to zero doesn't block deleting a favorite."""
+        Recipe.objects.filter(pk=self.salad.pk).update(favorites_count=0)
+        Favorite.objects.filter(recipe=self.salad).delete()
+        self.assertEqual(self.counts()["Salad"], 0)
+
+    def test_recipes_list_popular_sort(self):
+        """Test the most popular ordering and its pagination on the recipe list."""
+        url = reverse("recipes:recipes_list")
+        response = self.client.get(url, {"sort": "popular", "page_size": 2})
+        self.assertEqual(
+            [recipe.name for recipe in response.context["recipes"]], ["Cake", "Salad"]
+        )
+        self.assertTrue(response.context["sorted_by_popularity"])
+        next_page = self.client.get(url + response.context["next_page_url"])
+        self.assertEqual(
+            [recipe.name for recipe in next_page.context["recipes"]], ["Soup"]
+        )
+
+    def test_search_popular_sort(self):
+        """Test that search results, and Show All, can be sorted by popularity."""
+        url = reverse("recipes:recipe_search")
+        for params in (
+            {"sort": "popular", "max_cooking_time": 60},
+            {"sort": "popular", "show_all": 1},
+        ):
+            with self.subTest(params):
+                response = self.client.get(url, params)
+                self.assertEqual(
+                    [row.name for row in response.context["search_results_list"]],
+                    ["Cake", "Salad", "Soup"],
+                )
+                self.assertEqual(response.context["results_count"], 3)
+        response = self.client.get(url, {"max_cooking_time": 60})
+        self.assertEqual(
+            [row.name for row in response.context["search_results_list"]],
+            ["Salad", "Soup", "Cake"],
+        )
+
+
+class CategoryCountsTests(TestCase):
+    """Test the cached per-category recipe counts on the recipe list."""
+
+    def setUp(self):
+        cache.clear()
+        for name, category in (
+            ("Pancakes", "breakfast"),
+            ("Omelette", "breakfast"),
+            ("Stew", "dinner"),
+        ):
+            Recipe.objects.create(name=name, category=category, cooking_time=10)
+
+    def test_counts_from_one_aggregate(self):
+        """Test that one query counts every category, most common first."""
+        with self.assertNumQueries(1):
+            counts = recipe_category_counts()
+        self.assertEqual(list(counts.items()), [("breakfast", 2), ("dinner", 1)])
+
+    def test_sidebar_costs_no_queries_when_cached(self):
+        """Test that a cached list page runs only the page and no count queries."""
+        url = reverse("recipes:recipes_list")
+        self.client.get(url)
+        with self.assertNumQueries(1):  # the page's rows
+            response = self.client.get(url)
+        self.assertEqual(response.context["total_recipes"], 3)
+        self.assertContains(response, "?category=breakfast")
+
+    def test_invalidated_by_recipe_changes(self):
+        """Test that create, delete and category changes refresh the counts."""
+        recipe_category_counts()
+        soup = Recipe.objects.create(name="Soup", category="soup", cooking_time=20)
+        self.assertEqual(recipe_category_counts()["soup"], 1)
+
+        soup.category = "dinner"
+        soup.save()
+        counts = recipe_category_counts()
+        self.assertNotIn("soup", counts)
+        self.assertEqual(counts["dinner"], 2)
+
+        soup.delete()
+        self.assertEqual(recipe_category_counts()["dinner"], 1)
+
+    def test_other_edits_keep_cache(self):
+        """Test that editing a recipe without moving it keeps the cached counts."""
+        recipe_category_counts()
+        stew = Recipe.objects.get(name="Stew")
+        stew.cooking_time = 90
+        stew.save()
+        with self.assertNumQueries(0):
+            recipe_category_counts()
+
+
+class RandomRecipeTests(TestCase):
+    """Test the constant-time random recipe sampler and "Surprise me"."""
+
+    def setUp(self):
+        cache.clear()
+        self.recipes = [
+            Recipe.objects.create(name=f"Recipe {i}", cooking_time=10) for i in range(6)
+        ]
+
+    def test_samples_every_recipe(self):
+        """Test that picks cover the catalog, each with a primary key lookup."""
+        random_recipe()  # caches the id range
+        picks = set()
+        with self.assertNumQueries(50):
+            for _ in range(50):
+                picks.add(random_recipe().id)
+        self.assertEqual(picks, {recipe.id for recipe in self.recipes})
+
+    def test_skips_deleted_ids(self):
+        """Test that gaps left by deletions are probed past, never returned."""
+        for recipe in self.recipes[1:5]:
+            recipe.delete()
+        remaining = {self.recipes[0].id, self.recipes[5].id}
+        for _ in range(20):
+            self.assertIn(random_recipe().id, remaining)
+
+    def test_empty_catalog(self):
+        """Test that there is nothing to pick from an empty catalog."""
+        Recipe.objects.all().delete()
+        self.assertIsNone(random_recipe())
+
+    def test_surprise_redirects_to_a_recipe(self):
+        """Test that "Surprise me" redirects to a recipe and isn't cached."""
+        response = self.client.get(reverse("recipes:surprise_recipe"))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("no-store", response["Cache-Control"])
+        self.assertIn(
+            response["Location"],
+            [reverse("recipes:recipe_detail", args=[r.id]) for r in self.recipes],
+        )
+        self.assertContains(
+            self.client.get(reverse("recipes:home")),
+            reverse("recipes:surprise_recipe"),
+        )
+
+
+@override_settings(RECIPES_SQL_INSTRUMENTATION=True, RECIPES_N_PLUS_ONE_THRESHOLD=3)
+class SQLInstrumentationTests(TestCase):
+    """Test the opt-in query profiling middleware."""
+
+    def setUp(self):
+        for i in range(5):
+            Recipe.objects.create(name=f"Recipe {i}", cooking_time=10)
+
+    def profiled(self, view):
+        request = RequestFactory().get("/profiled/")
+        return SQLInstrumentationMiddleware(view)(request)
+
+    def timings(self, response):
+        """{metric: (duration in ms, description)} from Server-Timing."""
+        timings = {}
+        for metric in response["Server-Timing"].split(", "):
+            name, duration, desc = metric.split(";")
+            timings[name] = (float(duration[4:]), desc[6:-1])
+        return timings
+
+    def test_fingerprint_ignores_literals(self):
+        """Test that statements differing only in values share a fingerprint."""
+        self.assertEqual(
+            fingerprint('SELECT * FROM "t" WHERE "id" = 3 AND "name" = \'a\''),
+            fingerprint('SELECT * FROM  "t" WHERE "id" = %s AND "name" = \'b\''),
+        )
+        self.assertEqual(
+            fingerprint('SELECT "U0"."id" FROM "t" U0 WHERE "id" IN (%s, %s, %s)'),
+            'SELECT "U0"."id" FROM "t" U0 WHERE "id" IN (...)',
+        )
+
+    def test_server_timing_header(self):
+        """Test that list pages report DB, template and chart time."""
+        response = self.client.get(reverse("recipes:recipes_list"))
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {"db", "template", "chart", "total"})
+        self.assertRegex(timings["db"][1], r"^\d+ queries$")
+        self.assertGreater(timings["template"][0], 0)
+        self.assertGreaterEqual(timings["total"][0], timings["template"][0])
+
+    def test_chart_time(self):
+        """Test that SVG charts rendered by a view count as chart time."""
+
+        def view(request):
+            return HttpResponse(render_svg(SAMPLE_CHART_DATA["ingredients_chart"]))
+
+        self.assertGreater(self.timings(self.profiled(view))["chart"][0], 0)
+
+    def test_n_plus_one_logged(self):
+        """Test that a statement repeated per row is flagged, and counted."""
+
+        def view(request):
+            for recipe in Recipe.objects.all():
+                recipe.ingredients.count()
+            return HttpResponse("ok")
+
+        with self.assertLogs("recipes.instrumentation", "WARNING") as logs:
+            response = self.profiled(view)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn(
+            "Possible N+1 in GET /profiled/: 5 x SELECT COUNT(*)", logs.output[0]
+        )
+        self.assertEqual(self.timings(response)["db"][1], "6 queries")
+
+    def test_off_by_default(self):
+        """Test that the middleware removes itself unless enabled."""
+        with override_settings(RECIPES_SQL_INSTRUMENTATION=False):
+            response = self.client.get(reverse("recipes:recipes_list"))
+        self.assertFalse(response.has_header("Server-Timing"))
+
+
+class SyntheticCatalogTests(TestCase):
+    """Test the seeded synthetic catalog generator and the view benchmark."""
+
+    def generate(self, seed=1):
+        return generate_catalog(
+            recipes=80, ingredients=40, users=20, favorites=400, seed=seed
+        )
+
+    def test_counts_and_derived_data(self):
+        """Test that rows are created in bulk and derived counters rebuilt."""
+        counts = self.generate()
+        self.assertEqual(
+            (counts["recipes"], counts["ingredients"], counts["users"]), (80, 40, 20)
+        )
+        self.assertEqual(Favorite.objects.count(), counts["favorites"])
+        self.assertGreater(counts["favorites"], 250)
+        # favorites_count and the rollups match what signals would have kept
+        self.assertEqual(reconcile_favorites_counts()[1], 0)
+        self.assertTrue(IngredientFavoriteRollup.objects.exists())
+
+    def test_popularity_is_skewed(self):
+        """Test that a few ingredients, recipes and users dominate (Zipf-like)."""
+        self.generate()
+        links = Recipe.ingredients.through.objects
+        top_ingredient = (
+            links.values("ingredient").annotate(n=Count("id")).order_by("-n")[0]["n"]
+        )
+        self.assertGreater(top_ingredient, links.count() / 40 * 2)
+        top_recipe = Recipe.objects.order_by("-favorites_count")[0].favorites_count
+        self.assertGreater(top_recipe, Favorite.objects.count() / 80 * 4)
+
+    def test_same_seed_same_catalog(self):
+        """Test that a seed reproduces the catalog; a new one doesn't."""
+
+        def names():
+            return list(Recipe.objects.order_by("id").values_list("name", flat=True))
+
+        self.generate(seed=7)
+        first = names()
+        Recipe.objects.all().delete()
+        self.generate(seed=7)
+        self.assertEqual(names(), first)
+        Recipe.objects.all().delete()
+        self.generate(seed=8)
+        self.assertNotEqual(names(), first)
+
+    def test_benchmark_views_writes_results(self):
+        """Test that the benchmark records status, timings and query counts."""
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            call_command(
+                "benchmark_views",
+                "--sizes",
+                "40",
+                "--repeat",
+                "1",
+                "--output",
+                output,
+                stdout=StringIO(),
+            )
+            with open(output) as file:
+                report = json.load(file)
+        views = {result["view"]: result for result in report["results"]}
+        self.assertIn("recipes_list", views)
+        self.assertIn("favorites_list", views)
+        for result in views.values():
+            self.assertEqual(result["status"], 200, result["view"])
+            self.assertGreaterEqual(result["queries"], 1)
+            self.assertEqual(result["dataset"]["recipes"], 40)
+        # The generated catalog was rolled back, and nothing cached from it
+        # is served afterwards
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(recipe_category_counts(), {})
+        self.assertEqual(site_stats()["recipes"], 0)
+        response = self.client.get(reverse("recipes:recipe_search"), {"show_all": 1})
+        self.assertEqual(response.context["results_count"], 0)
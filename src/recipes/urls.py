@@ -12,10 +12,57 @@ urlpatterns = [
     path("recipes/", views.recipes_list, name="recipes_list"),
     # Recipe search page
     path("search/", views.recipe_search, name="recipe_search"),
+    # Pantry ("What can I cook?") ranking (JSON)
+    path("search/pantry/", views.recipe_pantry, name="recipe_pantry"),
+    # Autocomplete suggestions (JSON)
+    path("search/suggest/", views.recipe_suggest, name="recipe_suggest"),
+    # Search cache hit/miss counters (staff only)
+    path(
+        "search/cache-stats/",
+        views.search_cache_stats_view,
+        name="search_cache_stats",
+    ),
+    # Redirect to a random recipe ("Surprise me")
+    path("recipes/surprise/", views.surprise_recipe, name="surprise_recipe"),
     # Recipe detail page
     path("recipes/<int:id>/", views.recipe_detail, name="recipe_detail"),
+    # Site-wide cooking insights (from the favorites rollups)
+    path("insights/", views.insights, name="insights"),
     # User favorites page (requires login)
     path("favorites/", views.favorites_list, name="favorites_list"),
+    # Favorites chart images (PNG or SVG, revalidated with ETags)
+    path(
+        "favorites/charts/<str:name>.png",
+        views.favorite_chart,
+        {"fmt": "png"},
+        name="favorite_chart",
+    ),
+    path(
+        "favorites/charts/<str:name>.svg",
+        views.favorite_chart,
+        {"fmt": "svg"},
+        name="favorite_chart_svg",
+    ),
+    # Numbers behind the favorites charts (JSON)
+    path(
+        "favorites/charts/data/",
+        views.favorite_chart_data,
+        name="favorite_chart_data",
+    ),
+    # Favorites chart rendering job status (JSON, polled by the favorites page)
+    path(
+        "favorites/charts/jobs/<int:job_id>/",
+        views.chart_job_status_view,
+        name="chart_job_status",
+    ),
+    # Favorites chart cache counters (staff only)
+    path(
+        "favorites/chart-cache-stats/",
+        views.chart_cache_stats_view,
+        name="chart_cache_stats",
+    ),
+    # Readiness probe: 503 until the worker has warmed up
+    path("healthz/ready", views.readiness_view, name="readiness"),
     # Add/remove favorites (requires login)
     path("favorites/add/<int:recipe_id>/", views.add_favorite, name="add_favorite"),
     path(
@@ -1,24 +1,61 @@
+import base64
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
-from django.http import JsonResponse
-from django.db.models import Q
-import pandas as pd
-from .models import Recipe, Favorite
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition
+from django.db.models import Prefetch
+from .models import Recipe, Favorite, ChartJob
 from .forms import RecipeSearchForm
-from .chart_utils import generate_all_saved_recipe_charts
+from .pagination import IdListPaginator, KeysetPaginator, get_page_size, page_url
+from .search import (
+    POPULAR_ORDERING,
+    SHOW_ALL_ORDERING,
+    SearchResultRow,
+    result_values,
+    rows_for_ids,
+    search_queryset,
+    show_all_queryset,
+    sort_ordering,
+)
+from .catalog import recipe_category_counts
+from .featured import random_recipe
+from .search_cache import cached_search, search_cache_stats
+from .suggest import suggestion_index
+from .facets import compute_facets, facet_links
+from .pantry import missing_ingredients, pantry_rows, pantry_search, pantry_terms
+from .chart_cache import chart_cache_stats, favorites_version
+from .chart_data import CHART_DATA, saved_recipe_chart_data
+from .chart_jobs import (
+    CHARTS,
+    ChartRenderFailed,
+    chart_job_status,
+    chart_urls,
+    queue_charts,
+    saved_recipe_charts,
+)
+from .svg_charts import render_svg
+from .insights import category_share_by_month, cooking_time_data, top_ingredients_data
+from .warmup import is_ready, warm_up_report
 
 # Create your views here.
 
+# Newest first; id breaks ties between recipes created in the same instant
+RECIPES_LIST_ORDERING = ("-created_at", "-id")
+
 
 # This view handles the homepage request.
 # It receives the HTTP request and returns an HTML response.
 def home(request):
     # Get featured recipes for homepage
-    featured_recipes = Recipe.objects.all()[:6]  # Latest 6 recipes
-    breakfast_recipes = Recipe.objects.filter(category="breakfast")[:3]
-    dinner_recipes = Recipe.objects.filter(category="dinner")[:3]
-    dessert_recipes = Recipe.objects.filter(category="dessert")[:3]
+    recipes = Recipe.objects.with_metrics()
+    featured_recipes = recipes[:6]  # Latest 6 recipes
+    breakfast_recipes = recipes.filter(category="breakfast")[:3]
+    dinner_recipes = recipes.filter(category="dinner")[:3]
+    dessert_recipes = recipes.filter(category="dessert")[:3]
 
     context = {
         "featured_recipes": featured_recipes,
@@ -29,30 +66,65 @@ def home(request):
     return render(request, "recipes/recipes_home.html", context)
 
 
+def surprise_recipe(request):
+    """Redirect to a uniformly random recipe ("Surprise me" on the home page)."""
+    recipe = random_recipe(Recipe.objects.only("id"))
+    if recipe is None:
+        response = redirect("recipes:recipes_list")
+    else:
+        response = redirect("recipes:recipe_detail", id=recipe.id)
+    # A new pick on every click, never a cached redirect
+    patch_cache_control(response, no_store=True)
+    return response
+
+
 def recipes_list(request):
-    # Get all recipes, ordered by creation date (newest first)
-    recipes = Recipe.objects.all().order_by("-created_at")
+    # Get all recipes, newest first unless ?sort= asks for another order
+    recipes = Recipe.objects.with_metrics()
+    ordering = sort_ordering(request) or RECIPES_LIST_ORDERING
 
-    # Get recipe counts by category for sidebar/stats
-    categories = Recipe.objects.values_list("category", flat=True).distinct()
-    category_counts = {}
-    for category in categories:
-        category_counts[category] = Recipe.objects.filter(category=category).count()
+    # One page at a time, keyed on the ordering's values rather than OFFSET
+    paginator = KeysetPaginator(recipes, ordering, page_size=get_page_size(request))
+    page = paginator.page(request.GET.get("cursor"))
+
+    # Recipe counts by category for sidebar/stats: one cached aggregate,
+    # which also gives the total
+    category_counts = recipe_category_counts()
 
     context = {
-        "recipes": recipes,
-        "total_recipes": recipes.count(),
+        "recipes": page.object_list,
+        "page_obj": page,
+        "next_page_url": page_url(request, page.next_cursor),
+        "previous_page_url": page_url(request, page.previous_cursor),
+        "total_recipes": sum(category_counts.values()),
         "category_counts": category_counts,
+        "sorted_by_popularity": ordering == POPULAR_ORDERING,
     }
     return render(request, "recipes/recipes_list.html", context)
 
 
 def recipe_detail(request, id):
     # Get the specific recipe or return 404 if not found
-    recipe = get_object_or_404(Recipe, id=id)
-
-    # Get related recipes in same category for suggestions
-    related_recipes = Recipe.objects.filter(category=recipe.category).exclude(id=id)[:3]
+    recipe = get_object_or_404(
+        Recipe.objects.with_metrics().prefetch_related("ingredients"), id=id
+    )
+
+    # Suggest precomputed similar recipes (shared ingredients) first, then
+    # pad with recipes from the same category
+    related_recipes = list(
+        Recipe.objects.with_metrics()
+        .filter(similar_to__recipe_id=id)
+        .order_by("similar_to__rank")[:3]
+    )
+    related_are_similar = bool(related_recipes)
+    if len(related_recipes) < 3:
+        related_recipes += (
+            Recipe.objects.with_metrics()
+            .filter(category=recipe.category)
+            .exclude(id__in=[id] + [related.id for related in related_recipes])[
+                : 3 - len(related_recipes)
+            ]
+        )
 
     # Check if user has favorited this recipe (if logged in)
     is_favorite = False
@@ -62,6 +134,7 @@ def recipe_detail(request, id):
     context = {
         "recipe": recipe,
         "related_recipes": related_recipes,
+        "related_are_similar": related_are_similar,
         "is_favorite": is_favorite,
     }
     return render(request, "recipes/recipe_detail.html", context)
@@ -71,29 +144,133 @@ def recipe_detail(request, id):
 def favorites_list(request):
     """Display user's saved recipes with personal cooking insights charts."""
     # Get all favorites for the current user
-    user_favorites = Favorite.objects.filter(user=request.user).select_related("recipe")
+    user_favorites = Favorite.objects.filter(user=request.user).prefetch_related(
+        Prefetch("recipe", queryset=Recipe.objects.with_metrics())
+    )
 
     # Extract just the recipes for easier template handling
     favorite_recipes = [favorite.recipe for favorite in user_favorites]
 
-    # Generate charts for personal insights
-    charts = generate_all_saved_recipe_charts(request.user)
+    # Charts for personal insights are separate PNG requests (see
+    # favorite_chart), so this page never waits on matplotlib. Without eager
+    # rendering the page polls the chart job before loading them.
+    chart_urls_by_key, chart_job = {}, None
+    if favorite_recipes:
+        version = favorites_version(request.user.pk)
+        chart_urls_by_key = chart_urls(version)
+        chart_job = queue_charts(request.user, version)
 
     context = {
         "favorite_recipes": favorite_recipes,
         "total_favorites": len(favorite_recipes),
-        "charts": charts,
-        "has_charts": any(chart is not None for chart in charts.values()),
+        "chart_urls": chart_urls_by_key,
+        "chart_job": chart_job,
     }
     return render(request, "recipes/favorites_list.html", context)
 
 
+def insights(request):
+    """Site-wide cooking insights across everyone's favorites."""
+    # Read from the rollup tables (a few rows each), never the Favorite table
+    charts = {}
+    for key, data in (
+        ("ingredients", top_ingredients_data()),
+        ("cooking_time", cooking_time_data()),
+    ):
+        if data is not None:
+            # svg_charts escapes every label it draws
+            charts[key] = mark_safe(render_svg(data))
+    share_categories, share_rows = category_share_by_month()
+
+    context = {
+        "charts": charts,
+        "share_categories": share_categories,
+        "share_rows": share_rows,
+    }
+    return render(request, "recipes/insights.html", context)
+
+
+def favorite_chart_etag(request, name, fmt):
+    # The stored favorites version alone (bumped by signals on every change
+    # the charts show), so a 304 costs one lookup and no rendering
+    if request.user.is_authenticated and name in CHARTS:
+        version = favorites_version(request.user.pk)
+        return f"{request.user.pk}-{version}-{name}.{fmt}"
+    return None
+
+
+@login_required
+@condition(etag_func=favorite_chart_etag)
+def favorite_chart(request, name, fmt):
+    """One of the user's favorites charts as PNG or SVG, revalidated with its ETag.
+
+    SVG is drawn from the aggregated numbers on every request (no
+    matplotlib); PNG comes from the chart cache/job machinery.
+    """
+    if name not in CHARTS:
+        raise Http404("No such chart")
+
+    if fmt == "svg":
+        data = CHART_DATA[CHARTS[name]](request.user)
+        if data is None:
+            raise Http404("Nothing to chart yet")
+        response = HttpResponse(render_svg(data), content_type="image/svg+xml")
+    else:
+        try:
+            charts = saved_recipe_charts(
+                request.user, favorites_version(request.user.pk)
+            )
+        except ChartRenderFailed:
+            # Stays failed until the favorites change
+            response = HttpResponse(status=500)
+            patch_cache_control(response, no_store=True)
+            return response
+        if charts is None:
+            # Still queued for the chart worker
+            response = HttpResponse(status=503)
+            response["Retry-After"] = "2"
+            patch_cache_control(response, no_store=True)
+            return response
+        chart = charts.get(CHARTS[name])
+        if chart is None:
+            raise Http404("Nothing to chart yet")
+        response = HttpResponse(base64.b64decode(chart), content_type="image/png")
+
+    # Browsers keep the image but check back with If-None-Match each time
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def favorite_chart_data_etag(request):
+    if request.user.is_authenticated:
+        return f"{request.user.pk}-{favorites_version(request.user.pk)}-data"
+    return None
+
+
+@login_required
+@condition(etag_func=favorite_chart_data_etag)
+def favorite_chart_data(request):
+    """The numbers behind the favorites charts as JSON, for client-side drawing."""
+    response = JsonResponse(saved_recipe_chart_data(request.user))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+def chart_job_status_view(request, job_id):
+    """Status of one of the user's chart jobs as JSON, with charts when done."""
+    job = get_object_or_404(ChartJob, id=job_id, user=request.user)
+    return JsonResponse(chart_job_status(job))
+
+
 @login_required
 def add_favorite(request, recipe_id):
     """Add a recipe to user's favorites."""
     recipe = get_object_or_404(Recipe, id=recipe_id)
 
-    # Create favorite if it doesn't exist
+    # Create favorite if it doesn't exist (signals then add it to
+    # recipe.favorites_count and the insights rollups, and bump the user's
+    # favorites version)
     favorite, created = Favorite.objects.get_or_create(user=request.user, recipe=recipe)
 
     if created:
@@ -111,6 +288,8 @@ def remove_favorite(request, recipe_id):
 
     try:
         favorite = Favorite.objects.get(user=request.user, recipe=recipe)
+        # post_delete signals take it off favorites_count and the rollups,
+        # and bump the user's favorites version
         favorite.delete()
         messages.success(
             request, f'"{recipe.name}" has been removed from your favorites!'
@@ -125,167 +304,154 @@ def remove_favorite(request, recipe_id):
 def recipe_search(request):
     """Search recipes with multiple criteria and display results as a table."""
     form = RecipeSearchForm(request.GET or None)
-    search_results_df = None
     search_performed = False
+    search_results_list = None
     results_count = 0
+    page = None
+    pantry_mode = False
+    facets = None
+    page_size = get_page_size(request)
+    cursor = request.GET.get("cursor")
+    # e.g. "most popular"; None keeps each mode's own order
+    ordering = sort_ordering(request)
 
     # Handle "Show All" functionality first (prioritize over search form)
     if "show_all" in request.GET:
         search_performed = True
-        recipes_queryset = Recipe.objects.all().order_by("name")
-        results_count = recipes_queryset.count()
-
+        recipes_queryset = show_all_queryset()
+        # Facet counts (which include the total) come from one aggregate
+        facets = compute_facets(recipes_queryset)
+        results_count = sum(entry["count"] for entry in facets["difficulty"])
         if results_count > 0:
-            recipe_data = []
-            for recipe in recipes_queryset:
-                recipe_data.append(
-                    {
-                        "id": recipe.id,
-                        "name": recipe.name,
-                        "category": recipe.get_category_display(),
-                        "difficulty": recipe.difficulty,
-                        "prep_time": recipe.prep_time,
-                        "cooking_time": recipe.cooking_time,
-                        "total_time": recipe.total_time,
-                        "servings": recipe.servings,
-                        "description": (
-                            recipe.description[:100] + "..."
-                            if len(recipe.description) > 100
-                            else recipe.description
-                        ),
-                        "image_url": recipe.image.url if recipe.image else None,
-                    }
-                )
-
-            search_results_df = pd.DataFrame(recipe_data)
-
-            # Convert DataFrame to list of dictionaries for template
-            search_results_list = search_results_df.to_dict("records")
+            # Keyset pagination: only one page of rows is ever fetched
+            ordering = ordering or SHOW_ALL_ORDERING
+            paginator = KeysetPaginator(
+                result_values(recipes_queryset, *ordering),
+                ordering,
+                page_size=page_size,
+            )
+            page = paginator.page(cursor)
+            search_results_list = [SearchResultRow(values) for values in page]
 
     # Handle regular search functionality
     elif request.GET and form.is_valid():
         search_performed = True
-
-        # Start with all recipes
-        recipes_queryset = Recipe.objects.all()
-
-        # Build search filters based on form data
-        search_filters = Q()
-
-        # Recipe name search (partial matching with icontains)
-        recipe_name = form.cleaned_data.get("recipe_name")
-        if recipe_name:
-            search_filters &= Q(name__icontains=recipe_name)
-
-        # Ingredients search (search in related ingredients)
-        ingredients = form.cleaned_data.get("ingredients")
-        if ingredients:
-            # Split comma-separated ingredients and search for each
-            ingredient_list = [ing.strip() for ing in ingredients.split(",")]
-            ingredient_filters = Q()
-            for ingredient in ingredient_list:
-                if ingredient:
-                    ingredient_filters |= Q(ingredients__name__icontains=ingredient)
-            search_filters &= ingredient_filters
-
-        # Category filter
-        category = form.cleaned_data.get("category")
-        if category:
-            search_filters &= Q(category=category)
-
-        # Store difficulty for later filtering (after we get the results)
-        difficulty_filter = form.cleaned_data.get("difficulty")
-
-        # Maximum cooking time filter
-        max_cooking_time = form.cleaned_data.get("max_cooking_time")
-        if max_cooking_time:
-            search_filters &= Q(prep_time__lte=max_cooking_time) & Q(
-                cooking_time__lte=max_cooking_time
+        pantry_mode = form.cleaned_data.get("pantry_mode") and bool(
+            pantry_terms(form.cleaned_data.get("ingredients"))
+        )
+        if pantry_mode:
+            # Rank by pantry coverage using the in-memory inverted index
+            match = pantry_search(form.cleaned_data)
+            recipe_ids, facets = match.ids, match.facets
+            fetch_rows = pantry_rows(match)
+            ordering = None
+        else:
+            # Ordered matching ids and facet counts come from the search cache
+            # (filtered, ranked and aggregated in SQL on a miss); only the
+            # current page's rows are loaded
+            recipe_ids, facets = cached_search(form.cleaned_data)
+            fetch_rows = rows_for_ids
+        results_count = len(recipe_ids)
+        if results_count > 0 and ordering:
+            # Re-sorted results (popularity changes without invalidating the
+            # search cache) are read page by page straight from the index
+            paginator = KeysetPaginator(
+                result_values(search_queryset(form.cleaned_data), *ordering),
+                ordering,
+                page_size=page_size,
             )
-
-        # Servings range filter
-        min_servings = form.cleaned_data.get("min_servings")
-        if min_servings:
-            search_filters &= Q(servings__gte=min_servings)
-
-        max_servings = form.cleaned_data.get("max_servings")
-        if max_servings:
-            search_filters &= Q(servings__lte=max_servings)
-
-        # Apply all filters to queryset
-        if search_filters:
-            recipes_queryset = recipes_queryset.filter(search_filters)
-
-        # Remove duplicates that might occur from ingredient joins
-        recipes_queryset = recipes_queryset.distinct()
-
-        # Count results
-        results_count = recipes_queryset.count()
-
-        # Convert QuerySet to pandas DataFrame for table display
-        if results_count > 0:
-            # Prepare data for DataFrame
-            recipe_data = []
-            for recipe in recipes_queryset.select_related():
-                # Apply difficulty filtering here using the actual recipe.difficulty property
-                if difficulty_filter and recipe.difficulty != difficulty_filter:
-                    continue
-
-                recipe_data.append(
-                    {
-                        "id": recipe.id,
-                        "name": recipe.name,
-                        "category": recipe.get_category_display(),
-                        "difficulty": recipe.difficulty,
-                        "prep_time": recipe.prep_time,
-                        "cooking_time": recipe.cooking_time,
-                        "total_time": recipe.total_time,
-                        "servings": recipe.servings,
-                        "description": (
-                            recipe.description[:100] + "..."
-                            if len(recipe.description) > 100
-                            else recipe.description
-                        ),
-                        "image_url": recipe.image.url if recipe.image else None,
-                    }
-                )
-
-            # Update results count after difficulty filtering
-            results_count = len(recipe_data)
-
-            # Create pandas DataFrame only if we have data
-            if recipe_data:
-                search_results_df = pd.DataFrame(recipe_data)
-
-                # Sort by relevance (name matches first, then by total time)
-                if recipe_name:
-                    # Put exact matches first, then partial matches
-                    search_results_df["exact_match"] = (
-                        search_results_df["name"].str.lower() == recipe_name.lower()
-                    )
-                    search_results_df = search_results_df.sort_values(
-                        ["exact_match", "total_time"], ascending=[False, True]
-                    )
-                    search_results_df = search_results_df.drop("exact_match", axis=1)
-                else:
-                    search_results_df = search_results_df.sort_values("total_time")
-
-                # Convert DataFrame to list of dictionaries for template
-                search_results_list = search_results_df.to_dict("records")
-            else:
-                # No results after filtering
-                search_results_df = None
-                search_results_list = None
+            page = paginator.page(cursor)
+            search_results_list = [SearchResultRow(values) for values in page]
+        elif results_count > 0:
+            paginator = IdListPaginator(recipe_ids, fetch_rows, page_size=page_size)
+            page = paginator.page(cursor)
+            search_results_list = page.object_list
 
     context = {
         "form": form,
-        "search_results_df": search_results_df,
-        "search_results_list": (
-            search_results_list if "search_results_list" in locals() else None
-        ),
+        "search_results_list": search_results_list,
         "search_performed": search_performed,
         "results_count": results_count,
-        "has_results": search_results_df is not None and len(search_results_df) > 0,
+        "has_results": results_count > 0,
+        "pantry_mode": pantry_mode,
+        "facets": facet_links(request, facets) if results_count else None,
+        "page_obj": page,
+        "next_page_url": page_url(request, page.next_cursor) if page else None,
+        "previous_page_url": (
+            page_url(request, page.previous_cursor) if page else None
+        ),
     }
 
     return render(request, "recipes/recipe_search.html", context)
+
+
+def recipe_pantry(request):
+    """JSON variant of pantry mode: recipes ranked by pantry coverage."""
+    form = RecipeSearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+    if not pantry_terms(form.cleaned_data.get("ingredients")):
+        return JsonResponse(
+            {"errors": {"ingredients": ["List at least one ingredient."]}}, status=400
+        )
+
+    match = pantry_search(form.cleaned_data)
+    top_ids = match.ids[: get_page_size(request)]
+    rows = pantry_rows(match)(top_ids)
+    missing = missing_ingredients(top_ids, form.cleaned_data["ingredients"])
+
+    return JsonResponse(
+        {
+            "results_count": len(match),
+            "results": [
+                {
+                    "id": row.id,
+                    "name": row.name,
+                    "matched_count": row.matched_count,
+                    "ingredient_count": row.ingredient_count,
+                    "missing_count": row.missing_count,
+                    "coverage": round(row.coverage, 4),
+                    "missing_ingredients": missing.get(row.id, []),
+                }
+                for row in rows
+            ],
+        }
+    )
+
+
+def recipe_suggest(request):
+    """Autocomplete: JSON prefix matches for ingredient and recipe names."""
+    query = request.GET.get("q", "").strip()
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 10)), 20))
+    except ValueError:
+        limit = 10
+
+    if not query:
+        return JsonResponse({"query": query, "ingredients": [], "recipes": []})
+
+    # Served from the in-process prefix index, not a LIKE query per keystroke
+    suggestions = suggestion_index.suggest(query, limit)
+    return JsonResponse({"query": query, **suggestions})
+
+
+@staff_member_required
+def search_cache_stats_view(request):
+    """Search cache hit/miss counters as JSON (staff only) for sizing the cache."""
+    return JsonResponse(search_cache_stats())
+
+
+@staff_member_required
+def chart_cache_stats_view(request):
+    """Favorites chart cache counters and render time saved as JSON (staff only)."""
+    return JsonResponse(chart_cache_stats())
+
+
+def readiness_view(request):
+    """200 once this worker has warmed up, 503 before (load balancer probe)."""
+    ready = is_ready()
+    response = JsonResponse(
+        {"ready": ready, "steps": warm_up_report()}, status=200 if ready else 503
+    )
+    patch_cache_control(response, no_store=True)
+    return response
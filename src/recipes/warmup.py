@@ -0,0 +1,100 @@
+import threading
+import time
+from pathlib import Path
+from django.apps import apps
+from django.conf import settings
+from django.template.loader import get_template
+from .chart_data import SAMPLE_CHART_DATA
+from .models import Recipe
+from .svg_charts import render_svg
+
+# Work a fresh worker process would otherwise do on its first requests.
+# Run by the gunicorn post_fork hook (gunicorn.conf.py) before the worker
+# accepts traffic, or by the warm_up management command.
+
+TEMPLATE_APPS = ("recipes", "accounts")
+
+_ready = threading.Event()
+_report = {}
+
+
+def warm_charts():
+    """Render a throwaway chart with the configured renderer."""
+    from .chart_jobs import chart_renderer, is_eager
+
+    if chart_renderer() == "matplotlib" and is_eager():
+        # Loads matplotlib, its font cache and the figure pool; skipped
+        # when PNGs are rendered by the chart worker instead
+        from .chart_utils import warm_chart_renderers
+
+        warm_chart_renderers()
+    else:
+        for data in SAMPLE_CHART_DATA.values():
+            render_svg(data)
+
+
+def compile_templates():
+    """Load (and so compile and cache) every template of the main apps."""
+    count = 0
+    for label in TEMPLATE_APPS:
+        template_dir = Path(apps.get_app_config(label).path) / "templates"
+        for path in sorted(template_dir.rglob("*.html")):
+            get_template(path.relative_to(template_dir).as_posix())
+            count += 1
+    return count
+
+
+def prime_catalog_caches():
+    """Build the per-process search indexes and cache the unfiltered search."""
+    from .catalog import recipe_category_counts
+    from .pantry import pantry_index
+    from .search_cache import prime_search
+    from .suggest import suggestion_index
+
+    # Opens the database connection and compiles the annotated queryset
+    list(Recipe.objects.with_metrics()[:1])
+    suggestion_index.refresh()
+    pantry_index.get()
+    prime_search({})
+    recipe_category_counts()
+
+
+WARM_UP_STEPS = (
+    ("charts", warm_charts),
+    ("templates", compile_templates),
+    ("catalog_caches", prime_catalog_caches),
+)
+
+
+def warm_up(log=None):
+    """Run every warm-up step, then mark this process ready.
+
+    A failing step is logged and reported but doesn't stop the others:
+    the worker still serves, just colder.
+    """
+    log = log or (lambda message: None)
+    report = {}
+    for name, step in WARM_UP_STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as error:
+            report[name] = {"ok": False, "error": repr(error)}
+            log(f"Warm-up step {name} failed: {error!r}")
+        else:
+            elapsed_ms = round((time.perf_counter() - started) * 1000)
+            report[name] = {"ok": True, "ms": elapsed_ms}
+            log(f"Warm-up step {name}: {elapsed_ms} ms")
+    _report.clear()
+    _report.update(report)
+    _ready.set()
+    return report
+
+
+def is_ready():
+    """Whether warm-up has finished in this process (or isn't required)."""
+    return _ready.is_set() or not getattr(settings, "RECIPES_WARMUP_REQUIRED", False)
+
+
+def warm_up_report():
+    return dict(_report)